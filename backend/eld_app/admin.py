@@ -1,5 +1,28 @@
 from django.contrib import admin
-from .models import Trip, RoutePoint, ELDLog, DutyStatus
+from .caching import touch_trips
+from .models import Trip, RoutePoint, ELDLog, DutyStatus, HOSAuditResult
+
+
+class TripChildAdmin(admin.ModelAdmin):
+    """Admin for rows shown under a trip: edits made here bump the trip's version so its ETags change"""
+    trip_field = 'trip_id'
+
+    def _trip_ids(self, queryset):
+        return list(queryset.values_list(self.trip_field, flat=True))
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        touch_trips(self._trip_ids(self.model.objects.filter(pk=obj.pk)))
+
+    def delete_model(self, request, obj):
+        trip_ids = self._trip_ids(self.model.objects.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+        touch_trips(trip_ids)
+
+    def delete_queryset(self, request, queryset):
+        trip_ids = self._trip_ids(queryset)
+        super().delete_queryset(request, queryset)
+        touch_trips(trip_ids)
 
 
 @admin.register(Trip)
@@ -10,21 +33,29 @@ class TripAdmin(admin.ModelAdmin):
 
 
 @admin.register(RoutePoint)
-class RoutePointAdmin(admin.ModelAdmin):
+class RoutePointAdmin(TripChildAdmin):
     list_display = ['trip', 'point_type', 'address', 'sequence']
     list_filter = ['point_type']
     search_fields = ['address']
 
 
 @admin.register(ELDLog)
-class ELDLogAdmin(admin.ModelAdmin):
+class ELDLogAdmin(TripChildAdmin):
     list_display = ['trip', 'log_date', 'driver_name', 'driving_hours', 'on_duty_hours']
     list_filter = ['log_date']
     search_fields = ['driver_name', 'carrier_name']
 
 
 @admin.register(DutyStatus)
-class DutyStatusAdmin(admin.ModelAdmin):
+class DutyStatusAdmin(TripChildAdmin):
+    trip_field = 'eld_log__trip_id'
     list_display = ['eld_log', 'status', 'start_time', 'end_time', 'location']
     list_filter = ['status', 'start_time']
     search_fields = ['location', 'remarks']
+
+
+@admin.register(HOSAuditResult)
+class HOSAuditResultAdmin(admin.ModelAdmin):
+    list_display = ['driver_name', 'log_date', 'compliance_status', 'violation_count', 'audited_at']
+    list_filter = ['compliance_status', 'is_compliant', 'log_date']
+    search_fields = ['driver_name']
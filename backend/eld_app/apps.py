@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class EldAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'eld_app'
+    
+    def ready(self):
+        from django.core.signals import request_finished
+        from django.db.backends.signals import connection_created
+        from . import db, metrics
+        
+        connection_created.connect(db.configure_sqlite, dispatch_uid='eld_app.db.configure_sqlite')
+        
+        # Publish this worker's metrics once the response has been sent
+        request_finished.connect(lambda sender, **kwargs: metrics.registry.flush(), weak=False,
+                                 dispatch_uid='eld_app.metrics.flush')
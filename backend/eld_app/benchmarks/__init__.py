@@ -0,0 +1,7 @@
+"""
+Reproducible performance benchmarks for the ELD services, serializers and views.
+
+Run with ``python manage.py bench``. Benchmarks use a throwaway test database,
+synthetic trips from ``data`` and offline stand-ins for Nominatim and
+OpenRouteService from ``stubs``, so results do not depend on the network.
+"""
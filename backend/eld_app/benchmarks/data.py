@@ -0,0 +1,168 @@
+"""Synthetic trip and log data for benchmarks"""
+import random
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
+from zoneinfo import ZoneInfo
+
+from ..models import DriverDaySummary, DutyStatus, ELDLog, RoutePoint, Trip
+from ..road_graph import RoadGraph, RoadGraphBuilder
+from ..services import ELDLogService
+from ..truck_stops import TruckStop
+
+CITIES = [
+    ('Chicago, IL', (41.8781, -87.6298)),
+    ('Denver, CO', (39.7392, -104.9903)),
+    ('Seattle, WA', (47.6062, -122.3321)),
+    ('Atlanta, GA', (33.7490, -84.3880)),
+    ('Houston, TX', (29.7604, -95.3698)),
+    ('Boston, MA', (42.3601, -71.0589)),
+    ('Los Angeles, CA', (34.0522, -118.2437)),
+    ('Miami, FL', (25.7617, -80.1918)),
+]
+
+
+def route_data_for_days(days: int, geometry_points: int = 2000) -> Dict:
+    """Route data whose estimated duration spans ``days`` daily logs"""
+    duration = days * 24 - 12 if days > 1 else 10.0
+    distance = duration * 55
+    start, pickup, dropoff = CITIES[0], CITIES[1], CITIES[2]
+    geometry = []
+    for i in range(geometry_points):
+        t = i / (geometry_points - 1)
+        geometry.append([start[1][1] + (dropoff[1][1] - start[1][1]) * t,
+                         start[1][0] + (dropoff[1][0] - start[1][0]) * t])
+    return {
+        'total_distance': distance,
+        'estimated_duration': duration,
+        'fuel_stops': [],
+        'rest_stops': [],
+        'route_points': [
+            {'type': 'start', 'location': start[0], 'coords': start[1]},
+            {'type': 'pickup', 'location': pickup[0], 'coords': pickup[1]},
+            {'type': 'dropoff', 'location': dropoff[0], 'coords': dropoff[1]},
+        ],
+        'route_geometry': geometry,
+    }
+
+
+def truck_stops(count: int, seed: int = 42) -> List[TruckStop]:
+    """``count`` truck stops scattered uniformly over the contiguous US"""
+    rng = random.Random(seed)
+    return [
+        TruckStop(name=f'Truck Stop {i}', latitude=rng.uniform(25, 49), longitude=rng.uniform(-124, -67))
+        for i in range(count)
+    ]
+
+
+def stop_coords(count: int, seed: int = 42) -> List[Tuple[float, float]]:
+    """``count`` delivery locations scattered over the Midwest"""
+    rng = random.Random(seed)
+    return [(rng.uniform(37, 44), rng.uniform(-92, -83)) for _ in range(count)]
+
+
+def grid_road_graph(size: int, spacing: float = 0.1) -> RoadGraph:
+    """A ``size`` x ``size`` street grid anchored at Chicago, with an interstate along the diagonal"""
+    origin_lat, origin_lng = CITIES[0][1]
+    builder = RoadGraphBuilder()
+    for i in range(size):
+        row = [[origin_lng - j * spacing, origin_lat + i * spacing] for j in range(size)]
+        column = [[origin_lng - i * spacing, origin_lat + j * spacing] for j in range(size)]
+        builder.add_way(row, {'highway': 'secondary'})
+        builder.add_way(column, {'highway': 'secondary'})
+    diagonal = [[origin_lng - i * spacing, origin_lat + i * spacing] for i in range(size)]
+    builder.add_way(diagonal, {'highway': 'trunk'})
+    return builder.build()
+
+
+def create_trips(count: int, days: int, seed: int = 42) -> List[Trip]:
+    """Insert ``count`` trips with ``days`` daily logs each, using bulk writes"""
+    rng = random.Random(seed)
+    eld_service = ELDLogService()
+    route_data = route_data_for_days(days)
+    trips = Trip.objects.bulk_create([
+        Trip(
+            current_location=rng.choice(CITIES)[0],
+            pickup_location=rng.choice(CITIES)[0],
+            dropoff_location=rng.choice(CITIES)[0],
+            current_cycle_used=round(rng.uniform(0, 60), 1),
+            total_distance=route_data['total_distance'],
+            estimated_duration=route_data['estimated_duration'],
+        )
+        for _ in range(count)
+    ])
+
+    route_points = []
+    logs = []
+    statuses = []
+    for trip in trips:
+        for sequence, point in enumerate(route_data['route_points']):
+            route_points.append(RoutePoint(
+                trip=trip, latitude=point['coords'][0], longitude=point['coords'][1],
+                address=point['location'], point_type=point['type'], sequence=sequence,
+            ))
+        for log_data in eld_service.generate_eld_logs(trip, route_data):
+            log = ELDLog(trip=trip, **{
+                field: getattr(log_data, field) for field in (
+                    'log_date', 'driver_name', 'carrier_name', 'vehicle_number',
+                    'off_duty_hours', 'sleeper_berth_hours', 'driving_hours', 'on_duty_hours',
+                    'total_on_duty_7_days', 'hours_available_70hr', 'total_on_duty_5_days',
+                    'total_on_duty_6_days', 'hours_available_60hr',
+                )
+            })
+            logs.append(log)
+            statuses.append((log, log_data.duty_statuses()))
+
+    RoutePoint.objects.bulk_create(route_points, batch_size=1000)
+    ELDLog.objects.bulk_create(logs, batch_size=1000)
+    DutyStatus.objects.bulk_create([
+        DutyStatus(eld_log=log, **status)
+        for log, log_statuses in statuses
+        for status in log_statuses
+    ], batch_size=1000)
+    return trips
+
+
+def write_duty_history_csv(path: str, records: int, drivers: int = 10, seed: int = 42):
+    """Write ``records`` duty status changes spread over ``drivers`` drivers as an import CSV"""
+    rng = random.Random(seed)
+    statuses = ['off_duty', 'sleeper_berth', 'driving', 'on_duty']
+    per_driver = records // drivers
+    with open(path, 'w') as f:
+        f.write('driver_name,start_time,status,location,remarks\n')
+        for driver in range(drivers):
+            moment = datetime(2024, 1, 1)
+            for _ in range(per_driver):
+                f.write(f'Imported Driver {driver},{moment.isoformat()},{rng.choice(statuses)},{rng.choice(CITIES)[0].replace(",", "")},\n')
+                moment += timedelta(minutes=rng.randint(5, 180))
+
+
+def duty_events(days: int, seed: int = 42) -> List[Tuple[str, datetime]]:
+    """A driver's ``(status, time)`` duty changes over ``days`` days of daily 11-hour driving shifts"""
+    rng = random.Random(seed)
+    moment = datetime(2024, 1, 1, 6, tzinfo=ZoneInfo('America/Chicago'))
+    events = []
+    for _ in range(days):
+        shift = [('on_duty', 0.5), ('driving', 4), ('on_duty', 0.5), ('driving', 4), ('off_duty', 0.5),
+                 ('driving', 3), ('on_duty', 0.5), ('sleeper_berth', 11)]
+        for status, hours in shift:
+            events.append((status, moment))
+            moment += timedelta(hours=hours, minutes=rng.randint(0, 15))
+    return events
+
+
+def create_day_summaries(drivers: int, days: int, seed: int = 42):
+    """Insert driver-day rollup rows for ``drivers`` drivers over the ``days`` days ending 2024-12-31"""
+    rng = random.Random(seed)
+    first_day = date(2024, 12, 31) - timedelta(days=days - 1)
+    rows = []
+    for driver in range(drivers):
+        for offset in range(days):
+            driving = rng.uniform(0, 11)
+            on_duty = rng.uniform(0, 3)
+            sleeper = rng.uniform(0, 10)
+            rows.append(DriverDaySummary(
+                driver_name=f'Fleet Driver {driver}', day=first_day + timedelta(days=offset),
+                driving_hours=driving, on_duty_hours=on_duty, sleeper_berth_hours=sleeper,
+                off_duty_hours=24 - driving - on_duty - sleeper, log_count=1,
+            ))
+    DriverDaySummary.objects.bulk_create(rows, batch_size=1000)
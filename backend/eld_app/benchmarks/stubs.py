@@ -0,0 +1,81 @@
+"""Offline stand-ins for the Nominatim and OpenRouteService APIs"""
+import hashlib
+import math
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache.backends.dummy import DummyCache
+
+
+def fake_coords(address: str):
+    """Deterministic pseudo-random continental US coordinates for an address"""
+    digest = hashlib.sha1(address.lower().encode()).digest()
+    lat = 30.0 + digest[0] / 255 * 17.0
+    lng = -122.0 + digest[1] / 255 * 50.0
+    return (round(lat, 4), round(lng, 4))
+
+
+def fake_nominatim_geocode(self, query, *args, **kwargs):
+    lat, lng = fake_coords(str(query))
+    return SimpleNamespace(latitude=lat, longitude=lng, address=str(query))
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self._payload
+
+
+def _line(coordinates, points_per_leg):
+    """Densify a [lng, lat] polyline so payloads resemble real ORS geometries"""
+    line = []
+    for (lng1, lat1), (lng2, lat2) in zip(coordinates, coordinates[1:]):
+        for i in range(points_per_leg):
+            t = i / points_per_leg
+            line.append([lng1 + (lng2 - lng1) * t, lat1 + (lat2 - lat1) * t])
+    line.append(list(coordinates[-1]))
+    return line
+
+
+def fake_ors_directions(coordinates, points_per_leg=500):
+    """Build an ORS ``directions`` GeoJSON response along straight legs"""
+    meters = 0.0
+    for (lng1, lat1), (lng2, lat2) in zip(coordinates, coordinates[1:]):
+        # Equirectangular approximation with a road-winding factor
+        x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+        y = math.radians(lat2 - lat1)
+        meters += math.hypot(x, y) * 6371000 * 1.2
+    return {
+        'features': [{
+            'properties': {'summary': {'distance': meters, 'duration': meters / 24.6}},
+            'geometry': {'coordinates': _line(coordinates, points_per_leg)},
+        }]
+    }
+
+
+def fake_requests_get(url, params=None, **kwargs):
+    lat, lng = fake_coords((params or {}).get('text', url))
+    return FakeResponse({'features': [{'geometry': {'coordinates': [lng, lat]}}]})
+
+
+def fake_requests_post(url, json=None, **kwargs):
+    return FakeResponse(fake_ors_directions((json or {}).get('coordinates', [])))
+
+
+@contextmanager
+def offline_upstreams():
+    """Patch RouteService's geocoder and HTTP client with the offline fakes.
+    
+    The shared geocode/route caches and the rate limiter are bypassed as
+    well, so fake coordinates and routes never end up in the real caches.
+    """
+    with mock.patch('geopy.geocoders.Nominatim.geocode', fake_nominatim_geocode), \
+            mock.patch('eld_app.geocoding.lookup', lambda address, fetch: fetch(address)), \
+            mock.patch('eld_app.services.caches', {'routes': DummyCache('offline', {})}), \
+            mock.patch('eld_app.services.requests.get', fake_requests_get), \
+            mock.patch('eld_app.services.requests.post', fake_requests_post):
+        yield
@@ -0,0 +1,419 @@
+"""Benchmark cases and the timing/baseline machinery behind ``manage.py bench``"""
+import asyncio
+import atexit
+import functools
+import gzip
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.test import Client
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .. import road_graph
+from ..middleware import brotli
+from ..models import ELDLog, Trip
+from ..renderers import ORJSONRenderer
+from ..day_summaries import aggregate
+from ..duty_import import DutyHistoryImporter
+from ..eld_output import ELDOutputFile
+from ..eta import ETAEngine, RouteSegments
+from ..geo import PolylineIndex
+from ..hos_state import HOSClock
+from ..live_clocks import ClockBroadcaster
+from ..log_cache import PlanCache
+from ..serializers import ELDLogSerializer, TripSerializer
+from ..services import ELDLogService, RouteService
+from ..stop_order import StopSequencer, distance_matrix
+from ..truck_stops import TruckStopIndex
+from ..views import _render_pdf_log
+from ..what_if import WhatIfPlanner
+from . import data
+
+
+def calibrate(rounds: int = 3) -> float:
+    """Best time of a fixed pure-Python workload, measuring how fast the machine runs right now"""
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        values = [(i * 7919) % 10007 for i in range(20000)]
+        sorted(values)
+        {value: str(value) for value in values}
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+class Benchmark:
+    """A named callable timed over ``number`` calls per repeat; ``memory`` also records one call's peak allocation"""
+
+    def __init__(self, name: str, func: Callable[[], object], number: int = 1, memory: bool = False):
+        self.name = name
+        self.func = func
+        self.number = number
+        self.memory = memory
+
+    def run(self, repeat: int) -> Dict:
+        self.func()  # warm-up: imports, query compilation, lazy caches
+        timings, calibrations = [], []
+        for _ in range(repeat):
+            calibrations.append(calibrate())
+            started = time.perf_counter()
+            for _ in range(self.number):
+                self.func()
+            timings.append((time.perf_counter() - started) / self.number)
+        result = {
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.fmean(timings),
+            'calibration': min(calibrations),
+            'repeat': repeat,
+            'number': self.number,
+        }
+        if self.memory:
+            # Traced separately: tracemalloc slows allocation-heavy code several times over
+            tracemalloc.start()
+            try:
+                self.func()
+                result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        return result
+
+
+def build_benchmarks(scale: float = 1.0, selected: Callable[[str], bool] = None) -> List[Benchmark]:
+    """Create the benchmark cases, inserting their fixture data into the current database.
+
+    Only cases whose name passes ``selected`` are built, and fixtures are
+    created on first use, so a filtered run skips the fixtures it does not need.
+    """
+    benchmarks = []
+    selected = selected or (lambda name: True)
+
+    def add(name: str, build: Callable[[], Callable[[], object]], **options):
+        if selected(name):
+            benchmarks.append(Benchmark(name, build(), **options))
+
+    @functools.cache
+    def route_index():
+        return PolylineIndex(data.route_data_for_days(7)['route_geometry'])
+
+    def scheduled_points(route_data):
+        return route_data, RouteSegments.from_route(
+            route_index(), route_data['total_distance'], route_data['estimated_duration']
+        ), [
+            {'type': 'start', 'location': 'A', 'mileage': 0, 'duration_hours': 0},
+            {'type': 'pickup', 'location': 'B', 'mileage': 0, 'duration_hours': 1},
+            {'type': 'dropoff', 'location': 'C', 'mileage': route_data['total_distance'], 'duration_hours': 1},
+        ]
+
+    @functools.cache
+    def week():
+        return scheduled_points(data.route_data_for_days(7))
+
+    @functools.cache
+    def fortnight():
+        return scheduled_points(data.route_data_for_days(14))
+
+    @functools.cache
+    def events():
+        return data.duty_events(days=30)
+
+    @functools.cache
+    def long_trip():
+        # The list benchmark serializes every trip, the 30-day one included
+        data.create_trips(trip_count, days=7)
+        return data.create_trips(1, days=30, seed=7)[0]
+
+    @functools.cache
+    def trip_payload():
+        return TripSerializer(long_trip()).data
+
+    @functools.cache
+    def rendered_trip():
+        return ORJSONRenderer().render(trip_payload())
+
+    @functools.cache
+    def log_id():
+        return long_trip().eld_logs.order_by('log_date').values_list('id', flat=True).first()
+
+    @functools.cache
+    def fleet_summaries():
+        data.create_day_summaries(fleet_drivers, 365)
+
+    client = Client(HTTP_HOST='localhost')
+    eta_engine = ETAEngine()
+    departure = timezone.now()
+
+    # Uncached, so every call schedules; plan.lane_batch covers the memo
+    route_service = RouteService(plan_cache=None)
+    add(
+        'route.calculate_route.fallback',
+        lambda: lambda: route_service.calculate_route(
+            '1 Main St, Springfield', '200 Oak Ave, Riverton', '55 Pine Rd, Lakeside'
+        ),
+        number=20,
+    )
+
+    # Corridor query over a ~1,900-mile polyline against a nationwide dataset
+    stop_count = max(1, int(20000 * scale))
+
+    def corridor():
+        stop_index = TruckStopIndex(data.truck_stops(stop_count))
+        index = route_index()
+        return lambda: stop_index.corridor(index, 5.0)
+
+    add(f'truck_stops.corridor.{stop_count}', corridor, number=5)
+
+    # Offline A* routing across a synthetic street grid
+    graph_size = max(10, int(150 * scale ** 0.5))
+
+    def grid_route():
+        graph = data.grid_road_graph(graph_size)
+        far_corner = (graph.lats[graph.node_count - 1], graph.lngs[graph.node_count - 1])
+        return lambda: graph.route([(graph.lats[0], graph.lngs[0]), far_corner])
+
+    add(f'road_graph.route.{graph_size * graph_size}n', grid_route, number=3)
+
+    # The same across a real OSM extract, between opposite corners of its bounding box, when
+    # one has been imported to ROAD_GRAPH_PATH
+    def extract_route():
+        graph = road_graph.get_graph()
+        corners = [(min(graph.lats), min(graph.lngs)), (max(graph.lats), max(graph.lngs))]
+        return lambda: graph.route(corners)
+
+    if road_graph.get_graph() is not None:
+        add('road_graph.route.extract', extract_route, number=3)
+
+    # Ordering a 20-stop LTL run between a fixed pickup and final drop-off
+    def stop_order():
+        stop_matrix = distance_matrix(data.stop_coords(22))
+        return lambda: StopSequencer(stop_matrix, [0.5] * len(stop_matrix)).solve()
+
+    add('stop_order.solve.20', stop_order, number=20)
+
+    # Scheduling a week-long trip: per-hour speed changes, HOS breaks and rests over 2,000 segments
+    def schedule_week():
+        _, segments, points = week()
+        return lambda: eta_engine.schedule(segments, points, departure, cycle_used=20)
+
+    add('eta.schedule.7d', schedule_week, number=20)
+
+    def earliest_arrival():
+        _, segments, points = week()
+        return lambda: WhatIfPlanner(segments, points, cycle_used=20).earliest_arrival(
+            departure, departure + timedelta(hours=24), timedelta(minutes=15)
+        )
+
+    add('what_if.earliest_arrival.7d', earliest_arrival, number=5)
+
+    # Running HOS clocks over a 30-day event stream: the per-event cost must not grow with history
+    def replay_events():
+        stream = events()
+
+        def replay():
+            clock = HOSClock()
+            for status, at in stream:
+                clock.change_status(status, at)
+            return clock
+        return replay
+
+    add(f'hos.clock.change_status.{30 * 8}events', replay_events, number=5)
+
+    # Ingesting a 100-event batch; each call goes to a new driver so every event is accepted
+    def driver_events():
+        event_batch = {'events': [
+            {'sequence': sequence, 'status': status, 'event_time': at.isoformat()}
+            for sequence, (status, at) in enumerate(events()[:100], start=1)
+        ]}
+        drivers = itertools.count()
+        return lambda: client.post(
+            f'/api/drivers/Bench{next(drivers)}/events/', event_batch, content_type='application/json'
+        )
+
+    add('view.driver_events.100', driver_events, number=5)
+
+    # 1000 dashboards watching the same 10 drivers connect; each clock is computed once and shared
+    watched = [f'Fleet Driver {i}' for i in range(10)]
+
+    async def fan_out():
+        hub = ClockBroadcaster(poll_seconds=3600, refresh_seconds=3600)
+        queues = [hub.subscribe(watched) for _ in range(1000)]
+        while any(queue.qsize() < len(watched) for queue in queues):
+            await asyncio.sleep(0)
+        for queue in queues:
+            hub.unsubscribe(queue, watched)
+        await hub._task
+        return hub.computations
+
+    add('live_clocks.fan_out.1000subscribers', lambda: lambda: asyncio.run(fan_out()))
+
+    # Generation itself; the memo cache has its own case below
+    eld_service = ELDLogService(plan_cache=None)
+    for days in (1, 7, 14, 30):
+        def generate(days=days):
+            trip = Trip(current_location='A', pickup_location='B', dropoff_location='C', current_cycle_used=20)
+            route_data = data.route_data_for_days(days)
+            return lambda: eld_service.generate_eld_logs(trip, route_data)
+
+        add(f'eld.generate_eld_logs.{days}d', generate, number=100)
+
+    # Logs for a batch of scheduled two-week trips, kept alive together as a batch job would
+    batch_trip = Trip(current_location='A', pickup_location='B', dropoff_location='C', current_cycle_used=20)
+    batch_size = max(1, int(200 * scale))
+
+    def generate_batch():
+        route_data, segments, points = fortnight()
+        fortnight_route = {
+            'estimated_duration': route_data['estimated_duration'],
+            'duty_timeline': eta_engine.schedule(segments, points, departure, cycle_used=20),
+        }
+        return lambda: [eld_service.generate_eld_logs(batch_trip, fortnight_route) for _ in range(batch_size)]
+
+    add(f'eld.generate_eld_logs.batch_{batch_size}x14d', generate_batch, memory=True)
+
+    # Schedules and logs for a batch of trips on one lane, dispatched at three fixed times of
+    # day over 30 days, each request arriving at some second of its minute. Uncached, then
+    # through an empty memo cache, where a trip reuses the plan of the same departure time.
+    def lane_batch(memoized: bool):
+        route_data, segments, points = fortnight()
+        route = dict(route_data, route_key='bench-lane')
+        rng = random.Random(42)
+        first = datetime(2024, 6, 3, tzinfo=eta_engine.time_zone)
+        departures = [
+            (first + timedelta(days=i % 30, hours=(6, 14, 22)[i % 3], seconds=rng.randrange(60))).replace(second=0)
+            for i in range(batch_size)
+        ]
+
+        def run():
+            cache = PlanCache(max_entries=256) if memoized else None
+            route_service = RouteService(plan_cache=cache)
+            service = ELDLogService(plan_cache=cache)
+            logs = []
+            for departure in departures:
+                trip_route = dict(route, route_points=[dict(point) for point in points])
+                trip_route['duty_timeline'], trip_route['plan_key'] = route_service.schedule(
+                    trip_route, segments, departure, cycle_used=20
+                )
+                logs.append(service.generate_eld_logs(batch_trip, trip_route))
+            return logs
+        return run
+
+    add(f'plan.lane_batch_{batch_size}x14d', lambda: lane_batch(False), memory=True)
+    add(f'plan.lane_batch_{batch_size}x14d.memoized', lambda: lane_batch(True), memory=True)
+
+    trip_count = max(1, int(50 * scale))
+
+    def trip_list():
+        long_trip()
+        return lambda: TripSerializer(Trip.objects.all(), many=True).data
+
+    add(f'serializer.trip_list.{trip_count}x7d', trip_list)
+
+    def eld_logs():
+        trip = long_trip()
+        return lambda: ELDLogSerializer(ELDLog.objects.filter(trip=trip).order_by('log_date'), many=True).data
+
+    add('serializer.eld_logs.30d', eld_logs, number=5)
+
+    # Rendering and compressing a full 30-day trip detail payload
+    add('render.trip_detail.30d.drf_json', lambda: lambda: JSONRenderer().render(trip_payload()), number=20)
+    add('render.trip_detail.30d.orjson', lambda: lambda: ORJSONRenderer().render(trip_payload()), number=20)
+    add(
+        'compress.trip_detail.30d.gzip',
+        lambda: lambda: gzip.compress(rendered_trip(), compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0),
+        number=20,
+    )
+    if brotli is not None:
+        add(
+            'compress.trip_detail.30d.brotli',
+            lambda: lambda: brotli.compress(rendered_trip(), quality=settings.COMPRESSION_BROTLI_QUALITY),
+            number=20,
+        )
+
+    # The views answer repeat requests from the response cache after the warm-up call
+    add('view.trip_logs.30d', lambda: lambda: client.get(f'/api/trips/{long_trip().id}/logs/'), number=5)
+    add('pdf.render_log', lambda: lambda: _render_pdf_log(long_trip().id, log_id()), number=5)
+    add(
+        'view.generate_pdf_log',
+        lambda: lambda: client.get(f'/api/trips/{long_trip().id}/logs/{log_id()}/pdf/'),
+        number=5,
+    )
+
+    # Every fixture log belongs to the same driver, so this streams all of them
+    def export():
+        long_trip()
+        log_dates = ELDLog.objects.aggregate(first=Min('log_date'), last=Max('log_date'))
+        return lambda: sum(
+            len(line) for line in ELDOutputFile('Driver', log_dates['first'], log_dates['last']).lines()
+        )
+
+    add(f'export.eld_output.{trip_count}x7d_30d', export)
+
+    # Bulk import of duty history; each run is rolled back so every repeat inserts the same rows
+    records = int(100000 * scale)
+
+    def import_history():
+        handle, history_path = tempfile.mkstemp(suffix='.csv')
+        os.close(handle)
+        atexit.register(os.remove, history_path)
+        data.write_duty_history_csv(history_path, records)
+
+        def run():
+            with transaction.atomic():
+                importer = DutyHistoryImporter()
+                importer.import_file(history_path)
+                importer.finish()
+                transaction.set_rollback(True)
+            return importer.stats
+        return run
+
+    add(f'import.duty_history.{records}records', import_history)
+
+    # A year of fleet-wide monthly totals and one driver's weekly totals, served from the driver-day rollup
+    fleet_drivers = max(1, int(200 * scale))
+
+    def fleet_month():
+        fleet_summaries()
+        return lambda: aggregate(date(2024, 1, 1), date(2024, 12, 31), 'month')
+
+    add(f'day_summaries.fleet_month.{fleet_drivers}drivers_365d', fleet_month, number=5)
+
+    def driver_summary():
+        fleet_summaries()
+        return lambda: client.get('/api/drivers/Fleet Driver 0/summary/?period=week&start=2024-01-01&end=2024-12-31')
+
+    add('view.driver_summary.week_365d', driver_summary, number=20)
+    return benchmarks
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[Dict]:
+    """Return the benchmarks whose best time is more than ``threshold`` slower than the baseline.
+
+    The minimum is compared rather than the median because it is the least
+    sensitive to scheduler noise on shared CI machines. When both runs carry a
+    ``calibration`` time (taken between the repeats) the ratio is scaled by
+    it, so a slower runner or a throttled stretch of the run is not reported
+    as a regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference: Optional[Dict] = baseline.get(name)
+        if not reference or not reference.get('min'):
+            continue
+        ratio = result['min'] / reference['min']
+        if result.get('calibration') and reference.get('calibration'):
+            ratio *= reference['calibration'] / result['calibration']
+        if ratio > 1 + threshold:
+            regressions.append({'name': name, 'baseline': reference['min'],
+                                'current': result['min'], 'ratio': ratio})
+    return regressions
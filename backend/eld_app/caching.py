@@ -0,0 +1,63 @@
+"""
+Conditional-GET support and server-side response caching for trip resources.
+
+A trip's route points, logs and duty statuses only change together with the
+trip itself, so the trip's ``updated_at`` acts as the version of every
+resource under ``/trips/<id>/``. ETags and cache keys are derived from it:
+any write that bumps ``updated_at`` makes all previously issued ETags and
+cached payloads stale at once. Code that changes child rows bumps it
+explicitly (trip creation and ``replan_trip`` save the trip in the same
+transaction, the admin calls ``touch_trips``); there are no per-row signal
+receivers, which would cost a query per row and rule out fast cascade deletes.
+"""
+import hashlib
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from . import metrics
+
+TRIP_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def trip_etag(trip_id: int, version: datetime, variant: str) -> str:
+    """Strong ETag for one representation (``variant``) of a trip at a given version"""
+    digest = hashlib.sha1(f'{trip_id}:{version.isoformat()}:{variant}'.encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def not_modified(request, etag: str, version: datetime):
+    """Return a 304 response if the client's validators still match, else None"""
+    return get_conditional_response(request, etag=etag, last_modified=int(version.timestamp()))
+
+
+def set_validators(response, etag: str, version: datetime):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(version.timestamp())
+    # Clients may keep the response but must revalidate, which costs a 304 at most
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cached_payload(trip_id: int, version: datetime, variant: str, build: Callable[[], object]):
+    """Return the cached payload for this trip version, building and storing it on a miss"""
+    key = f'trip:{trip_id}:{variant}:{version.timestamp()}'
+    payload = cache.get(key)
+    metrics.count_cache('trip_response', hit=payload is not None)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, TRIP_CACHE_TIMEOUT)
+    return payload
+
+
+def touch_trips(trip_ids: Iterable[Optional[int]]):
+    """Bump the version of trips whose child rows were changed outside of a trip save"""
+    from .models import Trip
+
+    trip_ids = {trip_id for trip_id in trip_ids if trip_id is not None}
+    if trip_ids:
+        Trip.objects.filter(id__in=trip_ids).update(updated_at=timezone.now())
@@ -0,0 +1,156 @@
+"""
+Per-driver, per-day hour totals (``DriverDaySummary``) for fleet reports and
+cycle lookups.
+
+Every path that writes logs (trip creation and edits, duty history imports)
+calls ``refresh_days`` with the ``(driver_name, log_date)`` keys it touched, in
+the same transaction, and those rows are recomputed from the logs. Recomputing
+rather than adding deltas keeps the rollup idempotent; ``reconcile`` repairs
+rows after writes that bypass these paths (admin deletes, raw SQL).
+Weekly and monthly reports group the rollup by day in the database and fold
+days into periods here, which avoids per-row date functions on SQLite.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import DriverDaySummary, ELDLog
+
+HOURS_FIELDS = ('off_duty_hours', 'sleeper_berth_hours', 'driving_hours', 'on_duty_hours')
+PERIODS = ('day', 'week', 'month')
+QUERY_BATCH = 500
+_TOLERANCE = 1e-6
+
+
+def _batches(items: List, size: int = QUERY_BATCH):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def log_totals(driver_names: Iterable[str], start: Optional[date] = None,
+               end: Optional[date] = None) -> Dict[Tuple[str, date], Dict]:
+    """Hour totals and log counts by ``(driver_name, log_date)``, summed from the logs themselves"""
+    totals = {}
+    for batch in _batches(sorted(set(driver_names))):
+        logs = ELDLog.objects.filter(driver_name__in=batch)
+        if start:
+            logs = logs.filter(log_date__gte=start)
+        if end:
+            logs = logs.filter(log_date__lte=end)
+        for row in logs.order_by().values('driver_name', 'log_date').annotate(
+            log_count=Count('id'), **{field: Sum(field) for field in HOURS_FIELDS}
+        ):
+            totals[(row.pop('driver_name'), row.pop('log_date'))] = row
+    return totals
+
+
+def refresh_days(keys: Iterable[Tuple[str, date]]):
+    """Recompute the summaries of ``(driver_name, log_date)`` keys from their logs; call inside the write's transaction"""
+    keys = set(keys)
+    if not keys:
+        return
+    days = [day for _, day in keys]
+    totals = log_totals({driver_name for driver_name, _ in keys}, min(days), max(days))
+    rows = [
+        DriverDaySummary(driver_name=driver_name, day=day, **totals[(driver_name, day)])
+        for driver_name, day in keys if (driver_name, day) in totals
+    ]
+    DriverDaySummary.objects.bulk_create(
+        rows, batch_size=QUERY_BATCH, update_conflicts=True, unique_fields=['driver_name', 'day'],
+        update_fields=[*HOURS_FIELDS, 'log_count', 'updated_at'],
+    )
+    # Days whose last log went away
+    gone = defaultdict(list)
+    for driver_name, day in keys:
+        if (driver_name, day) not in totals:
+            gone[driver_name].append(day)
+    if gone:
+        query = Q()
+        for driver_name, driver_days in gone.items():
+            query |= Q(driver_name=driver_name, day__in=driver_days)
+        DriverDaySummary.objects.filter(query).delete()
+
+
+def reconcile(driver_name: str, start: Optional[date] = None, end: Optional[date] = None,
+              apply: bool = True) -> Dict[str, int]:
+    """Compare a driver's summaries with their logs and (unless ``apply`` is false) fix the differences"""
+    expected = log_totals([driver_name], start, end)
+    stored = DriverDaySummary.objects.filter(driver_name=driver_name)
+    if start:
+        stored = stored.filter(day__gte=start)
+    if end:
+        stored = stored.filter(day__lte=end)
+    updated, deleted = [], []
+    now = timezone.now()
+    for summary in stored:
+        totals = expected.pop((driver_name, summary.day), None)
+        if totals is None:
+            deleted.append(summary.id)
+        elif summary.log_count != totals['log_count'] or any(
+            abs(getattr(summary, field) - totals[field]) > _TOLERANCE for field in HOURS_FIELDS
+        ):
+            for field, value in totals.items():
+                setattr(summary, field, value)
+            summary.updated_at = now
+            updated.append(summary)
+    created = [DriverDaySummary(driver_name=driver_name, day=day, **totals) for (_, day), totals in expected.items()]
+    if apply:
+        DriverDaySummary.objects.bulk_create(created, batch_size=QUERY_BATCH)
+        DriverDaySummary.objects.bulk_update(updated, [*HOURS_FIELDS, 'log_count', 'updated_at'], batch_size=QUERY_BATCH)
+        DriverDaySummary.objects.filter(id__in=deleted).delete()
+    return {'created': len(created), 'updated': len(updated), 'deleted': len(deleted)}
+
+
+def on_duty_history(driver_name: str, day: date, days: int = 7) -> List[Tuple[date, float]]:
+    """``(day, driving + on-duty hours)`` of the driver's ``days`` days before ``day``, oldest first"""
+    return [
+        (summary_day, driving + on_duty)
+        for summary_day, driving, on_duty in DriverDaySummary.objects.filter(
+            driver_name=driver_name, day__gte=day - timedelta(days=days), day__lt=day,
+        ).order_by('day').values_list('day', 'driving_hours', 'on_duty_hours')
+    ]
+
+
+def period_start(day: date, period: str) -> date:
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def period_end(start: date, period: str) -> date:
+    if period == 'week':
+        return start + timedelta(days=6)
+    if period == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return start
+
+
+def aggregate(start: date, end: date, period: str, driver_name: Optional[str] = None) -> List[Dict]:
+    """Hour totals per week, month or day between ``start`` and ``end``, for one driver or the whole fleet"""
+    summaries = DriverDaySummary.objects.filter(day__gte=start, day__lte=end)
+    if driver_name is not None:
+        summaries = summaries.filter(driver_name=driver_name)
+    periods: Dict[date, Dict] = {}
+    for row in summaries.order_by('day').values('day').annotate(
+        driver_days=Count('id'), **{field: Sum(field) for field in HOURS_FIELDS}
+    ):
+        key = period_start(row['day'], period)
+        bucket = periods.get(key)
+        if bucket is None:
+            bucket = periods[key] = {
+                'period_start': key, 'period_end': period_end(key, period), 'driver_days': 0,
+                **{field: 0.0 for field in HOURS_FIELDS},
+            }
+        bucket['driver_days'] += row['driver_days']
+        for field in HOURS_FIELDS:
+            bucket[field] += row[field]
+    results = list(periods.values())
+    for bucket in results:
+        for field in HOURS_FIELDS:
+            bucket[field] = round(bucket[field], 2)
+    return results
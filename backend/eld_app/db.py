@@ -0,0 +1,11 @@
+"""Per-connection database tuning"""
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created receiver enabling WAL so readers never block the single writer"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}')
+        cursor.execute(f'PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}')
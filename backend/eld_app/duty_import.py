@@ -0,0 +1,440 @@
+"""
+Bulk import of historical duty status records from other ELD providers.
+
+Two inputs are understood:
+
+* FMCSA ELD output files (the format ``eld_output`` writes): the driver comes
+  from the header, active duty status events (type 1) from the event list,
+  and every line's data check value is verified.
+* CSV files with a header row and the columns ``driver_name``, ``start_time``,
+  ``status`` (name or ELD event code 1-4) and optionally ``end_time``,
+  ``location`` and ``remarks``. Times without an offset are in
+  ``ELD_TIME_ZONE``.
+
+Records are parsed as a stream. Each status runs until the driver's next
+record (or its own ``end_time``), is cut at local midnights into daily
+``ELDLog`` rows, and is written with ``bulk_create`` in one transaction per
+chunk, together with the touched days' ``DriverDaySummary`` rows. Records
+whose driver and start time are already stored are skipped, so re-importing
+overlapping files is safe. After each chunk the importer reports a
+checkpoint (file line and the drivers' open records) from which an
+interrupted import resumes.
+"""
+import csv
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .eld_output import DUTY_STATUS_CODES, line_check_value
+from .day_summaries import refresh_days
+from .models import DutyStatus, ELDLog
+
+STATUS_BY_CODE = {str(code): status for status, code in DUTY_STATUS_CODES.items()}
+HOURS_FIELDS = {
+    'off_duty': 'off_duty_hours',
+    'sleeper_berth': 'sleeper_berth_hours',
+    'driving': 'driving_hours',
+    'on_duty': 'on_duty_hours',
+}
+STATUS_INDEX = {status: index for index, status in enumerate(HOURS_FIELDS)}
+QUERY_BATCH = 500  # ids per IN (...) clause, well under SQLite's parameter limit
+
+
+class DutyRecord(NamedTuple):
+    """One duty status change read from a file, with times in UTC"""
+    line: int
+    driver_name: str
+    start_time: datetime
+    status: str
+    end_time: Optional[datetime] = None
+    location: str = ''
+    remarks: str = ''
+
+
+class InvalidRecord(NamedTuple):
+    """A line that could not be imported, and why"""
+    line: int
+    reason: str
+
+
+def is_eld_output_file(path: str) -> bool:
+    with open(path, newline='') as f:
+        return f.readline().strip() == 'ELD File Header Segment:'
+
+
+def iter_records(path: str) -> Iterator:
+    """``DutyRecord`` or ``InvalidRecord`` items from a file, in file order"""
+    if is_eld_output_file(path):
+        return iter_eld_output_records(path)
+    return iter_csv_records(path)
+
+
+def iter_csv_records(path: str, time_zone: Optional[str] = None) -> Iterator:
+    tz = ZoneInfo(time_zone or settings.ELD_TIME_ZONE)
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = [column.strip().lower() for column in next(reader, [])]
+        if 'driver' in header and 'driver_name' not in header:
+            header[header.index('driver')] = 'driver_name'
+        missing = {'driver_name', 'start_time', 'status'} - set(header)
+        if missing:
+            yield InvalidRecord(1, f'missing columns: {", ".join(sorted(missing))}')
+            return
+        columns = {name: index for index, name in enumerate(header)}
+        width = len(header)
+        for line, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            if len(row) < width:
+                row = row + [''] * (width - len(row))
+            driver_name = row[columns['driver_name']].strip()
+            status = row[columns['status']].strip().lower()
+            status = STATUS_BY_CODE.get(status, status)
+            start_time = _parse_time(row[columns['start_time']], tz)
+            end_time = _parse_time(row[columns['end_time']], tz) if 'end_time' in columns else None
+            if not driver_name:
+                yield InvalidRecord(line, 'driver_name is empty')
+            elif status not in DUTY_STATUS_CODES:
+                yield InvalidRecord(line, f'unknown status {row[columns["status"]]!r}')
+            elif start_time is None:
+                yield InvalidRecord(line, f'invalid start_time {row[columns["start_time"]]!r}')
+            elif 'end_time' in columns and row[columns['end_time']].strip() and end_time is None:
+                yield InvalidRecord(line, f'invalid end_time {row[columns["end_time"]]!r}')
+            elif end_time is not None and end_time <= start_time:
+                yield InvalidRecord(line, 'end_time is not after start_time')
+            else:
+                yield DutyRecord(
+                    line, driver_name, start_time, status, end_time,
+                    row[columns['location']].strip() if 'location' in columns else '',
+                    row[columns['remarks']].strip() if 'remarks' in columns else '',
+                )
+
+
+def _parse_time(text: str, tz) -> Optional[datetime]:
+    """UTC datetime from ISO 8601 text (naive times are in ``tz``), or None"""
+    text = text.strip()
+    if not text:
+        return None
+    try:
+        value = datetime.fromisoformat(text)
+    except ValueError:
+        # fromisoformat is much faster but stricter (e.g. no trailing Z before 3.11)
+        value = parse_datetime(text)
+        if value is None:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz)
+    # In UTC, so that comparisons between records respect DST folds
+    return value.astimezone(dt_timezone.utc)
+
+
+def _header_time_zone(hours_behind_utc: int):
+    """Time zone for the header's offset: ``ELD_TIME_ZONE`` when it uses that offset, else a fixed offset"""
+    tz = ZoneInfo(settings.ELD_TIME_ZONE)
+    offset = -timedelta(hours=hours_behind_utc)
+    year = datetime.now().year
+    if offset in (tz.utcoffset(datetime(year, 1, 1)), tz.utcoffset(datetime(year, 7, 1))):
+        return tz
+    return dt_timezone(offset)
+
+
+def iter_eld_output_records(path: str) -> Iterator:
+    section = None
+    header_lines: List[List[str]] = []
+    driver_name = ''
+    tz = ZoneInfo(settings.ELD_TIME_ZONE)
+    previous: Optional[datetime] = None
+    with open(path, newline='') as f:
+        for line, text in enumerate(f, start=1):
+            text = text.rstrip('\r\n')
+            if not text:
+                continue
+            if text.endswith(':') and ',' not in text:
+                section = text[:-1]
+                continue
+            if section is None or section == 'End of File':
+                continue
+            body, _, check = text.rpartition(',')
+            try:
+                valid = int(check, 16) == line_check_value(body)
+            except ValueError:
+                valid = False
+            if not valid:
+                yield InvalidRecord(line, 'line data check value does not match')
+                continue
+            fields = body.split(',')
+
+            if section == 'ELD File Header Segment':
+                header_lines.append(fields)
+                if len(header_lines) == 1:
+                    driver_name = ' '.join(name for name in (fields[1], fields[0]) if name)
+                elif len(header_lines) == 4 and len(fields) > 4 and fields[4].isdigit():
+                    # Event times are local to the home terminal, whose offset is given as hours behind UTC
+                    tz = _header_time_zone(int(fields[4]))
+            elif section == 'ELD Event List':
+                if len(fields) < 7:
+                    yield InvalidRecord(line, 'too few fields for an event')
+                    continue
+                record_status, event_type, code = fields[1], fields[3], fields[4]
+                if record_status != '1' or event_type != '1':
+                    continue  # inactive records and events other than duty status changes
+                if code not in STATUS_BY_CODE:
+                    yield InvalidRecord(line, f'unknown duty status code {code!r}')
+                    continue
+                try:
+                    start_time = datetime.strptime(fields[5] + fields[6], '%m%d%y%H%M%S').replace(tzinfo=tz)
+                except ValueError:
+                    yield InvalidRecord(line, f'invalid event date/time {fields[5]} {fields[6]}')
+                    continue
+                if not driver_name:
+                    yield InvalidRecord(line, 'event before the driver header')
+                    continue
+                start_time, later = start_time.astimezone(dt_timezone.utc), start_time.replace(fold=1).astimezone(dt_timezone.utc)
+                if previous is not None and start_time <= previous < later:
+                    # Local times repeat when DST ends; events are in order, so take the second occurrence
+                    start_time = later
+                previous = start_time
+                yield DutyRecord(line, driver_name, start_time, STATUS_BY_CODE[code])
+
+
+class DutyHistoryImporter:
+    """Turns a stream of duty records into daily logs and duty statuses, written chunk by chunk"""
+
+    def __init__(self, chunk_size: int = 20000, time_zone: Optional[str] = None, strict: bool = False):
+        self.chunk_size = chunk_size
+        self.strict = strict
+        self.time_zone = ZoneInfo(time_zone or settings.ELD_TIME_ZONE)
+        self.pending: Dict[str, DutyRecord] = {}
+        self.segments: List[Tuple] = []
+        self.log_ids: Dict[Tuple[str, object], int] = {}
+        self._created = set()  # logs this run created, which hold no earlier statuses to de-duplicate against
+        self._day: Optional[Tuple[date, datetime, datetime]] = None
+        self.stats = {'imported': 0, 'duplicates': 0, 'invalid': 0, 'out_of_order': 0, 'logs_created': 0}
+        self.errors: List[InvalidRecord] = []
+
+    def import_file(self, path: str, resume_line: int = 0, on_chunk=None):
+        """Import the records after line ``resume_line`` of one file.
+
+        ``on_chunk(line)`` is called after each committed chunk. The drivers'
+        last records stay open, since the next file may continue them; call
+        ``finish`` after the last file.
+        """
+        last_line = resume_line
+        for record in iter_records(path):
+            if record.line <= resume_line:
+                continue
+            last_line = record.line
+            if isinstance(record, InvalidRecord):
+                self._reject(record, 'invalid')
+                continue
+            self.add(record)
+            if len(self.segments) >= self.chunk_size:
+                self.flush()
+                if on_chunk:
+                    on_chunk(last_line)
+        self.flush()
+        if on_chunk:
+            on_chunk(last_line)
+
+    def finish(self):
+        """Close the drivers' open records and write them"""
+        self.close_pending()
+        self.flush()
+
+    def add(self, record: DutyRecord):
+        previous = self.pending.get(record.driver_name)
+        if previous is not None:
+            if record.start_time == previous.start_time:
+                self.stats['duplicates'] += 1
+                return
+            if record.start_time < previous.start_time:
+                self._reject(InvalidRecord(record.line, 'starts before the driver\'s previous record'), 'out_of_order')
+                return
+            self._close(previous, record.start_time)
+        self.pending[record.driver_name] = record
+
+    def _reject(self, record: InvalidRecord, counter: str):
+        """Count a rejected record; in strict mode stop the import (earlier chunks stay committed)"""
+        if self.strict:
+            raise ValueError(f'line {record.line}: {record.reason}')
+        self.stats[counter] += 1
+        if len(self.errors) < 100:
+            self.errors.append(record)
+
+    def close_pending(self):
+        """End the drivers' open records at their own end time or the next local midnight"""
+        for record in self.pending.values():
+            self._close(record, None)
+        self.pending.clear()
+
+    def _close(self, record: DutyRecord, next_start: Optional[datetime]):
+        end = record.end_time
+        if next_start is not None and (end is None or next_start < end):
+            end = next_start
+        # Times are kept as naive UTC: local times in a DST fold or gap never compare equal to the
+        # values read back for de-duplication, and dropping tzinfo once here saves it per write
+        start = record.start_time.astimezone(dt_timezone.utc).replace(tzinfo=None)
+        end = end.astimezone(dt_timezone.utc).replace(tzinfo=None) if end is not None else self._local_day(start)[2]
+        # Cut at local midnights: each piece belongs to its own day's log
+        while start < end:
+            log_date, day_start, day_end = self._local_day(start)
+            piece_end = end if end < day_end else day_end
+            self.segments.append(((record.driver_name, log_date), start, piece_end, record.status,
+                                  record.location, record.remarks))
+            start = piece_end
+
+    def _local_day(self, moment: datetime) -> Tuple[date, datetime, datetime]:
+        """Local date of a naive UTC time and that day's start and end in naive UTC (the last answer is reused)"""
+        day = self._day
+        if day is None or not day[1] <= moment < day[2]:
+            log_date = moment.replace(tzinfo=dt_timezone.utc).astimezone(self.time_zone).date()
+            day = self._day = (log_date, _naive_utc(datetime.combine(log_date, time(), tzinfo=self.time_zone)),
+                               _naive_utc(datetime.combine(log_date + timedelta(days=1), time(), tzinfo=self.time_zone)))
+        return day
+
+    def flush(self):
+        """Write the buffered segments, their logs and the logs' hour totals in one transaction.
+
+        Duty statuses are inserted with one ``executemany`` rather than
+        ``bulk_create``: building a model instance and compiling every field
+        per row costs several times more than the insert itself.
+        """
+        if not self.segments:
+            return
+        segments, self.segments = self.segments, []
+        table = connection.ops.quote_name(DutyStatus._meta.db_table)
+        to_db = self._db_datetime()
+        with transaction.atomic(), connection.cursor() as cursor:
+            log_ids = self._ensure_logs({segment[0] for segment in segments})
+            existing = set()
+            for batch in _batches(set(log_ids.values()) - self._created):
+                cursor.execute(
+                    f'SELECT eld_log_id, start_time FROM {table} WHERE eld_log_id IN ({", ".join(["%s"] * len(batch))})',
+                    batch,
+                )
+                existing.update((log_id, _naive_utc(start)) for log_id, start in cursor.fetchall())
+            rows = []
+            hours: Dict[int, List[float]] = {}
+            for key, start, end, status, location, remarks in segments:
+                log_id = log_ids[key]
+                start_key = (log_id, start)
+                if start_key in existing:
+                    self.stats['duplicates'] += 1
+                    continue
+                existing.add(start_key)
+                rows.append((log_id, to_db(start), to_db(end), status, location[:255], remarks))
+                totals = hours.get(log_id)
+                if totals is None:
+                    totals = hours[log_id] = [0.0, 0.0, 0.0, 0.0]
+                totals[STATUS_INDEX[status]] += (end - start).total_seconds() / 3600
+            cursor.executemany(
+                f'INSERT INTO {table} (eld_log_id, start_time, end_time, status, location, remarks) '
+                f'VALUES (%s, %s, %s, %s, %s, %s)',
+                rows,
+            )
+            # Totals grow by the new statuses' hours; existing hours are left as they are
+            assignments = ', '.join(f'{field} = {field} + %s' for field in HOURS_FIELDS.values())
+            cursor.executemany(
+                f'UPDATE {connection.ops.quote_name(ELDLog._meta.db_table)} SET {assignments} WHERE id = %s',
+                [(*totals, log_id) for log_id, totals in hours.items()],
+            )
+            refresh_days({segment[0] for segment in segments})
+        self.stats['imported'] += len(rows)
+
+    @staticmethod
+    def _db_datetime():
+        """Converter from naive UTC datetimes to the database's parameter values"""
+        if connection.features.supports_timezones:
+            return lambda value: value.replace(tzinfo=dt_timezone.utc)
+        # Backends without time zone support (SQLite) store naive text in the connection's time zone,
+        # as DateTimeField.get_db_prep_value would, without its per-value overhead
+        if connection.timezone_name == 'UTC':
+            return str
+        db_timezone = connection.timezone
+        return lambda value: str(value.replace(tzinfo=dt_timezone.utc).astimezone(db_timezone).replace(tzinfo=None))
+
+    def _ensure_logs(self, keys) -> Dict[Tuple[str, date], int]:
+        """Ids of the imported (trip-less) logs for ``(driver_name, log_date)`` keys, creating missing ones"""
+        missing = [key for key in keys if key not in self.log_ids]
+        if missing:
+            self._load_log_ids(missing)
+            to_create = [key for key in missing if key not in self.log_ids]
+            if to_create:
+                # Like the statuses, new logs are inserted with executemany and their ids read back
+                # by (driver_name, log_date): bulk_create fits only ~60 of these 16-column rows per
+                # statement on SQLite
+                fields = [field for field in ELDLog._meta.concrete_fields if not field.primary_key]
+                now = timezone.now()
+                defaults = [
+                    field.get_db_prep_save(now if field.name == 'created_at' else field.get_default(), connection)
+                    for field in fields
+                ]
+                driver_index = next(i for i, field in enumerate(fields) if field.name == 'driver_name')
+                date_index = next(i for i, field in enumerate(fields) if field.name == 'log_date')
+                date_field = fields[date_index]
+                rows = []
+                for driver_name, log_date in to_create:
+                    row = list(defaults)
+                    row[driver_index] = driver_name
+                    row[date_index] = date_field.get_db_prep_save(log_date, connection)
+                    rows.append(row)
+                quote = connection.ops.quote_name
+                with connection.cursor() as cursor:
+                    cursor.executemany(
+                        f'INSERT INTO {quote(ELDLog._meta.db_table)} ({", ".join(quote(f.column) for f in fields)}) '
+                        f'VALUES ({", ".join(["%s"] * len(fields))})',
+                        rows,
+                    )
+                created = self._load_log_ids(to_create)
+                self._created.update(created)
+                self.stats['logs_created'] += len(created)
+        return {key: self.log_ids[key] for key in keys}
+
+    def _load_log_ids(self, keys) -> List[int]:
+        """Record the ids of existing imported logs for ``keys``; returns the ids found"""
+        found = []
+        dates = [log_date for _, log_date in keys]
+        for drivers in _batches({driver_name for driver_name, _ in keys}):
+            for driver_name, log_date, log_id in ELDLog.objects.filter(
+                trip__isnull=True, driver_name__in=drivers, log_date__range=(min(dates), max(dates))
+            ).values_list('driver_name', 'log_date', 'id'):
+                if (driver_name, log_date) not in self.log_ids:
+                    self.log_ids[(driver_name, log_date)] = log_id
+                    found.append(log_id)
+        return found
+
+    def pending_state(self) -> Dict:
+        """Open records as JSON-safe data, for checkpoints"""
+        return {
+            driver_name: [record.line, record.start_time.isoformat(), record.status,
+                          record.end_time.isoformat() if record.end_time else None, record.location, record.remarks]
+            for driver_name, record in self.pending.items()
+        }
+
+    def restore_pending(self, state: Dict):
+        self.pending = {
+            driver_name: DutyRecord(line, driver_name, parse_datetime(start), status,
+                                    parse_datetime(end) if end else None, location, remarks)
+            for driver_name, (line, start, status, end, location, remarks) in state.items()
+        }
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """An aware datetime, or one read from the database, as naive UTC.
+
+    SQLite returns naive values in the connection's time zone.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=connection.timezone)
+    return value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+
+
+def _batches(values) -> Iterator[List]:
+    values = list(values)
+    for start in range(0, len(values), QUERY_BATCH):
+        yield values[start:start + QUERY_BATCH]
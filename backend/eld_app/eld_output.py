@@ -0,0 +1,222 @@
+"""
+FMCSA ELD output file (49 CFR part 395, subpart B, appendix section 4.8.2):
+the comma-separated transfer file handed over at roadside inspections and
+audits, one file per driver.
+
+Files are produced line by line from ``ELDLog``/``DutyStatus`` querysets read
+with ``.iterator()``, so an export holds one chunk of rows in memory however
+many days or drivers it covers. Every data line ends with its line data check
+value, duty status events carry an event data check value, and the file ends
+with the file data check value (section 4.4.5). ``stream()`` serves the same
+lines to the ASGI server as an async iterator, a batch at a time.
+"""
+import re
+from datetime import date, datetime
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterable, Iterator, List
+from zoneinfo import ZoneInfo
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .models import DutyStatus, ELDLog
+
+LINE_END = '\r\n'
+
+# Event type 1 (change in driver's duty status) codes
+DUTY_STATUS_CODES = {
+    'off_duty': 1,
+    'sleeper_berth': 2,
+    'driving': 3,
+    'on_duty': 4,
+}
+RECORD_STATUS_ACTIVE = 1
+RECORD_ORIGIN_DRIVER = 2  # entered by the driver (planned, not recorded by an engine-connected device)
+MANUAL_LOCATION = 'M'
+
+
+def _char_value(char: str) -> int:
+    """Numeric equivalent of a character for check values: ASCII code minus 48 for letters and digits, else 0"""
+    return ord(char) - 48 if char.isascii() and char.isalnum() else 0
+
+
+def _rotate_left(value: int, bits: int, width: int) -> int:
+    mask = (1 << width) - 1
+    return ((value << bits) | (value >> (width - bits))) & mask
+
+
+def event_check_value(fields: Iterable[str]) -> str:
+    """Event data check value over an event's fields, as two hex digits"""
+    total = sum(_char_value(char) for field in fields for char in field) & 0xFF
+    return f'{_rotate_left(total, 3, 8) ^ 0xC3:02X}'
+
+
+def line_check_value(line: str) -> int:
+    """Line data check value of a line's text (without the value itself)"""
+    total = sum(_char_value(char) for char in line) & 0xFF
+    return _rotate_left(total, 3, 8) ^ 0x96
+
+
+def file_check_value(line_values_total: int) -> str:
+    """File data check value from the sum of all line data check values, as four hex digits"""
+    return f'{_rotate_left(line_values_total & 0xFFFF, 3, 16) ^ 0x969C:04X}'
+
+
+def _text(value, limit: int = 60) -> str:
+    """Free text made safe for the comma-separated format"""
+    return re.sub(r'[,\r\n]+', ' ', str(value or '')).strip()[:limit]
+
+
+class ELDOutputFile:
+    """The output file of one driver's logs dated ``start`` through ``end``"""
+
+    def __init__(self, driver_name: str, start: date, end: date, comment: str = '', chunk_size: int = 2000):
+        self.driver_name = driver_name
+        self.start = start
+        self.end = end
+        self.comment = comment
+        self.chunk_size = chunk_size
+        self.time_zone = ZoneInfo(settings.ELD_TIME_ZONE)
+        self._line_values_total = 0
+
+    @property
+    def logs(self):
+        return ELDLog.objects.filter(driver_name=self.driver_name, log_date__range=(self.start, self.end))
+
+    @property
+    def statuses(self):
+        return DutyStatus.objects.filter(
+            eld_log__driver_name=self.driver_name, eld_log__log_date__range=(self.start, self.end)
+        ).order_by('start_time', 'id')
+
+    @property
+    def username(self) -> str:
+        return re.sub(r'[^A-Za-z0-9]', '', self.driver_name).lower()[:60] or 'driver'
+
+    def filename(self) -> str:
+        last_name = re.sub(r'[^A-Za-z]', '', self._names()[0])[:5] or 'ELD'
+        return f'{last_name}{self.end:%m%d%y}-{self.username[:30]}.csv'
+
+    def _names(self):
+        """(last name, first name) from the driver's display name"""
+        parts = self.driver_name.split()
+        if len(parts) < 2:
+            return (self.driver_name, '')
+        return (parts[-1], ' '.join(parts[:-1]))
+
+    def _line(self, *fields) -> str:
+        text = ','.join(str(field) for field in fields)
+        value = line_check_value(text)
+        self._line_values_total += value
+        return f'{text},{value:02X}{LINE_END}'
+
+    def _local(self, moment: datetime):
+        local = moment.astimezone(self.time_zone)
+        return f'{local:%m%d%y}', f'{local:%H%M%S}'
+
+    def lines(self) -> Iterator[str]:
+        """The file, one line at a time"""
+        self._line_values_total = 0
+        vehicles = self._vehicle_orders()
+        yield from self._header()
+
+        yield f'User List:{LINE_END}'
+        last_name, first_name = self._names()
+        yield self._line(1, 'D', _text(last_name, 30), _text(first_name, 30))
+
+        yield f'CMV List:{LINE_END}'
+        for vehicle, order in vehicles.items():
+            yield self._line(order, _text(vehicle, 10), '')
+
+        yield f'ELD Event List:{LINE_END}'
+        sequence = 0
+        for start_time, status, vehicle in self.statuses.values_list(
+            'start_time', 'status', 'eld_log__vehicle_number'
+        ).iterator(chunk_size=self.chunk_size):
+            sequence += 1
+            yield self._event(sequence, start_time, status, vehicles.get(vehicle, 1))
+
+        yield f'ELD Event Annotations or Comments:{LINE_END}'
+        sequence = 0
+        for start_time, location, remarks in self.statuses.values_list(
+            'start_time', 'location', 'remarks'
+        ).iterator(chunk_size=self.chunk_size):
+            sequence += 1
+            if remarks or location:
+                event_date, event_time = self._local(start_time)
+                yield self._line(f'{sequence & 0xFFFF:X}', self.username, _text(remarks), event_date, event_time,
+                                 _text(location))
+
+        yield f"Driver's Certification/Recertification Actions:{LINE_END}"
+        for log_date, created_at, vehicle in self.logs.order_by('log_date', 'id').values_list(
+            'log_date', 'created_at', 'vehicle_number'
+        ).iterator(chunk_size=self.chunk_size):
+            sequence += 1
+            event_date, event_time = self._local(created_at)
+            yield self._line(f'{sequence & 0xFFFF:X}', 1, event_date, event_time, f'{log_date:%m%d%y}',
+                             vehicles.get(vehicle, 1))
+
+        # This system records no malfunctions, logins or engine events
+        yield f'Malfunctions and Data Diagnostic Events:{LINE_END}'
+        yield f'ELD Login/Logout Report:{LINE_END}'
+        yield f'CMV Engine Power-Up and Shut Down Activity:{LINE_END}'
+        yield f'Unidentified Vehicle Profile Records:{LINE_END}'
+        yield f'End of File:{LINE_END}'
+        yield f'{file_check_value(self._line_values_total)}{LINE_END}'
+
+    async def stream(self, lines_per_chunk: int = 500) -> AsyncIterator[str]:
+        """The file in chunks of ``lines_per_chunk`` lines, read from ``lines()`` without blocking the event loop"""
+        lines = self.lines()
+        # Thread-sensitive calls all run in the same thread, which owns the queryset cursors
+        next_chunk = sync_to_async(lambda: ''.join(islice(lines, lines_per_chunk)))
+        try:
+            while chunk := await next_chunk():
+                yield chunk
+        finally:
+            await sync_to_async(lines.close)()
+
+    def _vehicle_orders(self) -> Dict[str, int]:
+        """CMV order numbers, by first use"""
+        vehicles: Dict[str, int] = {}
+        for vehicle in self.logs.order_by('log_date', 'id').values_list('vehicle_number', flat=True).iterator(
+            chunk_size=self.chunk_size
+        ):
+            vehicles.setdefault(vehicle, len(vehicles) + 1)
+        return vehicles
+
+    def _header(self) -> Iterator[str]:
+        latest = self.logs.order_by('-log_date', '-id').values_list('carrier_name', 'vehicle_number').first()
+        carrier_name, vehicle = latest or ('', '')
+        offset = -self.time_zone.utcoffset(datetime.combine(self.end, datetime.min.time())).total_seconds() / 3600
+        now_date, now_time = self._local(timezone.now())
+        last_name, first_name = self._names()
+
+        yield f'ELD File Header Segment:{LINE_END}'
+        yield self._line(_text(last_name, 35), _text(first_name, 35), self.username, '', '')
+        yield self._line('', '', '')
+        yield self._line(_text(vehicle, 10), '', '')
+        yield self._line(settings.CARRIER_USDOT_NUMBER, _text(carrier_name, 120), 8, '000000', f'{offset:02.0f}')
+        yield self._line('', 0)
+        yield self._line(now_date, now_time, MANUAL_LOCATION, MANUAL_LOCATION, 0, '0.0')
+        yield self._line(settings.ELD_REGISTRATION_ID, settings.ELD_IDENTIFIER, '', _text(self.comment))
+
+    def _event(self, sequence: int, start_time: datetime, status: str, vehicle_order: int) -> str:
+        event_date, event_time = self._local(start_time)
+        code = DUTY_STATUS_CODES[status]
+        check = event_check_value([
+            '1', str(code), event_date, event_time, '0', '0.0', MANUAL_LOCATION, MANUAL_LOCATION,
+            str(vehicle_order), self.username,
+        ])
+        return self._line(
+            f'{sequence & 0xFFFF:X}', RECORD_STATUS_ACTIVE, RECORD_ORIGIN_DRIVER, 1, code, event_date, event_time,
+            0, '0.0', MANUAL_LOCATION, MANUAL_LOCATION, 0, vehicle_order, 1, 0, 0, check,
+        )
+
+
+def drivers_with_logs(start: date, end: date) -> List[str]:
+    """Drivers with at least one log dated ``start`` through ``end``"""
+    return list(
+        ELDLog.objects.filter(log_date__range=(start, end))
+        .order_by('driver_name').values_list('driver_name', flat=True).distinct()
+    )
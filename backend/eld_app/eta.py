@@ -0,0 +1,355 @@
+"""
+ETA engine: turns a planned route into timestamps for its stops and a duty
+status timeline for the driver's logs.
+
+Driving time comes from per-segment free-flow speeds along the route geometry
+(from OpenRouteService steps or road-graph edges, else the route's average
+speed), scaled by a time-of-day speed profile in the home terminal's time
+zone. Stops add their dwell time, and the HOS clocks (30-minute break after 8
+hours of driving, 11-hour driving limit, 14-hour window, 70-hour/8-day cycle)
+insert breaks and rest periods where the plan did not already provide them.
+Everything is computed in a single forward pass over the segment arrays.
+"""
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+
+from .geo import LegScale, PolylineIndex
+from .log_records import DutySegment
+
+# Share of free-flow speed by local hour of day (0-23), slower in the morning and evening peaks
+DEFAULT_SPEED_PROFILE = (
+    1.05, 1.05, 1.05, 1.05, 1.05, 1.0, 0.9, 0.8, 0.8, 0.9, 1.0, 1.0,
+    1.0, 1.0, 1.0, 0.95, 0.85, 0.8, 0.9, 1.0, 1.0, 1.0, 1.0, 1.0,
+)
+
+# Duty status logged while the driver is at each kind of stop
+STOP_STATUS = {
+    'start': 'on_duty',
+    'pickup': 'on_duty',
+    'fuel': 'on_duty',
+    'dropoff': 'on_duty',
+    'rest': 'sleeper_berth',
+}
+
+MAX_DRIVING_BEFORE_BREAK = 8.0
+BREAK_HOURS = 0.5
+MAX_DRIVING_HOURS = 11.0
+MAX_WINDOW_HOURS = 14.0
+MIN_REST_HOURS = 10.0
+MAX_CYCLE_HOURS = 70.0
+RESTART_HOURS = 34.0
+
+_EPSILON = 1e-9
+_MICROSECOND = timedelta(microseconds=1)
+_MINUTE = 60_000_000  # microseconds
+
+
+class RouteSegments:
+    """Route split into geometry segments: cumulative route miles at each segment end and its speed (mph)"""
+
+    def __init__(self, ends: array, speeds: array):
+        self.ends = ends
+        self.speeds = speeds
+        self._hours: Optional[array] = None
+
+    @classmethod
+    def from_route(cls, route_index: PolylineIndex, total_distance: float, total_duration: float,
+                   segment_speeds: Optional[Sequence[float]] = None,
+                   scale: Optional[LegScale] = None) -> 'RouteSegments':
+        """Build segments in route miles; segments without a known speed use the route's average.
+
+        ``scale`` maps the polyline onto route miles leg by leg; without it the
+        whole polyline is scaled to ``total_distance`` at once.
+        """
+        average = (total_distance / total_duration if total_duration else 0) or 60
+        scale = scale or LegScale([0.0, total_distance], [0.0, route_index.length])
+        ends = array('d')
+        speeds = array('d')
+        for i in range(1, len(route_index)):
+            speed = segment_speeds[i - 1] if segment_speeds and i - 1 < len(segment_speeds) else 0
+            speed = speed if speed > 0 else average
+            end = scale.to_route(route_index.cumulative[i])
+            if speeds and speeds[-1] == speed:
+                # Runs at one speed (e.g. the vertices of one ORS step) are a single segment
+                ends[-1] = end
+            else:
+                ends.append(end)
+                speeds.append(speed)
+        if not ends or ends[-1] < total_distance:
+            # Degenerate geometry: cover the rest of the route at the average speed
+            ends.append(total_distance)
+            speeds.append(average)
+        return cls(ends, speeds)
+
+    def mileage_after(self, hours: float) -> float:
+        """Route miles covered by ``hours`` of driving at the segment speeds"""
+        cumulative = self._cumulative_hours()
+        i = bisect_left(cumulative, hours)
+        if i == len(cumulative):
+            return self.ends[-1]
+        start = self.ends[i - 1] if i else 0.0
+        return start + (hours - (cumulative[i - 1] if i else 0.0)) * self.speeds[i]
+
+    def hours_to(self, mileage: float) -> float:
+        """Hours of driving at the segment speeds from the start to ``mileage``"""
+        cumulative = self._cumulative_hours()
+        i = bisect_left(self.ends, mileage)
+        if i == len(self.ends):
+            return cumulative[-1]
+        start = self.ends[i - 1] if i else 0.0
+        return (cumulative[i - 1] if i else 0.0) + max(0.0, mileage - start) / self.speeds[i]
+
+    def _cumulative_hours(self) -> array:
+        if self._hours is None:
+            self._hours = array('d')
+            hours = start = 0.0
+            for end, speed in zip(self.ends, self.speeds):
+                hours += (end - start) / speed
+                start = end
+                self._hours.append(hours)
+        return self._hours
+
+
+class DutyClock:
+    """HOS clocks and the duty status timeline recorded so far"""
+
+    def __init__(self, now: datetime, cycle_used: float):
+        self.now = now
+        self.cycle_used = cycle_used
+        self.driving_since_break = 0.0
+        self.driving_in_shift = 0.0
+        self.shift_started: Optional[datetime] = None
+        self.resting_since: Optional[datetime] = None
+        self.timeline: List[Dict] = []
+
+    def record(self, status: str, hours: float, location: str, remarks: str = ''):
+        if hours <= 0:
+            return
+        start = self.now
+        self.now = start + timedelta(hours=hours)
+        last = self.timeline[-1] if self.timeline else None
+        if last and status == 'driving' and last['status'] == 'driving' and last['end_time'] == start:
+            last['end_time'] = self.now
+        else:
+            self.timeline.append({
+                'start_time': start,
+                'end_time': self.now,
+                'status': status,
+                'location': location,
+                'remarks': remarks,
+            })
+
+        if status in ('driving', 'on_duty'):
+            self.resting_since = None
+            self.cycle_used += hours
+            if self.shift_started is None:
+                self.shift_started = start
+        if status == 'driving':
+            self.driving_since_break += hours
+            self.driving_in_shift += hours
+        elif hours >= BREAK_HOURS - _EPSILON:
+            # Any 30 consecutive minutes not driving satisfy the break requirement
+            self.driving_since_break = 0.0
+        if status in ('off_duty', 'sleeper_berth'):
+            # Rest periods count as consecutive hours off duty, whichever mix of statuses makes them up
+            if self.resting_since is None:
+                self.resting_since = start
+            rested = self.rested_hours()
+            if rested >= MIN_REST_HOURS - _EPSILON:
+                self.driving_in_shift = 0.0
+                self.shift_started = None
+            if rested >= RESTART_HOURS - _EPSILON:
+                self.cycle_used = 0.0
+
+    def rested_hours(self) -> float:
+        """Consecutive hours off duty or in the sleeper berth up to now"""
+        if self.resting_since is None:
+            return 0.0
+        return (self.now - self.resting_since).total_seconds() / 3600
+
+    def driving_available(self) -> float:
+        """Hours the driver may still drive before a break or rest is required"""
+        window_used = (self.now - self.shift_started).total_seconds() / 3600 if self.shift_started else 0.0
+        return min(
+            MAX_DRIVING_BEFORE_BREAK - self.driving_since_break,
+            MAX_DRIVING_HOURS - self.driving_in_shift,
+            MAX_WINDOW_HOURS - window_used,
+            MAX_CYCLE_HOURS - self.cycle_used,
+        )
+
+    def take_required_rest(self, location: str, rest_status: str):
+        """Insert the break or rest period that unblocks driving, counting rest already under way"""
+        window_used = (self.now - self.shift_started).total_seconds() / 3600 if self.shift_started else 0.0
+        rested = self.rested_hours()
+        if self.cycle_used >= MAX_CYCLE_HOURS - _EPSILON:
+            self.record('off_duty', RESTART_HOURS - rested, location, '34-hour restart (70-hour/8-day limit reached)')
+        elif self.driving_in_shift >= MAX_DRIVING_HOURS - _EPSILON or window_used >= MAX_WINDOW_HOURS - _EPSILON:
+            self.record(rest_status, MIN_REST_HOURS - rested, location, '10-hour rest (11-hour/14-hour limit reached)')
+        else:
+            self.record('off_duty', BREAK_HOURS - rested, location, 'MANDATORY 30-minute break after 8 hours driving')
+
+
+class ETAEngine:
+    """Schedules a route's stops and builds the driver's duty timeline"""
+
+    def __init__(self, profile: Sequence[float] = DEFAULT_SPEED_PROFILE, time_zone: Optional[str] = None):
+        self.profile = profile
+        self.time_zone = ZoneInfo(time_zone or settings.ELD_TIME_ZONE)
+
+    def schedule(self, segments: RouteSegments, points: List[Dict], departure: datetime,
+                 cycle_used: float = 0.0, rest_status: str = 'sleeper_berth') -> List[Dict]:
+        """Set ``estimated_arrival``/``estimated_departure`` on ``points`` and return the duty timeline.
+
+        ``points`` must be sorted by ``mileage`` and carry ``duration_hours``
+        (dwell) and ``type``; the first point is the departure.
+        """
+        clock = DutyClock(departure, cycle_used)
+        ends, speeds = segments.ends, segments.speeds
+        segment = 0
+        mileage = 0.0
+
+        for point in points:
+            target = point['mileage']
+            while mileage < target - _EPSILON:
+                while segment < len(ends) - 1 and ends[segment] <= mileage + _EPSILON:
+                    segment += 1
+                available = clock.driving_available()
+                if available <= _EPSILON:
+                    clock.take_required_rest(f'En route (mile {mileage:.0f})', rest_status)
+                    continue
+                local = clock.now.astimezone(self.time_zone)
+                speed = speeds[segment] * self.profile[local.hour]
+                to_hour_end = (60 - local.minute - local.second / 60 - local.microsecond / 6e7) / 60
+                # The last segment runs to the final stop even if rounding left it a little short
+                segment_end = target if segment == len(ends) - 1 else min(ends[segment], target)
+                to_segment_end = (segment_end - mileage) / speed
+                step = min(to_segment_end, to_hour_end, available)
+                clock.record('driving', step, 'En route')
+                mileage = segment_end if step == to_segment_end else mileage + step * speed
+
+            point['estimated_arrival'] = clock.now
+            window_start = point.get('window_start')
+            if window_start and clock.now < window_start:
+                clock.record('off_duty', (window_start - clock.now).total_seconds() / 3600,
+                             point['location'], 'Waiting for appointment window')
+            clock.record(STOP_STATUS.get(point['type'], 'on_duty'), point.get('duration_hours', 0),
+                         point['location'], self._stop_remarks(point))
+            point['estimated_departure'] = clock.now
+
+        for entry in clock.timeline:
+            if entry['status'] == 'driving':
+                hours = (entry['end_time'] - entry['start_time']).total_seconds() / 3600
+                entry['remarks'] = f'Driving for {hours:.1f} hours'
+        return clock.timeline
+
+    def _stop_remarks(self, point: Dict) -> str:
+        hours = point.get('duration_hours', 0)
+        labels = {
+            'start': 'Pre-trip inspection',
+            'pickup': 'Pickup',
+            'fuel': 'Fueling',
+            'rest': '10-hour rest in sleeper berth',
+            'dropoff': 'Drop-off',
+        }
+        return f'{labels.get(point["type"], point["type"].title())} ({hours:.1f} hours)'
+
+
+class DayGrid:
+    """A duty timeline as integer microsecond offsets from its first local midnight.
+
+    ``midnights`` holds the local midnights (in UTC) from the first day the
+    timeline touches to the day after the last.
+    """
+
+    def __init__(self, first_day: date, midnights: List[datetime], entries: List[Tuple[int, int, Dict]]):
+        self.first_day = first_day
+        self.midnights = midnights
+        self.entries = entries
+
+    @property
+    def origin(self) -> datetime:
+        return self.midnights[0]
+
+    @classmethod
+    def from_timeline(cls, timeline: List[Dict], time_zone: Optional[str] = None) -> 'DayGrid':
+        tz = ZoneInfo(time_zone or settings.ELD_TIME_ZONE)
+        first_day = timeline[0]['start_time'].astimezone(tz).date()
+        last_day = (timeline[-1]['end_time'] - timedelta(microseconds=1)).astimezone(tz).date()
+        midnights = [_utc_midnight(first_day + timedelta(days=i), tz) for i in range((last_day - first_day).days + 2)]
+        origin = midnights[0]
+        # Exact integer offsets, so totals at a limit (exactly 11 hours of driving) pick up no float error
+        entries = [
+            ((entry['start_time'] - origin) // _MICROSECOND, (entry['end_time'] - origin) // _MICROSECOND, entry)
+            for entry in timeline
+        ]
+        return cls(first_day, midnights, entries)
+
+    def split(self) -> List[Tuple[date, datetime, List[DutySegment]]]:
+        """Cut the timeline at local midnights into per-day segments, padded with off-duty time.
+
+        Returns ``(log_date, day_start, segments)`` for every calendar day the
+        timeline touches; ``day_start`` is the local midnight in UTC and each
+        day's segments are minute offsets from it, summing to that day's length.
+        """
+        entries, origin = self.entries, self.origin
+        days = []
+        index = 0
+        for i, (day_start, day_end) in enumerate(zip(self.midnights, self.midnights[1:])):
+            low = (day_start - origin) // _MICROSECOND
+            high = (day_end - origin) // _MICROSECOND
+            segments = []
+            cursor = low
+            # Entries are contiguous and ordered, so each day resumes where the previous one stopped
+            while index < len(entries) and entries[index][0] < high:
+                entry_start, entry_end, entry = entries[index]
+                start = max(entry_start, low)
+                end = min(entry_end, high)
+                if start > cursor:
+                    segments.append(DutySegment((cursor - low) / _MINUTE, (start - low) / _MINUTE,
+                                                'off_duty', 'Terminal', 'Off duty'))
+                if end > start:
+                    segments.append(DutySegment((start - low) / _MINUTE, (end - low) / _MINUTE,
+                                                entry['status'], entry['location'], entry['remarks']))
+                    cursor = end
+                if entry_end > high:
+                    break
+                index += 1
+            if cursor < high:
+                segments.append(DutySegment((cursor - low) / _MINUTE, (high - low) / _MINUTE,
+                                            'off_duty', 'Terminal', 'Off duty'))
+            days.append((self.first_day + timedelta(days=i), day_start, segments))
+        return days
+
+
+def split_by_day(timeline: List[Dict], time_zone: Optional[str] = None) -> List[Tuple[date, datetime, List[DutySegment]]]:
+    """Cut a duty timeline at local midnights into per-day segments (see ``DayGrid.split``)"""
+    if not timeline:
+        return []
+    return DayGrid.from_timeline(timeline, time_zone).split()
+
+
+def first_midnight(timeline: List[Dict], time_zone: Optional[str] = None) -> Tuple[date, datetime]:
+    """The first local day a duty timeline touches and its midnight in UTC"""
+    tz = ZoneInfo(time_zone or settings.ELD_TIME_ZONE)
+    first_day = timeline[0]['start_time'].astimezone(tz).date()
+    return first_day, _utc_midnight(first_day, tz)
+
+
+def utc_offsets(first_day: date, end: datetime, time_zone: Optional[str] = None) -> Tuple[timedelta, ...]:
+    """The UTC offsets at the local midnights from ``first_day`` through the one after ``end``.
+
+    Two timelines alike relative to their first midnight, with equal offsets,
+    also meet the later midnights alike, so one is the other shifted.
+    """
+    tz = ZoneInfo(time_zone or settings.ELD_TIME_ZONE)
+    days = (end.astimezone(tz).date() - first_day).days + 2
+    return tuple(datetime.combine(first_day + timedelta(days=i), time(), tzinfo=tz).utcoffset() for i in range(days))
+
+
+def _utc_midnight(day: date, tz: ZoneInfo) -> datetime:
+    return datetime.combine(day, datetime.min.time(), tzinfo=tz).astimezone(dt_timezone.utc)
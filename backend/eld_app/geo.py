@@ -0,0 +1,119 @@
+"""Geometry helpers for placing points along route polylines"""
+import math
+from array import array
+from bisect import bisect_right
+from typing import Sequence, Tuple
+
+EARTH_RADIUS_MILES = 3958.8
+
+
+def haversine_miles(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in miles"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+class PolylineIndex:
+    """Cumulative-distance index over a route polyline.
+
+    Built once in O(n) from ``[lng, lat]`` pairs (the ORS/GeoJSON order used in
+    ``route_geometry``); afterwards any mileage can be turned into coordinates in
+    O(log n) by binary search over the cumulative distances plus linear
+    interpolation within the segment.
+    """
+
+    def __init__(self, geometry: Sequence[Sequence[float]]):
+        self.lngs = array('d')
+        self.lats = array('d')
+        self.cumulative = array('d')
+        total = 0.0
+        for lng, lat in ((point[0], point[1]) for point in geometry):
+            if self.lats:
+                total += haversine_miles(self.lats[-1], self.lngs[-1], lat, lng)
+            self.lngs.append(lng)
+            self.lats.append(lat)
+            self.cumulative.append(total)
+
+    def __len__(self) -> int:
+        return len(self.cumulative)
+
+    @property
+    def length(self) -> float:
+        """Total polyline length in miles"""
+        return self.cumulative[-1] if self.cumulative else 0.0
+
+    def locate(self, miles: float) -> Tuple[float, float]:
+        """Return the ``(lat, lng)`` found ``miles`` along the polyline (clamped to its ends)"""
+        if not self.cumulative:
+            raise ValueError('Cannot locate a point on an empty polyline')
+        if miles <= 0 or len(self) == 1:
+            return (self.lats[0], self.lngs[0])
+        if miles >= self.length:
+            return (self.lats[-1], self.lngs[-1])
+
+        # Segment i runs from vertex i to vertex i + 1
+        i = bisect_right(self.cumulative, miles) - 1
+        segment = self.cumulative[i + 1] - self.cumulative[i]
+        t = (miles - self.cumulative[i]) / segment if segment else 0.0
+        return (
+            self.lats[i] + (self.lats[i + 1] - self.lats[i]) * t,
+            self.lngs[i] + (self.lngs[i + 1] - self.lngs[i]) * t,
+        )
+
+    def mileage_of(self, lat: float, lng: float) -> float:
+        """Mileage of the vertex closest to ``(lat, lng)``; a linear scan, meant for a handful of waypoints"""
+        best_index = 0
+        best_distance = math.inf
+        cos_lat = math.cos(math.radians(lat))
+        for i in range(len(self)):
+            # Equirectangular distance is enough to rank nearby vertices
+            dx = (self.lngs[i] - lng) * cos_lat
+            dy = self.lats[i] - lat
+            distance = dx * dx + dy * dy
+            if distance < best_distance:
+                best_distance = distance
+                best_index = i
+        return self.cumulative[best_index] if self.cumulative else 0.0
+
+
+
+class LegScale:
+    """Piecewise-linear map between route miles and polyline miles, anchored at the waypoints.
+
+    Routers report distances that differ from the length of the drawn geometry
+    (straight-line fallback, simplified ORS polylines). Scaling each leg on its
+    own keeps a point's position independent of the legs after it, so editing
+    the last stop of a trip does not move the stops before it.
+    """
+
+    def __init__(self, route_miles: Sequence[float], polyline_miles: Sequence[float]):
+        self.route_miles = list(route_miles)
+        self.polyline_miles = list(polyline_miles)
+
+    @property
+    def total_distance(self) -> float:
+        return self.route_miles[-1]
+
+    def to_polyline(self, miles: float) -> float:
+        """Polyline mileage of a point ``miles`` along the route"""
+        return _interpolate(miles, self.route_miles, self.polyline_miles)
+
+    def to_route(self, polyline_miles: float) -> float:
+        """Route mileage of a point ``polyline_miles`` along the polyline"""
+        return _interpolate(polyline_miles, self.polyline_miles, self.route_miles)
+
+
+def _interpolate(x: float, xs: Sequence[float], ys: Sequence[float]) -> float:
+    """``y`` at ``x`` on the line through the non-decreasing anchors ``xs``, clamped to its ends"""
+    if x <= xs[0]:
+        return ys[0]
+    if x >= xs[-1]:
+        return ys[-1]
+    # Among anchors sharing a mileage (zero-length legs) the last one starts the next leg
+    i = bisect_right(xs, x) - 1
+    span = xs[i + 1] - xs[i]
+    return ys[i] + (x - xs[i]) * (ys[i + 1] - ys[i]) / span if span else ys[i]
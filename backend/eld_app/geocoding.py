@@ -0,0 +1,219 @@
+"""
+Coordinated access to Nominatim, whose usage policy allows about one request
+per second per client.
+
+Every gunicorn worker on a host shares one token bucket kept in a small
+``flock``-protected file, so bursts are spread out instead of being throttled.
+Lookups for the same address are coalesced: within a process the first caller
+makes the upstream request and the others wait on it, and across processes
+the worker holding a per-address ``flock`` next to the token bucket file makes
+the call while the others wait for its result to appear in the ``geocode``
+cache. The lock is taken atomically whatever the cache backend, and the kernel
+releases it if its worker dies mid-request. Results (including "not found")
+are kept in that cache; once they pass ``GEOCODE_CACHE_TTL`` they are
+refreshed, but remain available as a stale answer for callers whose
+``GEOCODE_BUDGET_SECONDS`` runs out while queued.
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import struct
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+Coords = Tuple[float, float]
+
+_NOT_FOUND_TTL = 60 * 60  # Retry unknown addresses hourly rather than on every request
+_POLL_INTERVAL = 0.05
+
+
+def cache_key(address: str) -> str:
+    return 'geocode:' + hashlib.sha1(' '.join(address.lower().split()).encode()).hexdigest()
+
+
+class TokenBucket:
+    """Token bucket shared by all processes on the host through a locked state file"""
+
+    _state = struct.Struct('<dd')  # tokens, last refill (unix time)
+
+    def __init__(self, path: str, rate: float, burst: float):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available and return 0, else return the seconds until one will be"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            now = time.time()
+            data = os.pread(fd, self._state.size, 0)
+            tokens, updated = self._state.unpack(data) if len(data) == self._state.size else (self.burst, now)
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            os.pwrite(fd, self._state.pack(tokens, now), 0)
+            return wait
+        finally:
+            os.close(fd)  # also releases the lock
+
+    def acquire(self, deadline: float) -> bool:
+        """Wait for a token until ``deadline`` (``time.monotonic()`` based); False if none came in time"""
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry: Optional[Dict] = None
+
+
+class GeocodeCoordinator:
+    """Cached, rate-limited and coalesced geocoding lookups"""
+
+    def __init__(self):
+        self.bucket = TokenBucket(settings.GEOCODE_RATE_LIMIT_FILE, settings.GEOCODE_RATE_PER_SECOND,
+                                  settings.GEOCODE_BURST)
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Call] = {}
+
+    @property
+    def cache(self):
+        return caches['geocode']
+
+    def lookup(self, address: str, fetch: Callable[[str], Optional[Coords]]) -> Optional[Coords]:
+        """Coordinates for ``address``, calling ``fetch`` upstream only when needed.
+
+        Returns None when the address is unknown, or when the latency budget ran
+        out with no answer, fresh or stale, available.
+        """
+        key = cache_key(address)
+        entry = self.cache.get(key)
+        if entry is not None and self._is_fresh(entry):
+            metrics.count_cache('geocode', hit=True)
+            return self._coords(entry)
+        metrics.count_cache('geocode', hit=False)
+        deadline = time.monotonic() + settings.GEOCODE_BUDGET_SECONDS
+
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+        if not leader:
+            metrics.count_upstream('nominatim', 'coalesced')
+            call.done.wait(max(0.0, deadline - time.monotonic()))
+            return self._coords(call.entry or entry)
+
+        try:
+            call.entry = self._fetch_once(key, address, fetch, deadline) or entry
+        finally:
+            call.done.set()
+            with self._lock:
+                self._inflight.pop(key, None)
+        return self._coords(call.entry)
+
+    def _fetch_once(self, key: str, address: str, fetch, deadline: float) -> Optional[Dict]:
+        """Fetch across processes: one worker calls upstream while the others poll the cache"""
+        lock = self._try_lock(key)
+        if lock is None:
+            metrics.count_upstream('nominatim', 'coalesced')
+            while time.monotonic() < deadline:
+                time.sleep(_POLL_INTERVAL)
+                entry = self.cache.get(key)
+                if entry is not None and self._is_fresh(entry):
+                    return entry
+            metrics.count_upstream('nominatim', 'budget_exhausted')
+            return None
+
+        fd, path = lock
+        try:
+            # The previous holder may have stored the result after this caller checked the cache
+            entry = self.cache.get(key)
+            if entry is not None and self._is_fresh(entry):
+                return entry
+            if not self.bucket.acquire(deadline):
+                metrics.count_upstream('nominatim', 'budget_exhausted')
+                return None
+            try:
+                coords = fetch(address)
+            except Exception as e:
+                metrics.count_upstream('nominatim', 'error')
+                logger.warning("Geopy geocoding error: %s", e)
+                return None
+            metrics.count_upstream('nominatim', 'ok' if coords else 'not_found')
+            entry = {'coords': list(coords) if coords else None, 'at': time.time()}
+            # Entries outlive their freshness so they can still serve as a stale answer
+            self.cache.set(key, entry, timeout=None)
+            return entry
+        finally:
+            # Unlinked while still held, so whoever locks a new file re-checks the cache first
+            os.unlink(path)
+            os.close(fd)
+
+    def _try_lock(self, key: str) -> Optional[Tuple[int, str]]:
+        """Take the host-wide lock for ``key`` without blocking; None if another process holds it"""
+        lock_dir = f'{settings.GEOCODE_RATE_LIMIT_FILE}.inflight'
+        os.makedirs(lock_dir, exist_ok=True)
+        path = os.path.join(lock_dir, key.partition(':')[2])
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return None
+            try:
+                if os.stat(path).st_ino == os.fstat(fd).st_ino:
+                    return fd, path
+            except FileNotFoundError:
+                pass
+            # Locked a file its previous holder had already unlinked; try the current one
+            os.close(fd)
+
+    def is_cached(self, address: str) -> bool:
+        """Whether a fresh result for ``address`` is already cached"""
+        entry = self.cache.get(cache_key(address))
+        return entry is not None and self._is_fresh(entry)
+
+    def _is_fresh(self, entry: Dict) -> bool:
+        ttl = settings.GEOCODE_CACHE_TTL if entry['coords'] else _NOT_FOUND_TTL
+        return time.time() - entry['at'] < ttl
+
+    def _coords(self, entry: Optional[Dict]) -> Optional[Coords]:
+        if not entry or not entry['coords']:
+            return None
+        return tuple(entry['coords'])
+
+
+_coordinator: Optional[GeocodeCoordinator] = None
+
+
+def get_coordinator() -> GeocodeCoordinator:
+    global _coordinator
+    if _coordinator is None:
+        _coordinator = GeocodeCoordinator()
+    return _coordinator
+
+
+def lookup(address: str, fetch: Callable[[str], Optional[Coords]]) -> Optional[Coords]:
+    return get_coordinator().lookup(address, fetch)
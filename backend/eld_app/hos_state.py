@@ -0,0 +1,299 @@
+"""
+Running HOS state of each driver, kept up to date from the duty status events
+their in-cab devices report.
+
+An event closes the span of the driver's previous status, and only that span's
+hours are added to the clocks: driving since the last 30-minute break, driving
+in the shift, the start of the 14-hour window, consecutive rest (10 hours end
+the shift, 34 hours restart the cycle) and on-duty hours per local day for the
+70-hour/8-day cycle. Daily hours live in eight buckets indexed by day ordinal
+mod 8, so moving to a new day clears at most eight buckets and the cycle total
+is a sum of eight numbers. Each event therefore costs the same however long the
+driver's history is.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
+
+from .eta import (
+    BREAK_HOURS, MAX_CYCLE_HOURS, MAX_DRIVING_BEFORE_BREAK, MAX_DRIVING_HOURS, MAX_WINDOW_HOURS, MIN_REST_HOURS,
+    RESTART_HOURS,
+)
+from .log_records import ShiftHours
+from .models import DriverHOSState, DutyEvent, DutyStatus
+
+CYCLE_DAYS = 8
+ON_DUTY_STATUSES = ('driving', 'on_duty')
+
+_EPSILON = 1e-9
+
+
+class HOSClock:
+    """A driver's HOS clocks as of the start of their current status"""
+
+    def __init__(self, time_zone: Optional[str] = None):
+        self.time_zone = ZoneInfo(time_zone or settings.ELD_TIME_ZONE)
+        self.current_status = ''
+        self.status_since: Optional[datetime] = None
+        self.driving_since_break = 0.0
+        self.driving_in_shift = 0.0
+        self.shift_started: Optional[datetime] = None
+        self.resting_since: Optional[datetime] = None
+        self.cycle_day: Optional[date] = None
+        self.cycle_hours = [0.0] * CYCLE_DAYS
+
+    @classmethod
+    def from_state(cls, state: DriverHOSState) -> 'HOSClock':
+        clock = cls()
+        clock.current_status = state.current_status
+        clock.status_since = state.status_since
+        clock.driving_since_break = state.driving_since_break
+        clock.driving_in_shift = state.driving_in_shift
+        clock.shift_started = state.shift_started
+        clock.resting_since = state.resting_since
+        clock.cycle_day = state.cycle_day
+        clock.cycle_hours = list(state.cycle_hours) or [0.0] * CYCLE_DAYS
+        return clock
+
+    def save_to(self, state: DriverHOSState):
+        state.current_status = self.current_status
+        state.status_since = self.status_since
+        state.driving_since_break = self.driving_since_break
+        state.driving_in_shift = self.driving_in_shift
+        state.shift_started = self.shift_started
+        state.resting_since = self.resting_since
+        state.cycle_day = self.cycle_day
+        state.cycle_hours = self.cycle_hours
+
+    def copy(self) -> 'HOSClock':
+        clock = HOSClock.__new__(HOSClock)
+        clock.__dict__.update(self.__dict__)
+        clock.cycle_hours = list(self.cycle_hours)
+        return clock
+
+    def change_status(self, status: str, at: datetime):
+        """Close the current status at ``at`` and start ``status``"""
+        if self.current_status and self.status_since is not None:
+            self._close_span(self.current_status, self.status_since, at)
+        self.current_status = status
+        self.status_since = at
+
+    def _close_span(self, status: str, start: datetime, end: datetime):
+        hours = (end - start).total_seconds() / 3600
+        if hours <= 0:
+            return
+        if status in ON_DUTY_STATUSES:
+            self.resting_since = None
+            if self.shift_started is None:
+                self.shift_started = start
+            self._add_cycle_hours(start, end)
+            if status == 'driving':
+                self.driving_since_break += hours
+                self.driving_in_shift += hours
+            elif hours >= BREAK_HOURS - _EPSILON:
+                # 30 consecutive minutes not driving satisfy the break requirement
+                self.driving_since_break = 0.0
+        else:
+            # Off duty and sleeper berth time count together as consecutive rest
+            if self.resting_since is None:
+                self.resting_since = start
+            rested = (end - self.resting_since).total_seconds() / 3600
+            if rested >= BREAK_HOURS - _EPSILON:
+                self.driving_since_break = 0.0
+            if rested >= MIN_REST_HOURS - _EPSILON:
+                self.driving_in_shift = 0.0
+                self.shift_started = None
+            if rested >= RESTART_HOURS - _EPSILON:
+                self.cycle_hours = [0.0] * CYCLE_DAYS
+            self._advance_cycle_day(end.astimezone(self.time_zone).date())
+
+    def _add_cycle_hours(self, start: datetime, end: datetime):
+        """Add on-duty time to the buckets of the local days it falls on"""
+        # Only the last eight days of a span can still count toward the cycle
+        start = max(start, end - timedelta(days=CYCLE_DAYS))
+        local = start.astimezone(self.time_zone)
+        while start < end:
+            day = local.date()
+            day_end = datetime.combine(day + timedelta(days=1), time(), tzinfo=self.time_zone)
+            piece_end = min(end, day_end)
+            self._advance_cycle_day(day)
+            self.cycle_hours[day.toordinal() % CYCLE_DAYS] += (piece_end - start).total_seconds() / 3600
+            start, local = piece_end, day_end
+
+    def _advance_cycle_day(self, day: date):
+        """Make ``day`` the latest bucketed day, clearing the buckets of the days that fell out of the cycle"""
+        if self.cycle_day is not None and day <= self.cycle_day:
+            return
+        if self.cycle_day is not None:
+            for offset in range(1, min((day - self.cycle_day).days, CYCLE_DAYS) + 1):
+                self.cycle_hours[(self.cycle_day.toordinal() + offset) % CYCLE_DAYS] = 0.0
+        else:
+            self.cycle_hours = [0.0] * CYCLE_DAYS
+        self.cycle_day = day
+
+    def cycle_used(self) -> float:
+        return sum(self.cycle_hours)
+
+    def remaining(self, now: datetime) -> Dict:
+        """Hours left on each clock at ``now``, counting the current status as running until then"""
+        clock = self.copy()
+        if clock.current_status and clock.status_since is not None and now > clock.status_since:
+            clock._close_span(clock.current_status, clock.status_since, now)
+        clock._advance_cycle_day(now.astimezone(self.time_zone).date())
+        window_used = (now - clock.shift_started).total_seconds() / 3600 if clock.shift_started else 0.0
+        cycle_used = clock.cycle_used()
+        window = max(0.0, MAX_WINDOW_HOURS - window_used)
+        cycle = max(0.0, MAX_CYCLE_HOURS - cycle_used)
+        until_break = max(0.0, MAX_DRIVING_BEFORE_BREAK - clock.driving_since_break)
+        drive = min(max(0.0, MAX_DRIVING_HOURS - clock.driving_in_shift), window, cycle, until_break)
+        return {
+            'as_of': now,
+            'current_status': self.current_status,
+            'status_since': self.status_since,
+            'drive_remaining': round(drive, 2),
+            'until_break': round(until_break, 2),
+            'window_remaining': round(window, 2),
+            'cycle_remaining': round(cycle, 2),
+            'cycle_used': round(cycle_used, 2),
+            'shift_started': clock.shift_started,
+        }
+
+
+class ShiftTracker:
+    """Per-day HOS figures measured over whole shifts, fed one day of duty statuses at a time.
+
+    Shifts and rests cross midnight, so a day is checked against the most
+    driving in a shift and since a break reached during it, counting the hours
+    before midnight, and against the longest rest ending on it. A rest still
+    running at the end of the day, or the time before the first duty status
+    fed, may extend past what was fed and is taken as long enough. The clocks follow
+    ``HOSClock`` but work on plain hours.
+    """
+
+    def __init__(self):
+        self.driving_since_break = 0.0
+        self.driving_in_shift = 0.0
+        self.rested: Optional[float] = None  # Hours of the current rest, None while on duty
+        self.on_duty_seen = False
+
+    def day(self, statuses: Iterable[Tuple[str, float]]) -> ShiftHours:
+        """Feed one day's ``(status, hours)`` in time order and return its figures"""
+        driving = continuous = rest = 0.0
+        for status, hours in statuses:
+            if hours <= 0:
+                continue
+            if status in ON_DUTY_STATUSES:
+                if self.rested is not None or not self.on_duty_seen:
+                    rest = max(rest, self._rest_hours())
+                    self.rested = None
+                self.on_duty_seen = True
+                if status == 'driving':
+                    self.driving_since_break += hours
+                    self.driving_in_shift += hours
+                    driving = max(driving, self.driving_in_shift)
+                    continuous = max(continuous, self.driving_since_break)
+                elif hours >= BREAK_HOURS - _EPSILON:
+                    self.driving_since_break = 0.0
+            else:
+                self.rested = (self.rested or 0.0) + hours
+                if self.rested >= BREAK_HOURS - _EPSILON:
+                    self.driving_since_break = 0.0
+                if self.rested >= MIN_REST_HOURS - _EPSILON:
+                    self.driving_in_shift = 0.0
+        if self.rested is not None:
+            rest = max(rest, self.rested, MIN_REST_HOURS)
+        # Sums of segment lengths pick up float error, while the limits are whole hours
+        return ShiftHours(round(driving, 6), round(continuous, 6), round(rest, 6))
+
+    def _rest_hours(self) -> float:
+        rested = self.rested or 0.0
+        return rested if self.on_duty_seen else max(rested, MIN_REST_HOURS)
+
+
+def ingest_events(driver_name: str, events: Iterable[Dict], now: datetime) -> Dict:
+    """Append a batch of a driver's duty events and advance their HOS state.
+
+    Events are applied in sequence order. A sequence number already stored is
+    a replay and is skipped, so devices can resend a batch safely; a new
+    sequence number at or below the last applied one, or an event earlier than
+    the driver's current status, is rejected.
+    """
+    events = sorted(events, key=lambda event: event['sequence'])
+    accepted: List[DutyEvent] = []
+    duplicates = 0
+    rejected = []
+    with transaction.atomic():
+        state, _ = DriverHOSState.objects.select_for_update().get_or_create(driver_name=driver_name)
+        stored = set(DutyEvent.objects.filter(
+            driver_name=driver_name, sequence__in=[event['sequence'] for event in events]
+        ).values_list('sequence', flat=True))
+        clock = HOSClock.from_state(state)
+        last_sequence = state.last_sequence
+        for event in events:
+            sequence = event['sequence']
+            if sequence in stored:
+                duplicates += 1
+                continue
+            if sequence <= last_sequence:
+                rejected.append({'sequence': sequence, 'error': f'sequence is not after {last_sequence}'})
+                continue
+            if clock.status_since is not None and event['event_time'] < clock.status_since:
+                rejected.append({'sequence': sequence, 'error': 'event_time is before the current status began'})
+                continue
+            clock.change_status(event['status'], event['event_time'])
+            accepted.append(DutyEvent(
+                driver_name=driver_name, sequence=sequence, status=event['status'],
+                event_time=event['event_time'], location=event.get('location', ''),
+                remarks=event.get('remarks', ''),
+            ))
+            stored.add(sequence)
+            last_sequence = sequence
+        if accepted:
+            DutyEvent.objects.bulk_create(accepted)
+            clock.save_to(state)
+            state.last_sequence = last_sequence
+            state.save()
+    return {
+        'driver_name': driver_name,
+        'accepted': len(accepted),
+        'duplicates': duplicates,
+        'rejected': rejected,
+        'last_sequence': state.last_sequence,
+        'hos': clock.remaining(max(now, clock.status_since or now)),
+    }
+
+
+def current_clocks(driver_names: Sequence[str], now: datetime) -> Dict[str, Dict]:
+    """Remaining hours at ``now`` for each driver, in two queries however many drivers are asked for.
+
+    Drivers with recorded events use their running state; the others replay
+    their stored (planned) duty statuses of the last eight days up to ``now``,
+    and are off duty once those end.
+    """
+    clocks = {}
+    for state in DriverHOSState.objects.filter(driver_name__in=driver_names):
+        clocks[state.driver_name] = HOSClock.from_state(state).remaining(now)
+    replayed: Dict[str, HOSClock] = {}
+    ends: Dict[str, datetime] = {}
+    for driver_name, status, start_time, end_time in DutyStatus.objects.filter(
+        eld_log__driver_name__in=[name for name in driver_names if name not in clocks],
+        start_time__lte=now, end_time__gt=now - timedelta(days=CYCLE_DAYS + 1),
+    ).order_by('eld_log__driver_name', 'start_time').values_list(
+        'eld_log__driver_name', 'status', 'start_time', 'end_time'
+    ):
+        clock = replayed.setdefault(driver_name, HOSClock())
+        if clock.status_since is None or start_time >= clock.status_since:
+            if driver_name in ends and ends[driver_name] < start_time:
+                clock.change_status('off_duty', ends[driver_name])
+            clock.change_status(status, start_time)
+            ends[driver_name] = max(end_time, ends.get(driver_name, end_time))
+    for driver_name, clock in replayed.items():
+        if ends[driver_name] < now:
+            clock.change_status('off_duty', ends[driver_name])
+        clocks[driver_name] = clock.remaining(now)
+    for driver_name in driver_names:
+        clocks.setdefault(driver_name, HOSClock().remaining(now))
+    return clocks
@@ -0,0 +1,181 @@
+"""
+Live remaining-hours clocks pushed to dashboards over Server-Sent Events.
+
+Each ASGI worker runs one ``ClockBroadcaster`` task for all of its
+connections. Every ``LIVE_CLOCK_POLL_SECONDS`` it asks the database which of
+the watched drivers' HOS states changed (one query however many dashboards
+are connected), recomputes those drivers' clocks once, encodes each as an SSE
+frame once and hands the same bytes to every subscriber's queue. All watched
+drivers are also recomputed every ``LIVE_CLOCK_REFRESH_SECONDS``, since the
+clocks run down while a status continues. A dashboard that stops reading
+loses its oldest frames rather than slowing the others down.
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Max
+from django.utils import timezone
+
+from .hos_state import current_clocks
+from .models import DriverHOSState
+from .renderers import encode_event
+
+QUEUE_SIZE = 16
+COMMIT_SLACK_SECONDS = 5
+
+
+def _changed_states(since: Optional[datetime]):
+    """``(driver_name, updated_at)`` of event-fed states updated after ``since``, or the latest update time"""
+    if since is None:
+        return [], DriverHOSState.objects.aggregate(latest=Max('updated_at'))['latest']
+    # Look back a little: a state saved just before ``since`` may commit after this poll ran
+    changed = list(DriverHOSState.objects.filter(
+        updated_at__gt=since - timedelta(seconds=COMMIT_SLACK_SECONDS)
+    ).values_list('driver_name', 'updated_at'))
+    return changed, max([updated_at for _, updated_at in changed] + [since])
+
+
+def _load_clocks(driver_names, now: datetime) -> Dict[str, Dict]:
+    close_old_connections()
+    try:
+        return current_clocks(list(driver_names), now)
+    finally:
+        close_old_connections()
+
+
+def _load_changes(since: Optional[datetime]):
+    close_old_connections()
+    try:
+        return _changed_states(since)
+    finally:
+        close_old_connections()
+
+
+class ClockBroadcaster:
+    """Fans clock updates for watched drivers out to subscribed SSE connections"""
+
+    def __init__(self, poll_seconds: float, refresh_seconds: float):
+        self.poll_seconds = poll_seconds
+        self.refresh_seconds = refresh_seconds
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self.frames: Dict[str, bytes] = {}
+        self._pending: Set[str] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._since: Optional[datetime] = None
+        self._seen: Dict[str, datetime] = {}  # state update time behind each driver's last frame
+        self.frames_sent = 0
+        self.computations = 0
+
+    def subscribe(self, driver_names: Iterable[str]) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        for driver_name in driver_names:
+            self.subscribers[driver_name].add(queue)
+            frame = self.frames.get(driver_name)
+            if frame is not None:
+                queue.put_nowait(frame)
+            else:
+                self._pending.add(driver_name)
+        self._ensure_running()
+        if self._pending:
+            self._wake.set()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, driver_names: Iterable[str]):
+        for driver_name in driver_names:
+            queues = self.subscribers.get(driver_name)
+            if queues is None:
+                continue
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[driver_name]
+                self.frames.pop(driver_name, None)
+                self._seen.pop(driver_name, None)
+        if not self.subscribers and self._wake is not None:
+            self._wake.set()  # let the polling task exit
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wake = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_refresh = loop.time()
+        while self.subscribers:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            watched = set(self.subscribers)
+            if not watched:
+                break
+            if loop.time() >= next_refresh:
+                due = watched
+                next_refresh = loop.time() + self.refresh_seconds
+            else:
+                changed, self._since = await sync_to_async(_load_changes)(self._since)
+                due = {driver_name for driver_name, updated_at in changed
+                       if driver_name in watched and self._seen.get(driver_name) != updated_at}
+                self._seen.update((driver_name, updated_at) for driver_name, updated_at in changed
+                                  if driver_name in due)
+                due |= self._pending & watched
+            self._pending.clear()
+            if due:
+                await self._publish(due)
+
+    async def _publish(self, driver_names: Set[str]):
+        clocks = await sync_to_async(_load_clocks)(driver_names, timezone.now())
+        self.computations += len(clocks)
+        for driver_name, clock in clocks.items():
+            frame = encode_event('clock', {'driver_name': driver_name, **clock})
+            self.frames[driver_name] = frame
+            for queue in self.subscribers.get(driver_name, ()):
+                if queue.full():
+                    queue.get_nowait()  # a slow reader skips stale clocks
+                queue.put_nowait(frame)
+                self.frames_sent += 1
+
+
+_broadcaster: Optional[ClockBroadcaster] = None
+
+
+def broadcaster() -> ClockBroadcaster:
+    """This worker's broadcaster"""
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = ClockBroadcaster(settings.LIVE_CLOCK_POLL_SECONDS, settings.LIVE_CLOCK_REFRESH_SECONDS)
+    return _broadcaster
+
+
+async def clock_events(driver_names, keepalive_seconds: float, max_seconds: float):
+    """SSE body for one connection: clock frames for ``driver_names``, with keep-alive comments.
+
+    The stream ends after ``max_seconds`` and the browser's EventSource
+    reconnects (getting the current frames straight from the cache); Django
+    does not stop a streaming response when its client goes away, so this
+    bounds how long an abandoned connection stays subscribed.
+    """
+    hub = broadcaster()
+    queue = hub.subscribe(driver_names)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_seconds
+    try:
+        yield b'retry: 1000\n\n'
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                yield await asyncio.wait_for(queue.get(), timeout=min(keepalive_seconds, remaining))
+            except asyncio.TimeoutError:
+                yield b': keep-alive\n\n'
+    finally:
+        hub.unsubscribe(queue, driver_names)
@@ -0,0 +1,5 @@
+"""
+Load-testing harness: a local stand-in for OpenRouteService and Nominatim
+(``stub_server``) and a traffic driver that replays mixed API requests against
+one or more gunicorn worker configurations (``driver``).
+"""
@@ -0,0 +1,137 @@
+"""Closed-loop traffic driver replaying a weighted mix of API requests"""
+import random
+import threading
+import time
+from typing import Dict, List, Tuple
+
+import requests
+
+from ..benchmarks.data import CITIES
+
+DEFAULT_MIX = {'create_trip': 1, 'list_trips': 4, 'calculate_route': 2, 'pdf': 1}
+
+# Street addresses miss the gazetteer, so they exercise the geocoding upstream
+STREETS = ['Main St', 'Oak Ave', 'Pine Rd', 'Maple Dr', 'Cedar Ln', 'Elm St']
+TOWNS = ['Springfield', 'Riverton', 'Lakeside', 'Fairview', 'Georgetown', 'Franklin']
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    """Parse ``create_trip=1,list_trips=4`` into a weight mapping"""
+    mix = {}
+    for part in filter(None, (item.strip() for item in text.split(','))):
+        name, _, weight = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise ValueError(f'Unknown operation {name!r}; choose from {", ".join(DEFAULT_MIX)}')
+        mix[name] = int(weight or 1)
+    return mix
+
+
+class LoadDriver:
+    def __init__(self, base_url: str, mix: Dict[str, int] = None, concurrency: int = 8,
+                 duration: float = 30.0, seed_trips: int = 3, timeout: float = 60.0):
+        self.base_url = base_url.rstrip('/')
+        self.mix = mix or dict(DEFAULT_MIX)
+        self.concurrency = concurrency
+        self.duration = duration
+        self.seed_trips = seed_trips
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._samples: List[Tuple[str, float, bool]] = []
+        self._pdf_targets: List[Tuple[int, int]] = []
+
+    def run(self) -> Dict:
+        self._seed()
+        deadline = time.monotonic() + self.duration
+        threads = [threading.Thread(target=self._worker, args=(deadline, i)) for i in range(self.concurrency)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self._report(time.monotonic() - started)
+
+    def _seed(self):
+        """Create a few trips up front so PDF requests have logs to fetch"""
+        session = requests.Session()
+        for i in range(self.seed_trips):
+            response = session.post(f'{self.base_url}/trips/', json=self._trip_payload(random.Random(i)),
+                                    timeout=self.timeout)
+            response.raise_for_status()
+            trip_id = response.json()['id']
+            logs = session.get(f'{self.base_url}/trips/{trip_id}/logs/', timeout=self.timeout).json()
+            self._pdf_targets.extend((trip_id, log['id']) for log in logs)
+
+    def _worker(self, deadline: float, index: int):
+        rng = random.Random(index)
+        session = requests.Session()
+        # Seeded trips without logs leave nothing to fetch as a PDF, so skip that operation
+        operations = [name for name in self.mix if name != 'pdf' or self._pdf_targets]
+        if not operations:
+            return
+        weights = [self.mix[name] for name in operations]
+        while time.monotonic() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = getattr(self, f'_{operation}')(session, rng)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._samples.append((operation, elapsed, ok))
+
+    def _trip_payload(self, rng: random.Random) -> Dict:
+        def location():
+            if rng.random() < 0.5:
+                return rng.choice(CITIES)[0]
+            return f'{rng.randint(1, 9999)} {rng.choice(STREETS)}, {rng.choice(TOWNS)}'
+        return {
+            'current_location': location(),
+            'pickup_location': location(),
+            'dropoff_location': location(),
+            'current_cycle_used': round(rng.uniform(0, 60), 1),
+        }
+
+    def _create_trip(self, session, rng):
+        return session.post(f'{self.base_url}/trips/', json=self._trip_payload(rng), timeout=self.timeout)
+
+    def _list_trips(self, session, rng):
+        return session.get(f'{self.base_url}/trips/', timeout=self.timeout)
+
+    def _calculate_route(self, session, rng):
+        payload = self._trip_payload(rng)
+        payload.pop('current_cycle_used')
+        return session.post(f'{self.base_url}/calculate-route/', json=payload, timeout=self.timeout)
+
+    def _pdf(self, session, rng):
+        trip_id, log_id = rng.choice(self._pdf_targets)
+        return session.get(f'{self.base_url}/trips/{trip_id}/logs/{log_id}/pdf/', timeout=self.timeout)
+
+    def _report(self, elapsed: float) -> Dict:
+        def summarize(samples):
+            latencies = sorted(sample[1] for sample in samples)
+            errors = sum(1 for sample in samples if not sample[2])
+            return {
+                'requests': len(samples),
+                'errors': errors,
+                'throughput_rps': len(samples) / elapsed if elapsed else 0.0,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+            }
+
+        report = {'elapsed_s': elapsed, 'concurrency': self.concurrency, 'total': summarize(self._samples)}
+        report['operations'] = {
+            operation: summarize([sample for sample in self._samples if sample[0] == operation])
+            for operation in self.mix
+        }
+        return report
@@ -0,0 +1,90 @@
+"""Local HTTP server imitating the OpenRouteService and Nominatim endpoints used by RouteService"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from ..benchmarks.stubs import fake_coords, fake_ors_directions
+
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 points_per_leg: int = 500):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.points_per_leg = points_per_leg
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves ORS ``/v2/directions/driving-hgv``, ``/v2/geocode/search`` and Nominatim ``/search``"""
+
+    server_version = 'ELDUpstreamStub/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if self._simulate():
+            return
+        if url.path.endswith('/geocode/search'):
+            lat, lng = fake_coords(params.get('text', ''))
+            self._send_json({'features': [{'geometry': {'type': 'Point', 'coordinates': [lng, lat]}}]})
+        elif url.path.rstrip('/') == '/search':
+            query = params.get('q', '')
+            lat, lng = fake_coords(query)
+            self._send_json([{'lat': str(lat), 'lon': str(lng), 'display_name': query}])
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if self._simulate():
+            return
+        if '/directions/' in url.path:
+            coordinates = body.get('coordinates') or []
+            if len(coordinates) < 2:
+                self._send_json({'error': 'need at least two coordinates'}, status=400)
+                return
+            self._send_json(fake_ors_directions(coordinates, self.server.config.points_per_leg))
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def _simulate(self) -> bool:
+        """Apply configured latency; return True if an error response was sent instead"""
+        config = self.server.config
+        delay = config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if config.error_rate and random.random() < config.error_rate:
+            self._send_json({'error': 'simulated upstream failure'}, status=503)
+            return True
+        return False
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_server(host: str, port: int, config: StubConfig) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.config = config
+    return server
+
+
+def start_in_thread(host: str = '127.0.0.1', port: int = 0, config: StubConfig = None) -> ThreadingHTTPServer:
+    """Start a stub server on a background thread; ``port=0`` picks a free port"""
+    server = make_server(host, port, config or StubConfig())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,116 @@
+"""
+Memoized duty timelines and daily logs for trips on recurring lanes.
+
+A trip's schedule is a function of its planned route, the local time of day
+it departs (to the minute; departures are scheduled from the start of their
+minute), the driver's cycle hours and the HOS rules, so ``RouteService``
+looks its timeline up under a digest of those inputs and
+``HOS_RULES_VERSION`` before running the ETA engine. A timeline found for
+another date is shifted there, provided the UTC offsets over the trip line up
+so any clock change falls at the same point of it. The daily logs generated
+from a timeline are cached under its key plus the trip's cycle hours and
+shifted the same way, by moving each log's ``log_date`` and ``day_start``; the
+records are frozen, so shifted logs share their segments and violations with
+the cached plan. Each process keeps its own bounded LRU of plans.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from . import metrics
+from .log_records import DailyLog
+
+
+@dataclass(frozen=True, slots=True)
+class CachedPlan:
+    """A plan starting on ``start_date`` at ``origin``: its daily logs, or its duty timeline and stop times"""
+    start_date: date
+    origin: datetime
+    logs: Tuple[DailyLog, ...] = ()
+    timeline: Tuple[Dict, ...] = ()
+    stop_times: Tuple[Tuple[datetime, datetime], ...] = ()
+    utc_offsets: Tuple[timedelta, ...] = ()
+
+    def shifted(self, start_date: date, origin: datetime) -> List[DailyLog]:
+        """The logs moved to a plan starting on ``start_date`` at ``origin``"""
+        if start_date == self.start_date and origin == self.origin:
+            return list(self.logs)
+        days = start_date - self.start_date
+        offset = origin - self.origin
+        return [log.shifted(days, offset) for log in self.logs]
+
+    def shifted_schedule(self, origin: datetime) -> Tuple[List[Dict], List[Tuple[datetime, datetime]]]:
+        """The timeline and ``(arrival, departure)`` stop times moved to a plan departing at ``origin``"""
+        offset = origin - self.origin
+        timeline = [
+            dict(entry, start_time=entry['start_time'] + offset, end_time=entry['end_time'] + offset)
+            for entry in self.timeline
+        ]
+        return timeline, [(arrival + offset, departure + offset) for arrival, departure in self.stop_times]
+
+
+def plan_key(*inputs) -> bytes:
+    """Content address of a plan's normalized inputs (ints, floats, strings and tuples of them)"""
+    return hashlib.blake2b(repr(inputs).encode(), digest_size=16).digest()
+
+
+class PlanCache:
+    """Thread-safe LRU of generated plans; ``max_entries`` defaults to ``ELD_LOG_CACHE_SIZE`` (0 disables it)"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self._max_entries = max_entries
+        self._plans: 'OrderedDict[bytes, CachedPlan]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_entries(self) -> int:
+        if self._max_entries is None:
+            return settings.ELD_LOG_CACHE_SIZE
+        return self._max_entries
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def get(self, key: bytes) -> Optional[CachedPlan]:
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+        return plan
+
+    def put(self, key: bytes, plan: CachedPlan):
+        max_entries = self.max_entries
+        if max_entries <= 0:
+            return
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > max_entries:
+                self._plans.popitem(last=False)
+
+    def get_or_generate(self, key: bytes, start_date: date, origin: datetime,
+                        generate: Callable[[], List[DailyLog]]) -> List[DailyLog]:
+        """The cached logs for ``key`` shifted to ``start_date``/``origin``, generating and storing them on a miss"""
+        if self.max_entries <= 0:
+            return generate()
+        plan = self.get(key)
+        metrics.count_cache('eld_logs', hit=plan is not None)
+        if plan is not None:
+            return plan.shifted(start_date, origin)
+
+        logs = generate()
+        self.put(key, CachedPlan(start_date, origin, logs=tuple(logs)))
+        return logs
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+
+# Shared by every RouteService and ELDLogService in the process
+plans = PlanCache()
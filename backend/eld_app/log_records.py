@@ -0,0 +1,136 @@
+"""
+Record types produced by ``ELDLogService``.
+
+Logs are generated for thousands of trips at a time, so the records are
+frozen, slotted dataclasses rather than dicts, and duty segments hold float
+minute offsets from their log's ``day_start`` rather than datetimes.
+Datetimes are only built by ``DailyLog.duty_statuses()``, when a log is
+persisted or serialized.
+"""
+from dataclasses import dataclass, fields
+from datetime import date, datetime, timedelta
+from operator import attrgetter
+from typing import Dict, List, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class DutySegment:
+    """One duty status, as minutes from the start of its log's day"""
+    start_minute: float
+    end_minute: float
+    status: str
+    location: str
+    remarks: str
+
+    @property
+    def hours(self) -> float:
+        return (self.end_minute - self.start_minute) / 60
+
+
+@dataclass(frozen=True, slots=True)
+class Violation:
+    type: str
+    description: str
+    severity: str
+    rule: str
+
+
+@dataclass(frozen=True, slots=True)
+class RestartCheck:
+    restart_applies: bool
+    cycle_reset: bool
+    new_cycle_hours: float
+    restart_reason: str
+
+
+@dataclass(frozen=True, slots=True)
+class RollingCycle:
+    rolling_8_day_hours: float
+    rolling_7_day_hours: float
+    hours_available_70hr: float
+    hours_available_60hr: float
+    would_exceed_70hr: bool
+    would_exceed_60hr: bool
+    compliance_status: str
+
+
+@dataclass(frozen=True, slots=True)
+class SleeperBerthCheck:
+    off_duty_hours: float
+    sleeper_berth_hours: float
+    sleeper_berth_split: bool
+    compliance_status: str
+    split_type: str = 'NONE'
+
+
+@dataclass(frozen=True, slots=True)
+class ShiftHours:
+    """A day's hours measured over the shifts it touches rather than its calendar totals"""
+    driving_hours: float  # Most driving in one shift by any point of the day
+    continuous_driving_hours: float  # Most driving without a 30-minute break
+    rest_hours: float  # Longest rest ending on the day, or still running at its end
+
+
+@dataclass(frozen=True, slots=True)
+class HOSCheck:
+    """The violations found for one day's hours, with the rolling cycle they were checked against"""
+    violations: Tuple[Violation, ...]
+    violation_count: int
+    compliance_status: str
+    overall_severity: str
+    is_compliant: bool
+    requires_immediate_action: bool
+    rolling_8_day_hours: float
+    rolling_7_day_hours: float
+
+
+@dataclass(frozen=True, slots=True)
+class DailyLog:
+    """A generated daily log; ``day_start`` anchors the minute offsets of ``segments``"""
+    log_date: date
+    day_start: datetime
+    segments: Tuple[DutySegment, ...]
+    driver_name: str
+    carrier_name: str
+    vehicle_number: str
+    off_duty_hours: float
+    sleeper_berth_hours: float
+    driving_hours: float
+    on_duty_hours: float
+    total_on_duty_7_days: float
+    hours_available_70hr: float
+    total_on_duty_5_days: float
+    total_on_duty_6_days: float
+    hours_available_60hr: float
+    # FMCSA compliance information
+    compliance_status: str
+    violation_count: int
+    is_compliant: bool
+    violations: Tuple[Violation, ...]
+    restart_applies: bool
+    sleeper_berth_split: bool
+    sleeper_berth_split_type: str
+    rolling_8_day_hours: float
+    rolling_7_day_hours: float
+
+    def duty_statuses(self) -> List[Dict]:
+        """The segments with ``start_time``/``end_time`` datetimes, in the shape of ``DutyStatus`` rows"""
+        day_start = self.day_start
+        return [
+            {
+                'start_time': day_start + timedelta(minutes=segment.start_minute),
+                'end_time': day_start + timedelta(minutes=segment.end_minute),
+                'status': segment.status,
+                'location': segment.location,
+                'remarks': segment.remarks,
+            }
+            for segment in self.segments
+        ]
+
+    def shifted(self, days: timedelta, offset: timedelta) -> 'DailyLog':
+        """This log moved ``days`` later, with its day starting ``offset`` later; everything else is shared"""
+        # Positional construction is several times faster than dataclasses.replace
+        return DailyLog(self.log_date + days, self.day_start + offset, *_other_fields(self))
+
+
+_other_fields = attrgetter(*(field.name for field in fields(DailyLog)[2:]))
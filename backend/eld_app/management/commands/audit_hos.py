@@ -0,0 +1,234 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Q
+
+
+DEFAULT_CHECKPOINT = 'hos_audit_checkpoint.json'
+
+
+def _init_worker():
+    """Give each pool process its own database connections"""
+    django.setup()
+    connections.close_all()
+
+
+def _status_hours(statuses: List[Tuple[str, float]]) -> Dict[str, float]:
+    """Sum duty status durations (in hours) by status"""
+    totals = {'off_duty': 0.0, 'sleeper_berth': 0.0, 'driving': 0.0, 'on_duty': 0.0}
+    for status, hours in statuses:
+        totals[status] = totals.get(status, 0.0) + hours
+    return totals
+
+
+def audit_driver(driver_name: str, since: Optional[str], until: Optional[str], chunk_size: int) -> Tuple[str, int, int]:
+    """Audit every log of one driver in date order and bulk-write the results.
+
+    Runs inside a pool process. Logs are streamed in chunks of ``chunk_size`` and
+    only the last 7 days of on-duty totals are kept for the rolling cycle, so
+    memory does not grow with the driver's history. Shift limits are checked
+    with a ``ShiftTracker`` carried from log to log, the time between one log's
+    last status and the next one's first counting as off duty.
+    """
+    from eld_app.day_summaries import on_duty_history
+    from eld_app.hos_state import ShiftTracker
+    from eld_app.models import DutyStatus, ELDLog, HOSAuditResult
+    from eld_app.services import ELDLogService
+
+    eld_service = ELDLogService()
+    logs = ELDLog.objects.filter(driver_name=driver_name)
+    if since:
+        logs = logs.filter(log_date__gte=since)
+    if until:
+        logs = logs.filter(log_date__lte=until)
+    logs = logs.order_by('log_date', 'id').values_list(
+        'id', 'log_date', 'off_duty_hours', 'sleeper_berth_hours', 'driving_hours', 'on_duty_hours'
+    )
+
+    # Previous 7 days of (log_date, on-duty hours); several logs may share a date. A run
+    # starting at --since picks up the days before it from the driver-day rollup.
+    history = deque(on_duty_history(driver_name, date.fromisoformat(since)) if since else ())
+    shifts = ShiftTracker()
+    last_end = None
+    audited = 0
+    violations = 0
+
+    def flush(chunk):
+        nonlocal shifts, last_end, audited, violations
+        log_ids = [row[0] for row in chunk]
+        statuses = {}
+        spans = {}
+        for eld_log_id, status, start_time, end_time in DutyStatus.objects.filter(
+            eld_log_id__in=log_ids
+        ).order_by('start_time', 'id').values_list('eld_log_id', 'status', 'start_time', 'end_time'):
+            hours = (end_time - start_time).total_seconds() / 3600
+            statuses.setdefault(eld_log_id, []).append((status, hours))
+            spans.setdefault(eld_log_id, []).append((start_time, end_time))
+
+        results = []
+        for log_id, log_date, off_duty, sleeper, driving, on_duty in chunk:
+            shift = None
+            if log_id in statuses:
+                # Duty status rows are the source of truth when present
+                totals = _status_hours(statuses[log_id])
+                off_duty, sleeper = totals['off_duty'], totals['sleeper_berth']
+                driving, on_duty = totals['driving'], totals['on_duty']
+                day_statuses = statuses[log_id]
+                first_start = spans[log_id][0][0]
+                if last_end is not None and first_start > last_end:
+                    day_statuses = [('off_duty', (first_start - last_end).total_seconds() / 3600)] + day_statuses
+                shift = shifts.day(day_statuses)
+                last_end = max(end for _, end in spans[log_id])
+            else:
+                # Without statuses the driver's shift is unknown from here on
+                shifts, last_end = ShiftTracker(), None
+
+            while history and history[0][0] <= log_date - timedelta(days=8):
+                history.popleft()
+            previous_days = [0.0] * 7
+            for day, hours in history:
+                offset = (log_date - day).days
+                if 1 <= offset <= 7:
+                    previous_days[7 - offset] += hours
+
+            result = eld_service.audit_daily_log(driving, on_duty, off_duty, sleeper, previous_days, shift)
+            history.append((log_date, driving + on_duty))
+
+            results.append(HOSAuditResult(
+                eld_log_id=log_id,
+                driver_name=driver_name,
+                log_date=log_date,
+                compliance_status=result.compliance_status,
+                violation_count=result.violation_count,
+                is_compliant=result.is_compliant,
+                violations=[asdict(violation) for violation in result.violations],
+                rolling_8_day_hours=result.rolling_8_day_hours,
+                rolling_7_day_hours=result.rolling_7_day_hours,
+            ))
+            violations += result.violation_count
+
+        with transaction.atomic():
+            HOSAuditResult.objects.filter(eld_log_id__in=log_ids).delete()
+            HOSAuditResult.objects.bulk_create(results, batch_size=chunk_size)
+        audited += len(results)
+
+    # Keyset pagination rather than one long-lived cursor: on SQLite an open read
+    # cursor would block the other workers' writes for the whole run.
+    chunk = list(logs[:chunk_size])
+    while chunk:
+        flush(chunk)
+        last_id, last_date = chunk[-1][0], chunk[-1][1]
+        chunk = list(logs.filter(Q(log_date__gt=last_date) | Q(log_date=last_date, id__gt=last_id))[:chunk_size])
+
+    return driver_name, audited, violations
+
+
+class Command(BaseCommand):
+    help = 'Re-audit stored ELD logs against the HOS rules, partitioned by driver across worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of worker processes (default: CPU count)')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Rows fetched and written per batch')
+        parser.add_argument('--since', help='Only audit logs on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Only audit logs on or before this date (YYYY-MM-DD)')
+        parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT,
+                            help=f'Checkpoint file recording finished drivers (default: {DEFAULT_CHECKPOINT})')
+        parser.add_argument('--resume', action='store_true',
+                            help='Skip drivers already recorded in the checkpoint file')
+
+    def handle(self, *args, **options):
+        from eld_app.models import ELDLog
+
+        for key in ('since', 'until'):
+            if options[key]:
+                try:
+                    date.fromisoformat(options[key])
+                except ValueError:
+                    raise CommandError(f'--{key} must be a date in YYYY-MM-DD format')
+        if options['workers'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--workers and --chunk-size must be positive')
+
+        checkpoint_path = options['checkpoint']
+        completed = set(self._load_checkpoint(checkpoint_path)) if options['resume'] else set()
+
+        drivers = ELDLog.objects.order_by('driver_name').values_list('driver_name', flat=True).distinct()
+        total_drivers = drivers.count()
+        self.stdout.write(f'Auditing {total_drivers} drivers with {options["workers"]} workers '
+                          f'({len(completed)} already done)')
+
+        # Child processes must not inherit the parent's open connections
+        connections.close_all()
+
+        started = time.monotonic()
+        audited_logs = 0
+        total_violations = 0
+        done = len(completed)
+        max_in_flight = options['workers'] * 2
+
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            pending = set()
+
+            def collect(finished):
+                nonlocal audited_logs, total_violations, done
+                for future in finished:
+                    driver_name, audited, violations = future.result()
+                    completed.add(driver_name)
+                    self._save_checkpoint(checkpoint_path, completed)
+                    audited_logs += audited
+                    total_violations += violations
+                    done += 1
+                    elapsed = time.monotonic() - started
+                    rate = audited_logs / elapsed if elapsed else 0.0
+                    self.stdout.write(f'[{done}/{total_drivers}] {driver_name}: {audited} logs, '
+                                      f'{violations} violations ({rate:.0f} logs/s overall)')
+
+            for driver_name in self._iter_drivers(drivers, options['chunk_size']):
+                if driver_name in completed:
+                    continue
+                pending.add(pool.submit(audit_driver, driver_name, options['since'],
+                                        options['until'], options['chunk_size']))
+                if len(pending) >= max_in_flight:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+
+        elapsed = time.monotonic() - started
+        rate = audited_logs / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f'Audited {audited_logs} logs in {elapsed:.1f}s ({rate:.0f} logs/s), '
+            f'{total_violations} violations found'
+        ))
+
+    def _iter_drivers(self, drivers, chunk_size: int):
+        """Yield driver names page by page without holding a cursor open across the run"""
+        page = list(drivers[:chunk_size])
+        while page:
+            yield from page
+            page = list(drivers.filter(driver_name__gt=page[-1])[:chunk_size])
+
+    def _load_checkpoint(self, path: str) -> List[str]:
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f).get('completed_drivers', [])
+
+    def _save_checkpoint(self, path: str, completed: set):
+        # Write to a temporary file first so an interrupted run never leaves a torn checkpoint
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'completed_drivers': sorted(completed)}, f)
+        os.replace(tmp_path, path)
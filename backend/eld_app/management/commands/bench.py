@@ -0,0 +1,87 @@
+import json
+import os
+import platform
+import warnings
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from eld_app.benchmarks import suite
+from eld_app.benchmarks.stubs import offline_upstreams
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(suite.__file__), 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = 'Run the performance benchmark suite and compare it against a stored JSON baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filter', default='', help='Only run benchmarks whose name contains this text')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed repeats per benchmark (default: 5)')
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiplier for fixture sizes')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                            help='Baseline JSON file to compare against / write to')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write the results to the baseline file instead of comparing')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed slowdown of the best time before failing (default: 0.25 = 25%%)')
+        parser.add_argument('--output', help='Also write the raw results to this JSON file')
+
+    def handle(self, *args, **options):
+        # The service layer builds naive datetimes; those warnings would drown the report
+        warnings.filterwarnings('ignore', message='.*received a naive datetime.*')
+
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(OPENROUTE_API_KEY='', PROFILING_ENABLED=False), offline_upstreams():
+                results = self._run(options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        report = {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'benchmarks': results,
+        }
+        if options['output']:
+            self._write(options['output'], report)
+
+        if options['save_baseline']:
+            self._write(options['baseline'], report)
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {options["baseline"]}'))
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(f'No baseline at {options["baseline"]}; run with --save-baseline to create one')
+            return
+
+        with open(options['baseline']) as f:
+            baseline = json.load(f).get('benchmarks', {})
+        regressions = suite.compare(results, baseline, options['threshold'])
+        for regression in regressions:
+            self.stderr.write(
+                f'REGRESSION {regression["name"]}: {regression["current"] * 1000:.3f} ms vs '
+                f'{regression["baseline"] * 1000:.3f} ms baseline ({regression["ratio"]:.2f}x)'
+            )
+        if regressions:
+            raise CommandError(f'{len(regressions)} benchmark(s) regressed by more than {options["threshold"]:.0%}')
+        self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
+
+    def _run(self, options):
+        results = {}
+        benchmarks = suite.build_benchmarks(scale=options['scale'], selected=lambda name: options['filter'] in name)
+        for benchmark in benchmarks:
+            result = benchmark.run(options['repeat'])
+            results[benchmark.name] = result
+            line = (f'{benchmark.name:<40} median {result["median"] * 1000:10.3f} ms   '
+                    f'min {result["min"] * 1000:10.3f} ms')
+            if 'peak_bytes' in result:
+                line += f'   peak {result["peak_bytes"] / 2 ** 20:8.1f} MiB'
+            self.stdout.write(line)
+        return results
+
+    def _write(self, path, report):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
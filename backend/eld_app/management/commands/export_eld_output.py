@@ -0,0 +1,46 @@
+import os
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from eld_app.eld_output import ELDOutputFile, drivers_with_logs
+
+
+class Command(BaseCommand):
+    help = 'Write FMCSA ELD output files (one per driver) for a date range, streaming rows from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First log date, YYYY-MM-DD (default: 180 days before --end)')
+        parser.add_argument('--end', help='Last log date, YYYY-MM-DD (default: today)')
+        parser.add_argument('--driver', action='append', dest='drivers',
+                            help='Driver to export; repeat for several (default: every driver with logs in range)')
+        parser.add_argument('--output-dir', default='.', help='Directory for the files (default: current directory)')
+        parser.add_argument('--comment', default='', help='Output file comment, e.g. the audit reference')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        try:
+            end = date.fromisoformat(options['end']) if options['end'] else timezone.localdate()
+            start = date.fromisoformat(options['start']) if options['start'] else end - timedelta(days=180)
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+        if start > end:
+            raise CommandError('--start must not be after --end')
+
+        os.makedirs(options['output_dir'], exist_ok=True)
+        drivers = options['drivers'] or drivers_with_logs(start, end)
+        started = time.perf_counter()
+        for driver in drivers:
+            output = ELDOutputFile(driver, start, end, options['comment'], options['chunk_size'])
+            path = os.path.join(options['output_dir'], output.filename())
+            lines = 0
+            with open(path, 'w', newline='') as f:
+                for line in output.lines():
+                    f.write(line)
+                    lines += 1
+            self.stdout.write(f'{driver}: {path} ({lines} lines)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {len(drivers)} drivers, {start} to {end}, in {time.perf_counter() - started:.1f}s'
+        ))
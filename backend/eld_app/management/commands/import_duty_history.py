@@ -0,0 +1,105 @@
+import json
+import os
+import time
+from typing import Dict
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+DEFAULT_CHECKPOINT = 'duty_import_checkpoint.json'
+
+
+class Command(BaseCommand):
+    help = ('Bulk import historical duty status records (FMCSA ELD output files or CSV) '
+            'into ELD logs without trips')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Files to import, in chronological order')
+        parser.add_argument('--chunk-size', type=int, default=20000,
+                            help='Duty statuses written per transaction')
+        parser.add_argument('--time-zone',
+                            help='Time zone for CSV times without an offset and for log dates '
+                                 '(default: ELD_TIME_ZONE)')
+        parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT,
+                            help=f'Checkpoint file recording progress (default: {DEFAULT_CHECKPOINT})')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue after the last chunk recorded in the checkpoint file')
+        parser.add_argument('--strict', action='store_true',
+                            help='Stop at the first invalid or out-of-order record instead of skipping it')
+
+    def handle(self, *args, **options):
+        from zoneinfo import ZoneInfoNotFoundError
+
+        from eld_app.duty_import import DutyHistoryImporter
+
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        paths = [os.path.abspath(path) for path in options['paths']]
+        for path in paths:
+            if not os.path.isfile(path):
+                raise CommandError(f'{path} does not exist')
+        try:
+            importer = DutyHistoryImporter(options['chunk_size'], options['time_zone'], options['strict'])
+        except (ZoneInfoNotFoundError, ValueError):
+            raise CommandError(f'Unknown time zone {options["time_zone"]!r}')
+
+        checkpoint_path = options['checkpoint']
+        checkpoint = self._load_checkpoint(checkpoint_path) if options['resume'] else {}
+        completed = set(checkpoint.get('completed_files', []))
+        if checkpoint.get('pending'):
+            importer.restore_pending(checkpoint['pending'])
+        if checkpoint:
+            self.stdout.write(f'Resuming: {len(completed)} files done, '
+                              f'{checkpoint.get("path") or "next file"} from line {checkpoint.get("line", 0) + 1}')
+
+        started = time.monotonic()
+        for path in paths:
+            if path in completed:
+                continue
+            resume_line = checkpoint.get('line', 0) if checkpoint.get('path') == path else 0
+            self.stdout.write(f'Importing {path}')
+
+            def on_chunk(line, path=path):
+                self._save_checkpoint(checkpoint_path, {
+                    'completed_files': sorted(completed), 'path': path, 'line': line,
+                    'pending': importer.pending_state(),
+                })
+                elapsed = time.monotonic() - started
+                rate = importer.stats['imported'] / elapsed if elapsed else 0.0
+                self.stdout.write(f'  line {line}: {importer.stats["imported"]} statuses imported ({rate:.0f}/s)')
+
+            try:
+                importer.import_file(path, resume_line, on_chunk)
+            except ValueError as exc:
+                raise CommandError(f'{path}, {exc}; fix the record and rerun with --resume')
+            completed.add(path)
+            self._save_checkpoint(checkpoint_path, {
+                'completed_files': sorted(completed), 'pending': importer.pending_state(),
+            })
+
+        importer.finish()
+        self._save_checkpoint(checkpoint_path, {'completed_files': sorted(completed), 'pending': {}})
+
+        for error in importer.errors:
+            self.stderr.write(f'  line {error.line}: {error.reason}')
+        stats = importer.stats
+        elapsed = time.monotonic() - started
+        rate = stats['imported'] / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats["imported"]} duty statuses into {stats["logs_created"]} new logs '
+            f'in {elapsed:.1f}s ({rate:.0f}/s); skipped {stats["duplicates"]} duplicates, '
+            f'{stats["invalid"]} invalid and {stats["out_of_order"]} out-of-order records'
+        ))
+
+    def _load_checkpoint(self, path: str) -> Dict:
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_checkpoint(self, path: str, state: Dict):
+        # Write to a temporary file first so an interrupted run never leaves a torn checkpoint
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,61 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from eld_app.road_graph import RoadGraphBuilder
+
+
+def iter_features(path: str):
+    """Yield GeoJSON features from a FeatureCollection or a GeoJSON text sequence (one feature per line)"""
+    if path.endswith(('.geojsonseq', '.geojsonl', '.jsonl')):
+        with open(path) as f:
+            for line in f:
+                # RFC 8142 sequences prefix each record with an RS character
+                line = line.strip().lstrip('\x1e')
+                if line:
+                    yield json.loads(line)
+    else:
+        with open(path) as f:
+            yield from json.load(f).get('features', [])
+
+
+class Command(BaseCommand):
+    help = ('Build the offline routing graph from OSM ways exported as GeoJSON, e.g. '
+            '"osmium tags-filter region.osm.pbf w/highway -o roads.pbf && '
+            'osmium export roads.pbf -f geojsonseq -o roads.geojsonseq"')
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='GeoJSON FeatureCollection or GeoJSON text sequence of OSM ways')
+        parser.add_argument('--output', default=None, help='Graph file to write (default: ROAD_GRAPH_PATH)')
+
+    def handle(self, *args, **options):
+        output = options['output'] or settings.ROAD_GRAPH_PATH
+        if not output:
+            raise CommandError('Pass --output or set ROAD_GRAPH_PATH')
+
+        started = time.perf_counter()
+        builder = RoadGraphBuilder()
+        added = skipped = 0
+        try:
+            for feature in iter_features(options['source']):
+                geometry = feature.get('geometry') or {}
+                lines = {
+                    'LineString': [geometry.get('coordinates')],
+                    'MultiLineString': geometry.get('coordinates'),
+                }.get(geometry.get('type'), [])
+                for line in lines or []:
+                    if builder.add_way(line, feature.get('properties') or {}):
+                        added += 1
+                    else:
+                        skipped += 1
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read {options["source"]}: {e}')
+
+        graph = builder.build()
+        graph.save(output)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {output}: {graph.node_count} nodes, {graph.edge_count} edges from {added} ways '
+            f'({skipped} not usable by trucks) in {time.perf_counter() - started:.1f}s'
+        ))
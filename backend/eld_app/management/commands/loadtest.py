@@ -0,0 +1,128 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from eld_app.loadtest.driver import DEFAULT_MIX, LoadDriver, parse_mix
+from eld_app.loadtest.stub_server import StubConfig, start_in_thread
+
+
+class Command(BaseCommand):
+    help = ('Replay mixed trip/route/PDF traffic and report p50/p95/p99 latency and throughput, '
+            'either against a running server (--url) or against gunicorn started with each --workers setting')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='API base URL of an already running server, e.g. http://127.0.0.1:8000/api')
+        parser.add_argument('--workers', default='1,2,4',
+                            help='Comma-separated gunicorn worker counts to start and measure (ignored with --url)')
+        parser.add_argument('--port', type=int, default=8071, help='Port for the gunicorn servers started here')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent simulated clients')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds of traffic per configuration')
+        parser.add_argument('--mix', default=','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()),
+                            help='Weighted request mix (default: %(default)s)')
+        parser.add_argument('--upstream-latency-ms', type=float, default=150.0,
+                            help='Latency of the bundled ORS/Nominatim stub')
+        parser.add_argument('--upstream-error-rate', type=float, default=0.0,
+                            help='Share of stub responses that fail with HTTP 503')
+        parser.add_argument('--output', help='Write the full report to this JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        reports = {}
+        if options['url']:
+            reports['external'] = self._drive(options['url'], mix, options)
+        else:
+            stub = start_in_thread(config=StubConfig(latency_ms=options['upstream_latency_ms'],
+                                                     jitter_ms=options['upstream_latency_ms'] / 4,
+                                                     error_rate=options['upstream_error_rate']))
+            stub_host, stub_port = stub.server_address[:2]
+            env = dict(
+                os.environ,
+                OPENROUTE_API_KEY='loadtest-stub',
+                OPENROUTE_BASE_URL=f'http://{stub_host}:{stub_port}/v2',
+                NOMINATIM_DOMAIN=f'{stub_host}:{stub_port}',
+                NOMINATIM_SCHEME='http',
+            )
+            try:
+                for workers in [int(value) for value in options['workers'].split(',') if value.strip()]:
+                    # Each configuration starts with a fresh database, empty geocode/route caches and
+                    # rate limiter, so load runs never write into the real database
+                    with tempfile.TemporaryDirectory(prefix='eld-loadtest-') as state_dir:
+                        run_env = dict(
+                            env,
+                            DATABASE_URL='',
+                            SQLITE_PATH=os.path.join(state_dir, 'db.sqlite3'),
+                            GEOCODE_CACHE_DIR=os.path.join(state_dir, 'geocode-cache'),
+                            GEOCODE_RATE_LIMIT_FILE=os.path.join(state_dir, 'geocode-ratelimit'),
+                            ROUTE_CACHE_DIR=os.path.join(state_dir, 'route-cache'),
+                        )
+                        self._migrate(run_env)
+                        reports[f'workers={workers}'] = self._run_gunicorn(workers, run_env, mix, options)
+            finally:
+                stub.shutdown()
+
+        self._print_table(reports)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(reports, f, indent=2)
+
+    def _migrate(self, env):
+        result = subprocess.run([sys.executable, 'manage.py', 'migrate', '--noinput', '-v', '0'],
+                                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f'Migrating the load-test database failed:\n{result.stderr}')
+
+    def _run_gunicorn(self, workers, env, mix, options):
+        self.stdout.write(f'Starting gunicorn with {workers} worker(s)...')
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-k', 'uvicorn.workers.UvicornWorker', 'eld_backend.asgi:application',
+             '--workers', str(workers), '--bind', f'127.0.0.1:{options["port"]}', '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        base_url = f'http://127.0.0.1:{options["port"]}/api'
+        try:
+            self._wait_until_ready(base_url, process)
+            return self._drive(base_url, mix, options)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    def _wait_until_ready(self, base_url, process, timeout=30.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError('gunicorn exited during startup')
+            try:
+                requests.get(f'{base_url}/trips/', timeout=2)
+                return
+            except requests.RequestException:
+                time.sleep(0.25)
+        raise CommandError(f'gunicorn did not become ready within {timeout:.0f}s')
+
+    def _drive(self, base_url, mix, options):
+        driver = LoadDriver(base_url, mix=mix, concurrency=options['concurrency'], duration=options['duration'])
+        return driver.run()
+
+    def _print_table(self, reports):
+        header = f'{"configuration":<14} {"operation":<16} {"requests":>8} {"errors":>6} {"req/s":>8} ' \
+                 f'{"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for configuration, report in reports.items():
+            rows = list(report['operations'].items()) + [('TOTAL', report['total'])]
+            for operation, stats in rows:
+                self.stdout.write(
+                    f'{configuration:<14} {operation:<16} {stats["requests"]:>8} {stats["errors"]:>6} '
+                    f'{stats["throughput_rps"]:>8.1f} {stats["p50_ms"]:>9.1f} {stats["p95_ms"]:>9.1f} '
+                    f'{stats["p99_ms"]:>9.1f}'
+                )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from eld_app.loadtest.stub_server import StubConfig, make_server
+
+
+class Command(BaseCommand):
+    help = 'Run a local stand-in for the OpenRouteService and Nominatim APIs with configurable latency and errors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8089)
+        parser.add_argument('--latency-ms', type=float, default=0.0, help='Added latency per request')
+        parser.add_argument('--jitter-ms', type=float, default=0.0, help='Random +/- variation of the latency')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with HTTP 503')
+        parser.add_argument('--points-per-leg', type=int, default=500, help='Geometry points returned per route leg')
+
+    def handle(self, *args, **options):
+        config = StubConfig(options['latency_ms'], options['jitter_ms'], options['error_rate'],
+                            options['points_per_leg'])
+        server = make_server(options['host'], options['port'], config)
+        host, port = server.server_address[:2]
+        self.stdout.write(
+            f'Upstream stub listening on http://{host}:{port}\n'
+            f'  OPENROUTE_BASE_URL=http://{host}:{port}/v2 OPENROUTE_API_KEY=stub\n'
+            f'  NOMINATIM_DOMAIN={host}:{port} NOMINATIM_SCHEME=http'
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,56 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = 'Rebuild DriverDaySummary rows that disagree with the ELD logs they summarize'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--driver', action='append', dest='drivers',
+                            help='Only reconcile this driver (repeatable; default: every driver)')
+        parser.add_argument('--since', help='Only reconcile days on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Only reconcile days on or before this date (YYYY-MM-DD)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report the differences without writing them')
+
+    def handle(self, *args, **options):
+        from eld_app.day_summaries import reconcile
+        from eld_app.models import DriverDaySummary, ELDLog
+
+        bounds = {}
+        for key in ('since', 'until'):
+            try:
+                bounds[key] = date.fromisoformat(options[key]) if options[key] else None
+            except ValueError:
+                raise CommandError(f'--{key} must be a date in YYYY-MM-DD format')
+
+        if options['drivers']:
+            drivers = sorted(set(options['drivers']))
+        else:
+            # Drivers with summaries but no logs left still need their rows removed
+            drivers = sorted(
+                set(ELDLog.objects.order_by().values_list('driver_name', flat=True).distinct())
+                | set(DriverDaySummary.objects.order_by().values_list('driver_name', flat=True).distinct())
+            )
+
+        started = time.monotonic()
+        totals = {'created': 0, 'updated': 0, 'deleted': 0}
+        out_of_date = 0
+        for driver_name in drivers:
+            with transaction.atomic():
+                changes = reconcile(driver_name, bounds['since'], bounds['until'], apply=not options['dry_run'])
+            if any(changes.values()):
+                out_of_date += 1
+                self.stdout.write(f'  {driver_name}: {changes["created"]} missing, {changes["updated"]} wrong, '
+                                  f'{changes["deleted"]} stale days')
+            for key, count in changes.items():
+                totals[key] += count
+
+        verb = 'Would fix' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {len(drivers)} drivers in {time.monotonic() - started:.1f}s; {verb} {out_of_date} drivers: '
+            f'{totals["created"]} missing, {totals["updated"]} wrong and {totals["deleted"]} stale days'
+        ))
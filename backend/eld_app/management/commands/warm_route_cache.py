@@ -0,0 +1,107 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from eld_app import geocoding
+from eld_app.geocoding import TokenBucket
+from eld_app.models import Trip
+from eld_app.services import RouteService
+
+
+class Command(BaseCommand):
+    help = ('Pre-resolve the locations and most common lanes in recent trip history through '
+            'RouteService so the shared geocode and route caches are hot before peak traffic')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Trip history to consider (default: 90 days)')
+        parser.add_argument('--lanes', type=int, default=200, help='Most frequent lanes to route (default: 200)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Parallel lookups (default: 4)')
+        parser.add_argument('--geocode-budget', type=float, default=30.0,
+                            help='Seconds each lookup may wait for the shared Nominatim rate limiter (default: 30)')
+        parser.add_argument('--route-rate', type=float, default=0.5,
+                            help='OpenRouteService directions requests per second (default: 0.5)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        trips = Trip.objects.filter(created_at__gte=timezone.now() - timedelta(days=options['days']))
+        trip_count = trips.count()
+        locations = set()
+        for field in ('current_location', 'pickup_location', 'dropoff_location'):
+            locations.update(trips.values_list(field, flat=True).distinct())
+        lanes = list(
+            trips.values('current_location', 'pickup_location', 'dropoff_location')
+            .annotate(trips=Count('id'))
+            .order_by('-trips')[:options['lanes']]
+        )
+        self.stdout.write(f'{trip_count} trips in the last {options["days"]} days: '
+                          f'{len(locations)} distinct locations, routing the top {len(lanes)} lanes')
+
+        route_service = RouteService()
+        # Warming is not latency sensitive, so lookups may queue much longer than requests do
+        with override_settings(GEOCODE_BUDGET_SECONDS=options['geocode_budget']), \
+                ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as pool:
+            location_results = list(pool.map(lambda address: self._warm_location(route_service, address),
+                                             sorted(locations)))
+            coords = {address: result[1] for address, result in zip(sorted(locations), location_results)}
+
+            with tempfile.TemporaryDirectory(prefix='eld-warm-') as state_dir:
+                route_bucket = TokenBucket(os.path.join(state_dir, 'ors'), options['route_rate'], 1)
+                lane_results = list(pool.map(
+                    lambda lane: self._warm_lane(route_service, route_bucket, lane, coords), lanes
+                ))
+
+        self._report(location_results, lanes, lane_results, trip_count, time.perf_counter() - started)
+
+    def _warm_location(self, route_service, address):
+        """Resolve one location; returns (outcome, coords or None)"""
+        coords = route_service._gazetteer_lookup(address)
+        if coords:
+            return 'gazetteer', coords
+        outcome = 'cached' if geocoding.get_coordinator().is_cached(address) else 'resolved'
+        coords = geocoding.lookup(address, route_service._nominatim_geocode)
+        return (outcome, coords) if coords else ('failed', None)
+
+    def _warm_lane(self, route_service, route_bucket, lane, coords):
+        """Route one lane through the shared route cache; returns the outcome"""
+        if not route_service.openroute_api_key:
+            return 'local'
+        waypoints = [coords[lane[field]] for field in ('current_location', 'pickup_location', 'dropoff_location')]
+        if None in waypoints:
+            return 'skipped'
+        if self._route_cached(route_service, waypoints):
+            return 'cached'
+        if not route_bucket.acquire(time.monotonic() + 3600):
+            return 'failed'
+        route_service._get_route_details(*waypoints)
+        # Failed directions calls fall back to an estimate that is not cached
+        return 'routed' if self._route_cached(route_service, waypoints) else 'failed'
+
+    def _route_cached(self, route_service, waypoints) -> bool:
+        return caches['routes'].get(route_service.route_cache_key(*waypoints)) is not None
+
+    def _report(self, location_results, lanes, lane_results, trip_count, elapsed):
+        def tally(results):
+            counts = {}
+            for outcome in results:
+                counts[outcome] = counts.get(outcome, 0) + 1
+            return ', '.join(f'{outcome}={count}' for outcome, count in sorted(counts.items())) or 'none'
+
+        location_outcomes = [outcome for outcome, _ in location_results]
+        ready = sum(1 for outcome in location_outcomes if outcome != 'failed')
+        self.stdout.write(f'Locations: {ready}/{len(location_outcomes)} ready ({tally(location_outcomes)})')
+
+        covered = sum(lane['trips'] for lane, outcome in zip(lanes, lane_results) if outcome in ('cached', 'routed', 'local'))
+        share = covered / trip_count * 100 if trip_count else 0
+        self.stdout.write(f'Lanes: {tally(lane_results)}; covering {covered}/{trip_count} trips ({share:.0f}%)')
+        if lane_results and all(outcome == 'local' for outcome in lane_results):
+            self.stdout.write('No OPENROUTE_API_KEY: routes are computed locally and need no warming')
+        self.stdout.write(self.style.SUCCESS(f'Done in {elapsed:.1f}s'))
+
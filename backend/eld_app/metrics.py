@@ -0,0 +1,246 @@
+"""
+Lightweight Prometheus-style metrics shared across gunicorn workers.
+
+Each process keeps its counters and histograms in memory and dumps them to
+``<METRICS_DIR>/<pid>.json`` at the end of every request that changed them.
+The ``/metrics`` view merges the files of all workers, so any worker can
+answer a scrape with fleet-wide numbers. When a worker exits (gunicorn
+recycles them), the next scrape folds its file into ``archive.json`` and
+removes it, as prometheus_client's multiprocess mode does, so counters and
+histogram counts never go down and ``rate()`` sees no reset.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+
+ARCHIVE_FILE = 'archive.json'
+
+# Latency buckets in seconds, from fast cache hits up to slow upstream timeouts
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    'eld_stage_duration_seconds': ('histogram', 'Time spent in each stage of route planning and log generation'),
+    'eld_cache_requests_total': ('counter', 'Cache lookups by cache and result (hit/miss)'),
+    'eld_cache_hit_ratio': ('gauge', 'Share of each cache\'s lookups that were hits, over all workers\' lifetimes'),
+    'eld_upstream_requests_total': ('counter', 'Outbound calls to geocoding and routing services by outcome'),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels_key(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((labels or {}).items()))
+
+
+class MetricsRegistry:
+    """Per-process metric store with file-based aggregation across processes"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], list] = {}
+        self._dirty = False
+
+    @property
+    def directory(self) -> str:
+        if self._directory is None:
+            self._directory = str(settings.METRICS_DIR)
+        return self._directory
+
+    def inc(self, name: str, labels: Optional[Dict[str, str]] = None, amount: float = 1):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._dirty = True
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            # Layout: one cumulative count per bucket, then +Inf count, then sum
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0] * (len(DURATION_BUCKETS) + 1) + [0.0]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    hist[i] += 1
+            hist[-2] += 1
+            hist[-1] += value
+            self._dirty = True
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Record the wall time of the wrapped block as ``eld_stage_duration_seconds{stage=...}``"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('eld_stage_duration_seconds', time.perf_counter() - started, {'stage': stage})
+
+    def flush(self):
+        """Write this process's metrics to its file in the shared directory"""
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = _snapshot(self._counters, self._histograms)
+            self._dirty = False
+
+        os.makedirs(self.directory, exist_ok=True)
+        _write_json(os.path.join(self.directory, f'{os.getpid()}.json'), snapshot)
+
+    def collect(self) -> Tuple[Dict, Dict]:
+        """Merge the archive and the metrics of every process that has written to the shared directory"""
+        self.flush()
+        counters: Dict[Tuple[str, Labels], float] = {}
+        histograms: Dict[Tuple[str, Labels], list] = {}
+        if not os.path.isdir(self.directory):
+            return counters, histograms
+
+        # Scrapes take turns, so a dead worker's file is folded into the archive exactly once
+        lock_fd = os.open(os.path.join(self.directory, 'archive.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            archive_path = os.path.join(self.directory, ARCHIVE_FILE)
+            archive = _read_snapshot(archive_path) or {}
+            dead = []
+            for filename in os.listdir(self.directory):
+                pid = filename[:-len('.json')]
+                if not filename.endswith('.json') or not pid.isdigit():
+                    continue
+                snapshot = _read_snapshot(os.path.join(self.directory, filename))
+                if snapshot is None:
+                    continue
+                if _process_alive(int(pid)):
+                    _merge(counters, histograms, snapshot)
+                else:
+                    dead.append((filename, snapshot))
+            if dead:
+                archived_counters, archived_histograms = {}, {}
+                for snapshot in [archive] + [snapshot for _, snapshot in dead]:
+                    _merge(archived_counters, archived_histograms, snapshot)
+                archive = _snapshot(archived_counters, archived_histograms)
+                _write_json(archive_path, archive)
+                # Removed only once the archive holds them; a crash in between counts them twice, never zero times
+                for filename, _ in dead:
+                    try:
+                        os.remove(os.path.join(self.directory, filename))
+                    except OSError:
+                        pass
+            _merge(counters, histograms, archive)
+        finally:
+            os.close(lock_fd)  # also releases the lock
+        return counters, histograms
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        counters, histograms = self.collect()
+        lines = []
+        for name, (metric_type, help_text) in METRIC_HELP.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            if metric_type == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_format_labels(labels)} {value:g}')
+            elif metric_type == 'gauge':
+                for labels, ratio in sorted(_hit_ratios(counters).items()):
+                    lines.append(f'{name}{_format_labels(labels)} {ratio:.4f}')
+            else:
+                for (metric, labels), hist in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(DURATION_BUCKETS, hist):
+                        lines.append(f'{name}_bucket{_format_labels(labels + (("le", f"{bound:g}"),))} {count}')
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {hist[-2]}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {hist[-1]:g}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {hist[-2]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _snapshot(counters: Dict, histograms: Dict) -> Dict:
+    return {
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [[name, list(labels), hist] for (name, labels), hist in histograms.items()],
+    }
+
+
+def _read_snapshot(path: str) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data: Dict):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _merge(counters: Dict, histograms: Dict, snapshot: Dict):
+    """Add a snapshot's counters and histograms into the given totals"""
+    for name, labels, value in snapshot.get('counters', []):
+        key = (name, tuple(tuple(pair) for pair in labels))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, hist in snapshot.get('histograms', []):
+        key = (name, tuple(tuple(pair) for pair in labels))
+        merged = histograms.get(key)
+        histograms[key] = list(hist) if merged is None else [a + b for a, b in zip(merged, hist)]
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # alive, owned by another user
+    return True
+
+
+def _hit_ratios(counters: Dict[Tuple[str, Labels], float]) -> Dict[Labels, float]:
+    """Hit ratio per cache, derived from ``eld_cache_requests_total``"""
+    lookups: Dict[Labels, list] = {}
+    for (metric, labels), value in counters.items():
+        if metric != 'eld_cache_requests_total':
+            continue
+        label_map = dict(labels)
+        totals = lookups.setdefault((('cache', label_map.get('cache', '')),), [0, 0])
+        totals[1] += value
+        if label_map.get('result') == 'hit':
+            totals[0] += value
+    return {labels: hits / total for labels, (hits, total) in lookups.items() if total}
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+registry = MetricsRegistry()
+
+
+def timer(stage: str):
+    return registry.timer(stage)
+
+
+def count_cache(cache: str, hit: bool):
+    registry.inc('eld_cache_requests_total', {'cache': cache, 'result': 'hit' if hit else 'miss'})
+
+
+def count_upstream(service: str, outcome: str):
+    registry.inc('eld_upstream_requests_total', {'service': service, 'outcome': outcome})
@@ -0,0 +1,138 @@
+import cProfile
+import gzip
+import io
+import pstats
+import random
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from . import profiling
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+class ProfilingMiddleware:
+    """Opt-in request profiler.
+
+    A request is profiled when it carries the ``X-Profile`` header (matching
+    ``PROFILING_HEADER_TOKEN`` if one is configured) or when it is picked by
+    ``PROFILING_SAMPLE_RATE``. Profiled requests record SQL query count and time,
+    outbound calls made by ``RouteService`` and, for header-triggered requests or
+    a ``PROFILING_CPROFILE_RATE`` share of sampled ones, a cProfile summary.
+    """
+
+    header = 'HTTP_X_PROFILE'
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.store = profiling.ProfileStore()
+
+    def __call__(self, request):
+        requested = self._header_requested(request)
+        if not requested and random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        run_cprofile = requested or random.random() < settings.PROFILING_CPROFILE_RATE
+        profiler = cProfile.Profile() if run_cprofile else None
+        token = profiling.start_profile()
+        profile = profiling.current_profile()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.sql_wrapper))
+                if profiler:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler:
+                        profiler.disable()
+        finally:
+            profiling.end_profile(token)
+
+        record = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': (time.perf_counter() - started) * 1000,
+            'timestamp': time.time(),
+            'trigger': 'header' if requested else 'sample',
+        }
+        record.update(profile.summary())
+        if profiler:
+            record['cprofile'] = self._format_stats(profiler)
+        response['X-Profile-Id'] = self.store.save(record)
+        return response
+
+    def _header_requested(self, request) -> bool:
+        value = request.META.get(self.header)
+        if not value:
+            return False
+        expected = settings.PROFILING_HEADER_TOKEN
+        return not expected or value == expected
+
+    def _format_stats(self, profiler) -> str:
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output)
+        stats.sort_stats('cumulative').print_stats(40)
+        return output.getvalue()
+
+
+class CompressionMiddleware:
+    """Compress API responses with brotli (when installed and accepted) or gzip.
+
+    Replaces Django's GZipMiddleware with settings tuned for large trip payloads:
+    ``COMPRESSION_MIN_SIZE`` skips tiny bodies, and ``COMPRESSION_GZIP_LEVEL`` /
+    ``COMPRESSION_BROTLI_QUALITY`` trade ratio for CPU. Streaming responses are
+    left untouched so that they are not buffered.
+    """
+
+    compressible_types = ('application/json', 'text/', 'application/javascript')
+    accept_encoding_re = re.compile(r'\b(br|gzip)\b')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < settings.COMPRESSION_MIN_SIZE
+            or not response.get('Content-Type', '').startswith(self.compressible_types)
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = set(self.accept_encoding_re.findall(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+            compressed = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+            compressed = gzip.compress(response.content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The encoded body is a different representation, so its ETag may only be weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
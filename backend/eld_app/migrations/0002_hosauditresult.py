@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HOSAuditResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('driver_name', models.CharField(db_index=True, max_length=255)),
+                ('log_date', models.DateField()),
+                ('compliance_status', models.CharField(max_length=50)),
+                ('violation_count', models.IntegerField(default=0)),
+                ('is_compliant', models.BooleanField(default=False)),
+                ('violations', models.JSONField(blank=True, default=list)),
+                ('rolling_8_day_hours', models.FloatField(default=0)),
+                ('rolling_7_day_hours', models.FloatField(default=0)),
+                ('audited_at', models.DateTimeField(auto_now_add=True)),
+                ('eld_log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audit_results', to='eld_app.eldlog')),
+            ],
+            options={
+                'ordering': ['driver_name', 'log_date'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld_app', '0002_hosauditresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='routepoint',
+            name='mileage',
+            field=models.FloatField(blank=True, help_text='Miles from the start of the route', null=True),
+        ),
+    ]
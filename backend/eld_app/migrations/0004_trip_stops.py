@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld_app', '0003_routepoint_mileage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='optimize_stop_order',
+            field=models.BooleanField(default=False, help_text='Reorder stops to shorten the route'),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='stops',
+            field=models.JSONField(blank=True, default=list, help_text='Stops between the pickup and the final drop-off'),
+        ),
+    ]
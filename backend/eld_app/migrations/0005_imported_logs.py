@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld_app', '0004_trip_stops'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eldlog',
+            name='trip',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='eld_logs', to='eld_app.trip'),
+        ),
+        migrations.AddIndex(
+            model_name='eldlog',
+            index=models.Index(fields=['driver_name', 'log_date'], name='eld_app_eld_driver__cf8ef4_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld_app', '0005_imported_logs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverHOSState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('driver_name', models.CharField(max_length=255, unique=True)),
+                ('last_sequence', models.PositiveBigIntegerField(default=0)),
+                ('current_status', models.CharField(blank=True, choices=[('off_duty', 'Off Duty'), ('sleeper_berth', 'Sleeper Berth'), ('driving', 'Driving'), ('on_duty', 'On Duty (not driving)')], max_length=50)),
+                ('status_since', models.DateTimeField(blank=True, null=True)),
+                ('driving_since_break', models.FloatField(default=0)),
+                ('driving_in_shift', models.FloatField(default=0)),
+                ('shift_started', models.DateTimeField(blank=True, null=True)),
+                ('resting_since', models.DateTimeField(blank=True, null=True)),
+                ('cycle_day', models.DateField(blank=True, help_text='Latest local day in cycle_hours', null=True)),
+                ('cycle_hours', models.JSONField(blank=True, default=list, help_text='On-duty hours of the 8 days ending cycle_day, by day ordinal mod 8')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['driver_name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DutyEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('driver_name', models.CharField(max_length=255)),
+                ('sequence', models.PositiveBigIntegerField(help_text='Device event sequence number, increasing per driver')),
+                ('status', models.CharField(choices=[('off_duty', 'Off Duty'), ('sleeper_berth', 'Sleeper Berth'), ('driving', 'Driving'), ('on_duty', 'On Duty (not driving)')], max_length=50)),
+                ('event_time', models.DateTimeField()),
+                ('location', models.CharField(blank=True, max_length=255)),
+                ('remarks', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['driver_name', 'sequence'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dutyevent',
+            constraint=models.UniqueConstraint(fields=('driver_name', 'sequence'), name='unique_driver_event_sequence'),
+        ),
+    ]
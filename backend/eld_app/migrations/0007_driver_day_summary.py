@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld_app', '0006_duty_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverDaySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('driver_name', models.CharField(max_length=255)),
+                ('day', models.DateField()),
+                ('off_duty_hours', models.FloatField(default=0)),
+                ('sleeper_berth_hours', models.FloatField(default=0)),
+                ('driving_hours', models.FloatField(default=0)),
+                ('on_duty_hours', models.FloatField(default=0)),
+                ('log_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['driver_name', 'day'],
+                'indexes': [models.Index(fields=['day', 'off_duty_hours', 'sleeper_berth_hours', 'driving_hours', 'on_duty_hours'], name='driver_day_summary_hours')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='driverdaysummary',
+            constraint=models.UniqueConstraint(fields=('driver_name', 'day'), name='unique_driver_day_summary'),
+        ),
+    ]
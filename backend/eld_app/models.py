@@ -1,12 +1,22 @@
 from django.db import models
 
 
+DUTY_STATUS_CHOICES = [
+    ('off_duty', 'Off Duty'),
+    ('sleeper_berth', 'Sleeper Berth'),
+    ('driving', 'Driving'),
+    ('on_duty', 'On Duty (not driving)')
+]
+
+
 class Trip(models.Model):
     """Model to store trip information"""
     current_location = models.CharField(max_length=255)
     pickup_location = models.CharField(max_length=255)
     dropoff_location = models.CharField(max_length=255)
     current_cycle_used = models.FloatField(help_text="Hours used in current cycle")
+    stops = models.JSONField(default=list, blank=True, help_text="Stops between the pickup and the final drop-off")
+    optimize_stop_order = models.BooleanField(default=False, help_text="Reorder stops to shorten the route")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -33,6 +43,7 @@ class RoutePoint(models.Model):
         ('end', 'End')
     ])
     sequence = models.IntegerField()
+    mileage = models.FloatField(null=True, blank=True, help_text="Miles from the start of the route")
     estimated_arrival = models.DateTimeField(null=True, blank=True)
     estimated_departure = models.DateTimeField(null=True, blank=True)
     duration_hours = models.FloatField(default=0, help_text="Hours spent at this location")
@@ -40,7 +51,8 @@ class RoutePoint(models.Model):
 
 class ELDLog(models.Model):
     """Model to store generated ELD logs"""
-    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='eld_logs')
+    # Logs imported from other ELD providers' records have no trip
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='eld_logs', null=True, blank=True)
     log_date = models.DateField()
     driver_name = models.CharField(max_length=255, default="Driver")
     carrier_name = models.CharField(max_length=255, default="Carrier")
@@ -65,6 +77,7 @@ class ELDLog(models.Model):
     
     class Meta:
         ordering = ['log_date']
+        indexes = [models.Index(fields=['driver_name', 'log_date'])]
 
 
 class DutyStatus(models.Model):
@@ -72,14 +85,92 @@ class DutyStatus(models.Model):
     eld_log = models.ForeignKey(ELDLog, on_delete=models.CASCADE, related_name='duty_statuses')
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
-    status = models.CharField(max_length=50, choices=[
-        ('off_duty', 'Off Duty'),
-        ('sleeper_berth', 'Sleeper Berth'),
-        ('driving', 'Driving'),
-        ('on_duty', 'On Duty (not driving)')
-    ])
+    status = models.CharField(max_length=50, choices=DUTY_STATUS_CHOICES)
     location = models.CharField(max_length=255, blank=True)
     remarks = models.TextField(blank=True)
     
     class Meta:
         ordering = ['start_time']
+
+
+class HOSAuditResult(models.Model):
+    """Model to store the outcome of re-auditing a stored ELD log against HOS rules"""
+    eld_log = models.ForeignKey(ELDLog, on_delete=models.CASCADE, related_name='audit_results')
+    driver_name = models.CharField(max_length=255, db_index=True)
+    log_date = models.DateField()
+    
+    compliance_status = models.CharField(max_length=50)
+    violation_count = models.IntegerField(default=0)
+    is_compliant = models.BooleanField(default=False)
+    violations = models.JSONField(default=list, blank=True)
+    
+    # Rolling cycle totals computed from the driver's actual log history
+    rolling_8_day_hours = models.FloatField(default=0)
+    rolling_7_day_hours = models.FloatField(default=0)
+    
+    audited_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['driver_name', 'log_date']
+
+
+class DutyEvent(models.Model):
+    """Model to store duty status changes reported by a driver's in-cab device; rows are only ever appended"""
+    driver_name = models.CharField(max_length=255)
+    sequence = models.PositiveBigIntegerField(help_text="Device event sequence number, increasing per driver")
+    status = models.CharField(max_length=50, choices=DUTY_STATUS_CHOICES)
+    event_time = models.DateTimeField()
+    location = models.CharField(max_length=255, blank=True)
+    remarks = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['driver_name', 'sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['driver_name', 'sequence'], name='unique_driver_event_sequence'),
+        ]
+
+
+class DriverHOSState(models.Model):
+    """Model to store a driver's running HOS clocks, advanced by each recorded duty event"""
+    driver_name = models.CharField(max_length=255, unique=True)
+    last_sequence = models.PositiveBigIntegerField(default=0)
+    current_status = models.CharField(max_length=50, choices=DUTY_STATUS_CHOICES, blank=True)
+    status_since = models.DateTimeField(null=True, blank=True)
+    
+    # Clocks as of status_since
+    driving_since_break = models.FloatField(default=0)
+    driving_in_shift = models.FloatField(default=0)
+    shift_started = models.DateTimeField(null=True, blank=True)
+    resting_since = models.DateTimeField(null=True, blank=True)
+    cycle_day = models.DateField(null=True, blank=True, help_text="Latest local day in cycle_hours")
+    cycle_hours = models.JSONField(default=list, blank=True,
+                                   help_text="On-duty hours of the 8 days ending cycle_day, by day ordinal mod 8")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['driver_name']
+
+
+class DriverDaySummary(models.Model):
+    """Model to store a driver's hours per log date, summed over their logs and kept current on every write"""
+    driver_name = models.CharField(max_length=255)
+    day = models.DateField()
+    off_duty_hours = models.FloatField(default=0)
+    sleeper_berth_hours = models.FloatField(default=0)
+    driving_hours = models.FloatField(default=0)
+    on_duty_hours = models.FloatField(default=0)
+    log_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['driver_name', 'day']
+        constraints = [
+            models.UniqueConstraint(fields=['driver_name', 'day'], name='unique_driver_day_summary'),
+        ]
+        # Covers the fleet-wide per-day sums, so reports never touch the table itself
+        indexes = [models.Index(
+            fields=['day', 'off_duty_hours', 'sleeper_berth_hours', 'driving_hours', 'on_duty_hours'],
+            name='driver_day_summary_hours',
+        )]
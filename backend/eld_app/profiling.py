@@ -0,0 +1,150 @@
+"""
+Per-request profiling: SQL and upstream-call accounting plus sampled cProfile
+output, kept in a rotating directory of JSON records.
+
+Recording only happens while a request is being profiled by
+``eld_app.middleware.ProfilingMiddleware``; otherwise the hooks are no-ops.
+"""
+import contextvars
+import json
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+
+_current_profile = contextvars.ContextVar('eld_request_profile', default=None)
+
+# Collapse literals so repeated queries that differ only by parameters group together
+_SQL_LITERALS = re.compile(r"'[^']*'|\b\d+\b")
+
+
+class RequestProfile:
+    """Accumulates SQL and outbound HTTP timings for one request"""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.sql_statements: Dict[str, List[float]] = {}
+        self.upstream_calls: List[Dict] = []
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        """``connection.execute_wrapper`` hook timing every query"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sql_count += 1
+            self.sql_time += elapsed
+            self.sql_statements.setdefault(_SQL_LITERALS.sub('?', sql), []).append(elapsed)
+
+    def summary(self) -> Dict:
+        repeated = sorted(
+            ({'sql': sql, 'count': len(timings), 'time_ms': sum(timings) * 1000}
+             for sql, timings in self.sql_statements.items() if len(timings) > 1),
+            key=lambda item: item['count'], reverse=True
+        )
+        slowest = sorted(
+            ({'sql': sql, 'count': len(timings), 'time_ms': max(timings) * 1000}
+             for sql, timings in self.sql_statements.items()),
+            key=lambda item: item['time_ms'], reverse=True
+        )
+        return {
+            'sql_count': self.sql_count,
+            'sql_time_ms': self.sql_time * 1000,
+            'repeated_queries': repeated[:10],
+            'slowest_queries': slowest[:10],
+            'upstream_count': len(self.upstream_calls),
+            'upstream_time_ms': sum(call['time_ms'] for call in self.upstream_calls),
+            'upstream_calls': self.upstream_calls,
+        }
+
+
+def start_profile() -> contextvars.Token:
+    return _current_profile.set(RequestProfile())
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current_profile.get()
+
+
+def end_profile(token: contextvars.Token):
+    _current_profile.reset(token)
+
+
+@contextmanager
+def track_upstream(service: str):
+    """Record the duration of an outbound call made while a request is being profiled"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.upstream_calls.append({
+            'service': service,
+            'time_ms': (time.perf_counter() - started) * 1000,
+        })
+
+
+class ProfileStore:
+    """Rotating store of profile records, one JSON file per profiled request"""
+
+    def __init__(self, directory: Optional[str] = None, max_records: Optional[int] = None):
+        self.directory = str(directory or settings.PROFILING_DIR)
+        self.max_records = max_records or settings.PROFILING_MAX_RECORDS
+
+    def save(self, record: Dict) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        # Microseconds keep records saved within the same second in order for rotation
+        stamp = f'{time.strftime("%Y%m%d%H%M%S", time.localtime(now))}{int(now % 1 * 1e6):06d}'
+        profile_id = f'{stamp}-{uuid.uuid4().hex[:8]}'
+        record['id'] = profile_id
+        path = os.path.join(self.directory, f'{profile_id}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+        self._rotate()
+        return profile_id
+
+    def list(self) -> List[Dict]:
+        """Return stored records newest first, without their cProfile output"""
+        records = []
+        for profile_id in self._ids()[::-1]:
+            record = self.get(profile_id)
+            if record is not None:
+                record.pop('cprofile', None)
+                records.append(record)
+        return records
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        if not re.fullmatch(r'[\w-]+', profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f'{profile_id}.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _ids(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        # File names start with a timestamp, so lexical order is chronological
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith('.json'))
+
+    def _rotate(self):
+        ids = self._ids()
+        for profile_id in ids[:max(0, len(ids) - self.max_records)]:
+            try:
+                os.remove(os.path.join(self.directory, f'{profile_id}.json'))
+            except OSError:
+                pass
@@ -0,0 +1,63 @@
+"""orjson-based renderers and parser for the REST API"""
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# DRF's encoder covers the remaining types (Decimal, lazy strings, querysets, ...)
+_fallback_encoder = JSONEncoder()
+
+
+def _default(obj):
+    return _fallback_encoder.default(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Renders JSON with orjson, which serializes datetimes, floats and nested dicts natively"""
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+    options = orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = self.options
+        # Honour "Accept: application/json; indent=N" like DRF's JSONRenderer
+        if accepted_media_type and 'indent=' in accepted_media_type:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=options)
+
+
+def encode_event(event: str, data) -> bytes:
+    """One Server-Sent Events frame carrying ``data`` as JSON"""
+    return b'event: ' + event.encode() + b'\ndata: ' + orjson.dumps(data, default=_default) + b'\n\n'
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Renders a response to a ``text/event-stream`` request that ended before streaming began.
+
+    Views stream their own events; what DRF renders for such a request is a
+    validation or other error, sent as a single ``error`` event.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return encode_event('error', data)
+
+
+class ORJSONParser(BaseParser):
+    """Parses JSON request bodies with orjson"""
+
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
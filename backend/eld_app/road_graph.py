@@ -0,0 +1,436 @@
+"""
+Offline road-graph routing, used by ``RouteService`` when no OpenRouteService
+key is configured.
+
+The graph is imported from OSM ways (see ``manage.py import_road_graph``) and
+kept in compressed sparse row (CSR) form: the outgoing edges of node ``i`` are
+``targets[offsets[i]:offsets[i + 1]]`` with matching ``lengths`` (miles) and
+``times`` (seconds at truck speeds). The import also stores the incoming
+edges of every node in the same form, for the backward half of the
+bidirectional A* search, a spatial index of node ids sorted by grid cell, and
+the fastest edge speed that bounds the A* heuristic. Everything lives in flat
+``array`` buffers, so a nationwide graph loads with a handful of reads and
+queries touch no Python objects besides the search frontiers.
+"""
+import heapq
+import json
+import math
+import os
+import re
+import struct
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from .geo import EARTH_RADIUS_MILES, haversine_miles
+
+MAGIC = b'ELDRG2\n'
+_MAGIC_V1 = b'ELDRG1\n'  # Graphs without the stored index, incoming edges and max speed
+
+# Typical loaded-truck speeds (mph) by OSM highway class; other classes are not routable
+TRUCK_SPEEDS = {
+    'motorway': 62, 'motorway_link': 35,
+    'trunk': 55, 'trunk_link': 35,
+    'primary': 50, 'primary_link': 30,
+    'secondary': 45, 'secondary_link': 30,
+    'tertiary': 40, 'tertiary_link': 25,
+    'unclassified': 30, 'residential': 25, 'service': 15,
+}
+TRUCK_SPEED_LIMIT = 65  # Most carriers govern trucks to 65 mph or less
+ACCESS_SPEED = 25  # Speed assumed between a waypoint and its nearest graph node
+
+# Coordinates are rounded to about 10 cm so that ways sharing an OSM node share a graph node
+_COORD_PRECISION = 6
+# Side of a spatial index cell, in degrees
+_CELL_SIZE = 0.05
+# A little headroom absorbs float32 rounding so the A* heuristic stays admissible
+_SPEED_HEADROOM = 1.001
+
+
+def truck_speed(tags: Dict) -> Optional[float]:
+    """Truck speed in mph for a way with the given OSM tags, or None when trucks cannot use it"""
+    highway = tags.get('highway')
+    if highway not in TRUCK_SPEEDS:
+        return None
+    if tags.get('hgv') == 'no' or tags.get('access') in ('no', 'private'):
+        return None
+    speed = TRUCK_SPEEDS[highway]
+    maxspeed = _parse_maxspeed(tags.get('maxspeed'))
+    if maxspeed:
+        speed = min(speed, maxspeed)
+    return min(speed, TRUCK_SPEED_LIMIT)
+
+
+def _parse_maxspeed(value) -> Optional[float]:
+    if not value:
+        return None
+    match = re.match(r'\s*(\d+(?:\.\d+)?)\s*(mph)?', str(value))
+    if not match:
+        return None
+    speed = float(match.group(1))
+    # OSM speeds are km/h unless tagged with a unit
+    return speed if match.group(2) else speed * 0.621371
+
+
+class RoadGraphBuilder:
+    """Collects OSM ways and turns them into a ``RoadGraph``"""
+
+    def __init__(self):
+        self.node_ids: Dict[Tuple[float, float], int] = {}
+        self.lats = array('d')
+        self.lngs = array('d')
+        self.edges: List[Tuple[int, int, float, float]] = []
+        self.max_speed = 0.0
+
+    def _node(self, lng: float, lat: float) -> int:
+        key = (round(lng, _COORD_PRECISION), round(lat, _COORD_PRECISION))
+        node = self.node_ids.get(key)
+        if node is None:
+            node = self.node_ids[key] = len(self.lats)
+            self.lats.append(key[1])
+            self.lngs.append(key[0])
+        return node
+
+    def add_way(self, coordinates: Sequence[Sequence[float]], tags: Dict) -> bool:
+        """Add a ``[lng, lat]`` line with its OSM tags; returns False if trucks cannot use it"""
+        speed = truck_speed(tags)
+        if speed is None or len(coordinates) < 2:
+            return False
+        # An explicit oneway tag wins; motorways are only implied to be oneway when it is missing
+        oneway = tags.get('oneway', 'yes' if tags.get('highway') == 'motorway' else 'no')
+        if oneway == '-1':
+            coordinates = list(reversed(coordinates))
+        oneway = oneway in ('yes', 'true', '1', '-1')
+        nodes = [self._node(point[0], point[1]) for point in coordinates]
+        self.max_speed = max(self.max_speed, speed)
+        for source, target in zip(nodes, nodes[1:]):
+            if source == target:
+                continue
+            length = haversine_miles(self.lats[source], self.lngs[source], self.lats[target], self.lngs[target])
+            seconds = length / speed * 3600
+            self.edges.append((source, target, length, seconds))
+            if not oneway:
+                self.edges.append((target, source, length, seconds))
+        return True
+
+    def build(self) -> 'RoadGraph':
+        self.edges.sort()
+        node_count = len(self.lats)
+        offsets = array('q', [0]) * (node_count + 1)
+        targets = array('i')
+        lengths = array('f')
+        times = array('f')
+        for source, target, length, seconds in self.edges:
+            offsets[source + 1] += 1
+            targets.append(target)
+            lengths.append(length)
+            times.append(seconds)
+        for i in range(node_count):
+            offsets[i + 1] += offsets[i]
+        return RoadGraph(self.lats, self.lngs, offsets, targets, lengths, times,
+                         max_speed=(self.max_speed or TRUCK_SPEED_LIMIT) * _SPEED_HEADROOM)
+
+
+class RoadGraph:
+    """Immutable CSR road graph with bidirectional A* shortest-time queries.
+
+    ``max_speed``, ``cells`` (cell keys, cell offsets, node ids by cell) and
+    ``incoming`` (offsets, source nodes, edge ids) are stored by the import;
+    they are derived here only for graphs built in memory without them.
+    """
+
+    def __init__(self, lats: array, lngs: array, offsets: array, targets: array, lengths: array, times: array,
+                 max_speed: Optional[float] = None, cells: Optional[Tuple[array, array, array]] = None,
+                 incoming: Optional[Tuple[array, array, array]] = None):
+        self.lats = lats
+        self.lngs = lngs
+        self.offsets = offsets
+        self.targets = targets
+        self.lengths = lengths
+        self.times = times
+        self.max_speed = max_speed or self._max_speed()
+        self.cell_keys, self.cell_offsets, self.cell_nodes = cells or self._build_cells()
+        self.in_offsets, self.in_sources, self.in_edges = incoming or self._build_incoming()
+
+    @property
+    def node_count(self) -> int:
+        return len(self.lats)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def _max_speed(self) -> float:
+        fastest = max(
+            (length / seconds * 3600 for length, seconds in zip(self.lengths, self.times) if seconds > 0),
+            default=TRUCK_SPEED_LIMIT,
+        )
+        return fastest * _SPEED_HEADROOM
+
+    def _build_cells(self) -> Tuple[array, array, array]:
+        keys = [_cell_key(lat, lng) for lat, lng in zip(self.lats, self.lngs)]
+        cell_nodes = array('i', sorted(range(self.node_count), key=keys.__getitem__))
+        cell_keys = array('q')
+        cell_offsets = array('q')
+        for position, node in enumerate(cell_nodes):
+            if not cell_keys or cell_keys[-1] != keys[node]:
+                cell_keys.append(keys[node])
+                cell_offsets.append(position)
+        cell_offsets.append(len(cell_nodes))
+        return cell_keys, cell_offsets, cell_nodes
+
+    def _build_incoming(self) -> Tuple[array, array, array]:
+        in_offsets = array('q', [0]) * (self.node_count + 1)
+        for target in self.targets:
+            in_offsets[target + 1] += 1
+        for i in range(self.node_count):
+            in_offsets[i + 1] += in_offsets[i]
+        in_sources = array('i', [0]) * self.edge_count
+        in_edges = array('q', [0]) * self.edge_count
+        next_slot = in_offsets[:-1]
+        for source in range(self.node_count):
+            for edge in range(self.offsets[source], self.offsets[source + 1]):
+                slot = next_slot[self.targets[edge]]
+                in_sources[slot] = source
+                in_edges[slot] = edge
+                next_slot[self.targets[edge]] = slot + 1
+        return in_offsets, in_sources, in_edges
+
+    def _buffers(self) -> Tuple[array, ...]:
+        return (self.lats, self.lngs, self.offsets, self.targets, self.lengths, self.times,
+                self.cell_keys, self.cell_offsets, self.cell_nodes, self.in_offsets, self.in_sources, self.in_edges)
+
+    def save(self, path: str):
+        header = json.dumps({'nodes': self.node_count, 'edges': self.edge_count, 'cells': len(self.cell_keys),
+                             'max_speed': self.max_speed}).encode()
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for buffer in self._buffers():
+                buffer.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'RoadGraph':
+        with open(path, 'rb') as f:
+            magic = f.read(len(MAGIC))
+            if magic not in (MAGIC, _MAGIC_V1):
+                raise ValueError(f'{path} is not a road graph file')
+            (header_size,) = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_size))
+            nodes, edges = header['nodes'], header['edges']
+            layout = [('d', nodes), ('d', nodes), ('q', nodes + 1), ('i', edges), ('f', edges), ('f', edges)]
+            if magic == MAGIC:
+                layout += [('q', header['cells']), ('q', header['cells'] + 1), ('i', nodes),
+                           ('q', nodes + 1), ('i', edges), ('q', edges)]
+            buffers = []
+            for typecode, count in layout:
+                buffer = array(typecode)
+                buffer.fromfile(f, count)
+                buffers.append(buffer)
+        if magic == _MAGIC_V1:
+            # Re-run import_road_graph to store these instead of deriving them in every worker
+            return cls(*buffers)
+        return cls(*buffers[:6], max_speed=header['max_speed'], cells=tuple(buffers[6:9]),
+                   incoming=tuple(buffers[9:]))
+
+    def nearest_node(self, lat: float, lng: float, max_rings: int = 20) -> Optional[int]:
+        """Closest node to a point, searched ring by ring over the grid of the spatial index"""
+        cell_keys, cell_offsets, cell_nodes = self.cell_keys, self.cell_offsets, self.cell_nodes
+        row, col = _cell(lat, lng)
+        best, best_distance = None, math.inf
+        for ring in range(max_rings + 1):
+            for r in range(row - ring, row + ring + 1):
+                # Interior rows of the ring only contribute their first and last cells
+                cols = range(col - ring, col + ring + 1) if abs(r - row) == ring else (col - ring, col + ring)
+                for c in cols:
+                    key = _pack_cell(r, c)
+                    index = bisect_left(cell_keys, key)
+                    if index == len(cell_keys) or cell_keys[index] != key:
+                        continue
+                    for node in cell_nodes[cell_offsets[index]:cell_offsets[index + 1]]:
+                        distance = haversine_miles(lat, lng, self.lats[node], self.lngs[node])
+                        if distance < best_distance:
+                            best, best_distance = node, distance
+            # Anything in a further ring is at least ``ring`` cells away
+            if best is not None and best_distance < ring * _CELL_SIZE * 69 * math.cos(math.radians(lat)):
+                break
+        return best
+
+    def shortest_path(self, source: int, target: int) -> Optional[List[int]]:
+        """Fastest node path from ``source`` to ``target`` using bidirectional A* on travel time.
+
+        Both searches share the potential ``(h_target - h_source) / 2``, so
+        their reduced edge costs are consistent with each other and the search
+        can stop once the two smallest frontier keys add up to the best
+        meeting cost found so far.
+        """
+        if source == target:
+            return [source]
+        lats, lngs, times = self.lats, self.lngs, self.times
+        offsets, targets = self.offsets, self.targets
+        in_offsets, in_sources, in_edges = self.in_offsets, self.in_sources, self.in_edges
+        # Straight-line (chord) distances never exceed the great-circle length of any edge path and
+        # are far cheaper to compute than haversines
+        source_point, goal_point = _unit_vector(lats[source], lngs[source]), _unit_vector(lats[target], lngs[target])
+        half_seconds_per_radius = EARTH_RADIUS_MILES * 1800 / self.max_speed
+        potentials: Dict[int, float] = {}
+
+        def potential(node: int) -> float:
+            value = potentials.get(node)
+            if value is None:
+                point = _unit_vector(lats[node], lngs[node])
+                value = potentials[node] = (math.dist(point, goal_point)
+                                            - math.dist(point, source_point)) * half_seconds_per_radius
+            return value
+
+        forward: Dict[int, float] = {source: 0.0}
+        backward: Dict[int, float] = {target: 0.0}
+        previous: Dict[int, int] = {}
+        following: Dict[int, int] = {}
+        forward_frontier = [(potential(source), 0.0, source)]
+        backward_frontier = [(-potential(target), 0.0, target)]
+        best_cost, meeting = math.inf, None
+        while forward_frontier and backward_frontier:
+            if forward_frontier[0][0] + backward_frontier[0][0] >= best_cost:
+                break
+            if forward_frontier[0][0] <= backward_frontier[0][0]:
+                _, cost, node = heapq.heappop(forward_frontier)
+                if cost > forward[node]:
+                    continue
+                for edge in range(offsets[node], offsets[node + 1]):
+                    neighbor = targets[edge]
+                    new_cost = cost + times[edge]
+                    if new_cost < forward.get(neighbor, math.inf):
+                        forward[neighbor] = new_cost
+                        previous[neighbor] = node
+                        heapq.heappush(forward_frontier, (new_cost + potential(neighbor), new_cost, neighbor))
+                        if neighbor in backward and new_cost + backward[neighbor] < best_cost:
+                            best_cost, meeting = new_cost + backward[neighbor], neighbor
+            else:
+                _, cost, node = heapq.heappop(backward_frontier)
+                if cost > backward[node]:
+                    continue
+                for slot in range(in_offsets[node], in_offsets[node + 1]):
+                    neighbor = in_sources[slot]
+                    new_cost = cost + times[in_edges[slot]]
+                    if new_cost < backward.get(neighbor, math.inf):
+                        backward[neighbor] = new_cost
+                        following[neighbor] = node
+                        heapq.heappush(backward_frontier, (new_cost - potential(neighbor), new_cost, neighbor))
+                        if neighbor in forward and new_cost + forward[neighbor] < best_cost:
+                            best_cost, meeting = new_cost + forward[neighbor], neighbor
+        if meeting is None:
+            return None
+        path = [meeting]
+        node = meeting
+        while node in previous:
+            node = previous[node]
+            path.append(node)
+        path.reverse()
+        node = meeting
+        while node in following:
+            node = following[node]
+            path.append(node)
+        return path
+
+    def path_edges(self, path: List[int]) -> List[int]:
+        """Edge index of every step along a node path, taking the fastest of any parallel edges"""
+        edges = []
+        for source, target in zip(path, path[1:]):
+            fastest = None
+            for edge in range(self.offsets[source], self.offsets[source + 1]):
+                if self.targets[edge] == target and (fastest is None or self.times[edge] < self.times[fastest]):
+                    fastest = edge
+            edges.append(fastest)
+        return edges
+
+    def path_summary(self, path: List[int]) -> Tuple[float, float]:
+        """Total ``(miles, seconds)`` along a node path"""
+        edges = self.path_edges(path)
+        return sum(self.lengths[edge] for edge in edges), sum(self.times[edge] for edge in edges)
+
+    def route(self, waypoints: Iterable[Tuple[float, float]]) -> Optional[Dict]:
+        """Route through ``(lat, lng)`` waypoints; same shape as ``RouteService`` route details"""
+        waypoints = list(waypoints)
+        total_miles = total_seconds = 0.0
+        geometry: List[List[float]] = []
+        segment_speeds: List[float] = []
+        leg_distances: List[float] = []
+        way_points = [0]
+        for (from_lat, from_lng), (to_lat, to_lng) in zip(waypoints, waypoints[1:]):
+            source = self.nearest_node(from_lat, from_lng)
+            target = self.nearest_node(to_lat, to_lng)
+            if source is None or target is None:
+                return None
+            path = self.shortest_path(source, target)
+            if path is None:
+                return None
+            edges = self.path_edges(path)
+            miles = sum(self.lengths[edge] for edge in edges)
+            seconds = sum(self.times[edge] for edge in edges)
+            # Legs between the waypoints and the graph are driven at local speeds
+            access = (haversine_miles(from_lat, from_lng, self.lats[source], self.lngs[source])
+                      + haversine_miles(to_lat, to_lng, self.lats[target], self.lngs[target]))
+            total_miles += miles + access
+            leg_distances.append(miles + access)
+            total_seconds += seconds + access / ACCESS_SPEED * 3600
+            geometry.append([from_lng, from_lat])
+            geometry.extend([self.lngs[node], self.lats[node]] for node in path)
+            geometry.append([to_lng, to_lat])
+            way_points.append(len(geometry) - 1)
+            # One speed per geometry segment, including the zero-length joins between legs
+            if segment_speeds:
+                segment_speeds.append(ACCESS_SPEED)
+            segment_speeds.append(ACCESS_SPEED)
+            segment_speeds.extend(self.lengths[edge] / self.times[edge] * 3600 if self.times[edge] else ACCESS_SPEED
+                                  for edge in edges)
+            segment_speeds.append(ACCESS_SPEED)
+        return {
+            'total_distance': total_miles,
+            'estimated_duration': total_seconds / 3600,
+            'geometry': geometry,
+            'segment_speeds': segment_speeds,
+            'leg_distances': leg_distances,
+            'way_points': way_points,
+        }
+
+
+def _unit_vector(lat: float, lng: float) -> Tuple[float, float, float]:
+    phi, lmb = math.radians(lat), math.radians(lng)
+    return (math.cos(phi) * math.cos(lmb), math.cos(phi) * math.sin(lmb), math.sin(phi))
+
+
+def _cell(lat: float, lng: float) -> Tuple[int, int]:
+    return (math.floor(lat / _CELL_SIZE), math.floor(lng / _CELL_SIZE))
+
+
+def _pack_cell(row: int, col: int) -> int:
+    # Rows and columns of the whole globe fit in 12 and 13 bits once made non-negative
+    return (row + 2048) << 13 | (col + 4096)
+
+
+def _cell_key(lat: float, lng: float) -> int:
+    return _pack_cell(*_cell(lat, lng))
+
+
+@lru_cache(maxsize=2)
+def _load(path: str, mtime: float) -> RoadGraph:
+    return RoadGraph.load(path)
+
+
+def get_graph() -> Optional[RoadGraph]:
+    """The graph at ``ROAD_GRAPH_PATH``, loaded once per process and reloaded when the file changes"""
+    path = settings.ROAD_GRAPH_PATH
+    if not path:
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    return _load(path, mtime)
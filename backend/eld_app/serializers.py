@@ -1,5 +1,7 @@
+from datetime import datetime, timedelta
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Trip, RoutePoint, ELDLog, DutyStatus
+from .models import DUTY_STATUS_CHOICES, Trip, RoutePoint, ELDLog, DutyStatus
 
 
 class RoutePointSerializer(serializers.ModelSerializer):
@@ -32,32 +34,124 @@ class TripSerializer(serializers.ModelSerializer):
         model = Trip
         fields = '__all__'
     
+    def _placed_stops(self, obj, point_type):
+        """Stops stored as route points, in route order; uses prefetched route points when available"""
+        timestamp = serializers.DateTimeField()
+        return [
+            {
+                'location': point.address,
+                'latitude': point.latitude,
+                'longitude': point.longitude,
+                'mileage': point.mileage,
+                'estimated_arrival': timestamp.to_representation(point.estimated_arrival),
+                'estimated_departure': timestamp.to_representation(point.estimated_departure),
+                'duration_hours': point.duration_hours
+            }
+            for point in sorted(obj.route_points.all(), key=lambda point: point.sequence)
+            if point.point_type == point_type
+        ]
+    
     def get_fuel_stops(self, obj):
-        """Calculate fuel stops based on trip distance"""
-        if not obj.total_distance:
-            return []
+        """Fuel stops placed on the route, or planned from trip distance for older trips"""
+        placed = self._placed_stops(obj, 'fuel')
+        if placed or not obj.total_distance:
+            return placed
         
         from .services import RouteService
         route_service = RouteService()
         return route_service._plan_fuel_stops(obj.total_distance)
     
     def get_rest_stops(self, obj):
-        """Calculate rest stops based on trip duration"""
-        if not obj.estimated_duration:
-            return []
+        """Rest stops placed on the route, or planned from trip duration for older trips"""
+        placed = self._placed_stops(obj, 'rest')
+        if placed or not obj.estimated_duration:
+            return placed
         
         from .services import RouteService
         route_service = RouteService()
         return route_service._plan_rest_stops(obj.estimated_duration)
 
 
+class TripStopSerializer(serializers.Serializer):
+    """A stop between the pickup and the final drop-off, with an optional appointment window"""
+    location = serializers.CharField(max_length=255)
+    type = serializers.ChoiceField(choices=['pickup', 'dropoff'], default='dropoff')
+    service_hours = serializers.FloatField(default=1, min_value=0, max_value=24)
+    window_start = serializers.DateTimeField(required=False, allow_null=True)
+    window_end = serializers.DateTimeField(required=False, allow_null=True)
+    
+    def validate(self, data):
+        if data.get('window_start') and data.get('window_end') and data['window_end'] < data['window_start']:
+            raise serializers.ValidationError("window_end must not be before window_start")
+        return data
+
+
 class TripCreateSerializer(serializers.ModelSerializer):
+    stops = serializers.ListField(child=TripStopSerializer(), required=False, max_length=50)
+    
     class Meta:
         model = Trip
-        fields = ['id', 'current_location', 'pickup_location', 'dropoff_location', 'current_cycle_used']
+        fields = ['id', 'current_location', 'pickup_location', 'dropoff_location', 'current_cycle_used',
+                  'stops', 'optimize_stop_order']
         read_only_fields = ['id']
     
+    def validate_stops(self, value):
+        # Stored as JSON, so appointment times are kept as ISO 8601 strings
+        return [
+            {key: item.isoformat() if isinstance(item, datetime) else item for key, item in stop.items()}
+            for stop in value
+        ]
+    
+    def validate_current_cycle_used(self, value):
+        if value < 0 or value > 70:
+            raise serializers.ValidationError("Current cycle used must be between 0 and 70 hours")
+        return value
+
+
+class WhatIfPlanSerializer(serializers.Serializer):
+    """Input for the what-if planner: a trip, the driver's cycle usage and a departure window"""
+    current_location = serializers.CharField(max_length=255)
+    pickup_location = serializers.CharField(max_length=255)
+    dropoff_location = serializers.CharField(max_length=255)
+    current_cycle_used = serializers.FloatField(default=0)
+    earliest_departure = serializers.DateTimeField(required=False)
+    latest_departure = serializers.DateTimeField(required=False)
+    deliver_by = serializers.DateTimeField(required=False)
+    stops = serializers.ListField(child=TripStopSerializer(), required=False, max_length=50)
+    optimize_stop_order = serializers.BooleanField(default=False)
+    rest_status = serializers.ChoiceField(choices=['sleeper_berth', 'off_duty'], default='sleeper_berth')
+    step_minutes = serializers.IntegerField(default=15, min_value=5, max_value=120)
+    
     def validate_current_cycle_used(self, value):
         if value < 0 or value > 70:
             raise serializers.ValidationError("Current cycle used must be between 0 and 70 hours")
         return value
+    
+    def validate(self, data):
+        earliest = data.setdefault('earliest_departure', timezone.now())
+        latest = data.setdefault('latest_departure', earliest + timedelta(hours=24))
+        if latest < earliest:
+            raise serializers.ValidationError("latest_departure must not be before earliest_departure")
+        if latest - earliest > timedelta(days=7):
+            raise serializers.ValidationError("The departure window can be at most 7 days")
+        return data
+
+
+class DutyEventSerializer(serializers.Serializer):
+    """A duty status change reported by an in-cab device"""
+    sequence = serializers.IntegerField(min_value=1)
+    status = serializers.ChoiceField(choices=DUTY_STATUS_CHOICES)
+    event_time = serializers.DateTimeField()
+    location = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    remarks = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class DutyEventBatchSerializer(serializers.Serializer):
+    """A batch of one driver's duty events"""
+    events = serializers.ListField(child=DutyEventSerializer(), allow_empty=False, max_length=1000)
+    
+    def validate_events(self, value):
+        sequences = [event['sequence'] for event in value]
+        if len(set(sequences)) != len(sequences):
+            raise serializers.ValidationError("Sequence numbers must be unique within a batch")
+        return value
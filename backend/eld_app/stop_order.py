@@ -0,0 +1,142 @@
+"""
+Stop ordering for multi-stop trips.
+
+The route always starts at the driver's location, visits the first pickup
+next and ends at the final drop-off; the stops in between may be reordered.
+Orders are built with a nearest-neighbor pass and then improved with 2-opt
+(reverse a run of stops) and or-opt (move a run of 1-3 stops elsewhere)
+moves over a distance matrix computed once. Appointment windows are checked
+with a rough clock (average speed, dwell, and a 10-hour rest per 11 hours of
+driving); an order that is late anywhere always loses to one that is not.
+"""
+from array import array
+from typing import List, Optional, Sequence, Tuple
+
+from .geo import haversine_miles
+
+ROAD_FACTOR = 1.2  # Road miles per straight-line mile, for ranking orders only
+AVERAGE_SPEED = 55.0
+DRIVING_BEFORE_REST = 11.0
+REST_HOURS = 10.0
+
+_EPSILON = 1e-9
+
+
+def distance_matrix(coords: Sequence[Tuple[float, float]]) -> List[array]:
+    """Symmetric road-mile estimates between every pair of ``(lat, lng)`` points"""
+    size = len(coords)
+    matrix = [array('d', [0.0]) * size for _ in range(size)]
+    for i in range(size):
+        for j in range(i + 1, size):
+            miles = haversine_miles(coords[i][0], coords[i][1], coords[j][0], coords[j][1]) * ROAD_FACTOR
+            matrix[i][j] = matrix[j][i] = miles
+    return matrix
+
+
+class StopSequencer:
+    """Orders the stops between the fixed start, first pickup and final drop-off.
+
+    Nodes are matrix indices: 0 is the start, 1 the first pickup and the last
+    index the final drop-off. ``windows`` holds an ``(earliest, latest)`` pair
+    in hours after departure (either may be None) or None for each node.
+    """
+
+    def __init__(self, matrix: List[array], service_hours: Sequence[float],
+                 windows: Optional[Sequence[Optional[Tuple[Optional[float], Optional[float]]]]] = None):
+        self.matrix = matrix
+        self.service_hours = service_hours
+        self.windows = windows if windows and any(windows) else None
+
+    def solve(self) -> List[int]:
+        """Node order from start to final drop-off"""
+        last = len(self.matrix) - 1
+        if last < 2:
+            return list(range(last + 1))
+        route = [0, 1] + self._nearest_neighbor(1, list(range(2, last))) + [last]
+        self._improve(route)
+        return route
+
+    def _nearest_neighbor(self, origin: int, free: List[int]) -> List[int]:
+        order = []
+        current = origin
+        while free:
+            row = self.matrix[current]
+            current = min(free, key=row.__getitem__)
+            free.remove(current)
+            order.append(current)
+        return order
+
+    def miles(self, route: Sequence[int]) -> float:
+        return sum(self.matrix[a][b] for a, b in zip(route, route[1:]))
+
+    def late_hours(self, route: Sequence[int]) -> float:
+        """Total hours the route arrives after the end of appointment windows"""
+        if self.windows is None:
+            return 0.0
+        clock = driving = late = 0.0
+        for previous, node in zip(route, route[1:]):
+            hours = self.matrix[previous][node] / AVERAGE_SPEED
+            rests = int((driving + hours) / DRIVING_BEFORE_REST) - int(driving / DRIVING_BEFORE_REST)
+            driving += hours
+            clock += hours + rests * REST_HOURS
+            window = self.windows[node]
+            if window:
+                earliest, latest = window
+                if earliest is not None and clock < earliest:
+                    clock = earliest
+                if latest is not None and clock > latest:
+                    late += clock - latest
+            clock += self.service_hours[node]
+        return late
+
+    def _improve(self, route: List[int]):
+        """Apply improving 2-opt and or-opt moves until none is left"""
+        matrix = self.matrix
+        late = self.late_hours(route)
+        improved = True
+        while improved:
+            improved = False
+            # Positions 2 .. len - 2 are free; 0, 1 and the last one are fixed
+            end = len(route) - 2
+            for i in range(2, end + 1):
+                for j in range(i + 1, end + 1):
+                    a, b, c, d = route[i - 1], route[i], route[j], route[j + 1]
+                    delta = matrix[a][c] + matrix[b][d] - matrix[a][b] - matrix[c][d]
+                    if delta >= -_EPSILON and late <= _EPSILON:
+                        continue
+                    candidate = route[:i] + route[i:j + 1][::-1] + route[j + 1:]
+                    accepted, late = self._accept(delta, late, candidate)
+                    if accepted:
+                        route[:] = candidate
+                        improved = True
+            for length in (1, 2, 3):
+                for i in range(2, end - length + 2):
+                    segment = route[i:i + length]
+                    prev, nxt = route[i - 1], route[i + length]
+                    removal = matrix[prev][nxt] - matrix[prev][segment[0]] - matrix[segment[-1]][nxt]
+                    rest = route[:i] + route[i + length:]
+                    for k in range(1, len(rest) - 1):
+                        if k == i - 1:
+                            continue  # same place
+                        u, v = rest[k], rest[k + 1]
+                        delta = removal + matrix[u][segment[0]] + matrix[segment[-1]][v] - matrix[u][v]
+                        if delta >= -_EPSILON and late <= _EPSILON:
+                            continue
+                        candidate = rest[:k + 1] + segment + rest[k + 1:]
+                        accepted, late = self._accept(delta, late, candidate)
+                        if accepted:
+                            route[:] = candidate
+                            improved = True
+                            break
+
+    def _accept(self, delta: float, late: float, candidate: List[int]) -> Tuple[bool, float]:
+        """Whether a move with mileage change ``delta`` improves (lateness, miles); returns the new lateness.
+
+        Callers skip moves that are not shorter while the route is on time.
+        """
+        if self.windows is None:
+            return True, late
+        candidate_late = self.late_hours(candidate)
+        if candidate_late < late - _EPSILON or (abs(candidate_late - late) <= _EPSILON and delta < -_EPSILON):
+            return True, candidate_late
+        return False, late
@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase
+
+from eld_app.management.commands.audit_hos import audit_driver
+from eld_app.models import ELDLog, HOSAuditResult
+
+MONDAY = date(2024, 6, 3)
+
+
+def add_logs(driver_name, days, driving=10.0, on_duty=2.0):
+    ELDLog.objects.bulk_create([
+        ELDLog(driver_name=driver_name, log_date=MONDAY + timedelta(days=day), driving_hours=driving,
+               on_duty_hours=on_duty, off_duty_hours=24 - driving - on_duty)
+        for day in range(days)
+    ])
+
+
+def audit_rows(driver_name):
+    return list(HOSAuditResult.objects.filter(driver_name=driver_name).order_by('log_date').values_list(
+        'log_date', 'rolling_8_day_hours', 'violation_count'))
+
+
+class AuditDriverTests(TestCase):
+    def test_results_do_not_depend_on_the_chunk_size(self):
+        add_logs('Ann', 10)
+
+        audit_driver('Ann', None, None, 100)
+        whole = audit_rows('Ann')
+        self.assertEqual(audit_driver('Ann', None, None, 3), ('Ann', 10, sum(row[2] for row in whole)))
+
+        # Re-auditing replaces the rows, and the rolling cycle is carried across chunks
+        self.assertEqual(audit_rows('Ann'), whole)
+        self.assertEqual(whole[-1][1], 8 * 12)
+        self.assertGreater(whole[-1][2], 0)
+
+    def test_only_the_drivers_logs_in_range_are_audited(self):
+        add_logs('Ann', 10)
+        add_logs('Bob', 10)
+
+        since, until = (MONDAY + timedelta(days=2)).isoformat(), (MONDAY + timedelta(days=5)).isoformat()
+        self.assertEqual(audit_driver('Ann', since, until, 2)[1], 4)
+
+        self.assertEqual([row[0] for row in audit_rows('Ann')], [MONDAY + timedelta(days=day) for day in range(2, 6)])
+        self.assertEqual(audit_rows('Bob'), [])
+
+
+class AuditCommandTests(TransactionTestCase):
+    def setUp(self):
+        for driver_name in ('Ann', 'Bob', 'Cal'):
+            add_logs(driver_name, 4)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = os.path.join(directory.name, 'checkpoint.json')
+
+    def audit(self, *args):
+        output = StringIO()
+        call_command('audit_hos', '--workers', '2', '--chunk-size', '2', '--checkpoint', self.checkpoint,
+                     *args, stdout=output)
+        return output.getvalue()
+
+    def test_drivers_are_partitioned_across_workers_and_checkpointed(self):
+        output = self.audit()
+
+        self.assertIn('Audited 12 logs', output)
+        self.assertEqual(HOSAuditResult.objects.count(), 12)
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f), {'completed_drivers': ['Ann', 'Bob', 'Cal']})
+
+    def test_resume_skips_finished_drivers(self):
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'completed_drivers': ['Ann']}, f)
+
+        output = self.audit('--resume')
+
+        self.assertIn('(1 already done)', output)
+        self.assertEqual(set(HOSAuditResult.objects.values_list('driver_name', flat=True)), {'Bob', 'Cal'})
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)['completed_drivers'], ['Ann', 'Bob', 'Cal'])
+
+    def test_without_resume_the_checkpoint_is_ignored(self):
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'completed_drivers': ['Ann']}, f)
+
+        self.audit()
+
+        self.assertEqual(HOSAuditResult.objects.filter(driver_name='Ann').count(), 4)
+
+    def test_invalid_arguments_are_rejected(self):
+        for args in (['--since', '06/03/2024'], ['--workers', '0']):
+            with self.subTest(args=args), self.assertRaises(CommandError):
+                call_command('audit_hos', '--checkpoint', self.checkpoint, *args, stdout=StringIO())
@@ -0,0 +1,121 @@
+import gzip
+
+from django.contrib.admin.sites import site
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+
+from eld_app.models import DutyStatus, ELDLog, RoutePoint, Trip
+from eld_app.trip_updates import replan_trip
+
+# Gazetteer cities and the straight-line fallback route: no network access
+OFFLINE = override_settings(OPENROUTE_API_KEY='', ROAD_GRAPH_PATH='', TRUCK_STOPS_PATH='')
+
+
+@OFFLINE
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        response = self.client.post('/api/trips/', {
+            'current_location': 'Chicago, IL', 'pickup_location': 'Denver, CO', 'dropoff_location': 'Seattle, WA',
+            'current_cycle_used': 10,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.trip = Trip.objects.get(pk=response.json()['id'])
+        log = self.trip.eld_logs.first()
+        self.urls = [
+            f'/api/trips/{self.trip.id}/',
+            f'/api/trips/{self.trip.id}/logs/',
+            f'/api/trips/{self.trip.id}/logs/{log.id}/pdf/',
+        ]
+
+    def test_matching_etag_or_date_answers_304(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Cache-Control'], 'no-cache')
+
+                revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(revalidated.status_code, 304)
+                self.assertEqual(revalidated['ETag'], response['ETag'])
+                self.assertEqual(revalidated.content, b'')
+
+                by_date = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(by_date.status_code, 304)
+
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_representations_have_distinct_etags(self):
+        etags = {self.client.get(url)['ETag'] for url in self.urls}
+        self.assertEqual(len(etags), len(self.urls))
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_compressed_response_has_a_weak_etag_that_still_revalidates(self):
+        url = self.urls[0]
+        plain = self.client.get(url)
+        compressed = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(compressed['ETag'], 'W/' + plain['ETag'])
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        # If-None-Match uses the weak comparison, so either validator matches either representation
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=compressed['ETag']).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=plain['ETag'], HTTP_ACCEPT_ENCODING='gzip').status_code, 304
+        )
+
+    def test_replanning_changes_the_etag(self):
+        etag = self.client.get(self.urls[1])['ETag']
+
+        response = self.client.patch(self.urls[0], {'dropoff_location': 'Los Angeles, CA'},
+                                     content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        fresh = self.client.get(self.urls[1], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], etag)
+        self.assertEqual(len(fresh.json()), self.trip.eld_logs.count())
+
+    def test_replan_saves_the_trip_in_its_transaction(self):
+        version = self.trip.updated_at
+        self.trip.dropoff_location = 'Los Angeles, CA'
+
+        replan_trip(self.trip)
+
+        self.assertGreater(Trip.objects.get(pk=self.trip.pk).updated_at, version)
+
+    def test_admin_edits_of_child_rows_change_the_etag(self):
+        request = RequestFactory().post('/admin/')
+        status = DutyStatus.objects.filter(eld_log__trip=self.trip).first()
+        point = self.trip.route_points.first()
+        edits = [
+            (site._registry[DutyStatus], lambda admin: admin.save_model(request, status, None, True)),
+            (site._registry[RoutePoint], lambda admin: admin.delete_model(request, point)),
+            (site._registry[ELDLog], lambda admin: admin.delete_queryset(
+                request, ELDLog.objects.filter(pk=self.trip.eld_logs.last().pk))),
+        ]
+        for admin, edit in edits:
+            with self.subTest(model=admin.model.__name__):
+                version = Trip.objects.get(pk=self.trip.pk).updated_at
+                etag = self.client.get(self.urls[0])['ETag']
+
+                edit(admin)
+
+                self.assertGreater(Trip.objects.get(pk=self.trip.pk).updated_at, version)
+                response = self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag,
+                                           HTTP_IF_MODIFIED_SINCE=http_date(version.timestamp()))
+                self.assertEqual(response.status_code, 200)
+
+    def test_deleting_a_trip_cascades_without_per_row_work(self):
+        statuses = DutyStatus.objects.filter(eld_log__trip=self.trip).count()
+        self.assertGreater(statuses, 10)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.trip.delete()
+
+        sql = [query['sql'] for query in queries.captured_queries]
+        self.assertFalse([statement for statement in sql if statement.startswith('UPDATE')])
+        # Children are deleted in bulk: the query count does not grow with the number of rows
+        self.assertLess(len(sql), 12)
+        self.assertFalse(DutyStatus.objects.exists())
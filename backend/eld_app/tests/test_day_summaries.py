@@ -0,0 +1,105 @@
+from datetime import date, timedelta
+
+from django.test import TestCase
+
+from eld_app import day_summaries
+from eld_app.models import DriverDaySummary, ELDLog
+
+MONDAY = date(2024, 6, 3)
+
+
+def add_log(driver_name, day, driving=0.0, on_duty=0.0):
+    return ELDLog.objects.create(
+        driver_name=driver_name, log_date=day, driving_hours=driving, on_duty_hours=on_duty,
+        off_duty_hours=24 - driving - on_duty,
+    )
+
+
+class RefreshDaysTests(TestCase):
+    def test_days_are_summed_over_their_logs(self):
+        add_log('Ann', MONDAY, driving=5, on_duty=1)
+        add_log('Ann', MONDAY, driving=3, on_duty=2)
+        add_log('Bob', MONDAY, driving=4)
+
+        day_summaries.refresh_days([('Ann', MONDAY), ('Bob', MONDAY)])
+
+        ann = DriverDaySummary.objects.get(driver_name='Ann', day=MONDAY)
+        self.assertEqual((ann.driving_hours, ann.on_duty_hours, ann.log_count), (8, 3, 2))
+        self.assertEqual(DriverDaySummary.objects.get(driver_name='Bob').driving_hours, 4)
+
+    def test_refresh_is_idempotent_and_drops_emptied_days(self):
+        log = add_log('Ann', MONDAY, driving=5)
+        day_summaries.refresh_days([('Ann', MONDAY)])
+        day_summaries.refresh_days([('Ann', MONDAY)])
+        self.assertEqual(DriverDaySummary.objects.get().driving_hours, 5)
+
+        log.delete()
+        day_summaries.refresh_days([('Ann', MONDAY)])
+
+        self.assertFalse(DriverDaySummary.objects.exists())
+
+
+class ReconcileTests(TestCase):
+    def setUp(self):
+        for offset in range(3):
+            add_log('Ann', MONDAY + timedelta(days=offset), driving=offset + 1)
+        day_summaries.refresh_days([('Ann', MONDAY + timedelta(days=offset)) for offset in range(3)])
+
+    def test_matching_summaries_are_left_alone(self):
+        self.assertEqual(day_summaries.reconcile('Ann'), {'created': 0, 'updated': 0, 'deleted': 0})
+
+    def test_writes_that_bypassed_the_rollup_are_repaired(self):
+        ELDLog.objects.filter(log_date=MONDAY).update(driving_hours=9)
+        ELDLog.objects.filter(log_date=MONDAY + timedelta(days=1)).delete()
+        add_log('Ann', MONDAY + timedelta(days=5), driving=2)
+
+        self.assertEqual(day_summaries.reconcile('Ann', apply=False), {'created': 1, 'updated': 1, 'deleted': 1})
+        self.assertEqual(DriverDaySummary.objects.get(day=MONDAY).driving_hours, 1)
+
+        day_summaries.reconcile('Ann')
+
+        self.assertEqual(
+            list(DriverDaySummary.objects.values_list('day', 'driving_hours')),
+            [(MONDAY, 9), (MONDAY + timedelta(days=2), 3), (MONDAY + timedelta(days=5), 2)],
+        )
+        self.assertEqual(day_summaries.reconcile('Ann'), {'created': 0, 'updated': 0, 'deleted': 0})
+
+    def test_reconcile_stays_within_the_date_range(self):
+        ELDLog.objects.all().delete()
+
+        result = day_summaries.reconcile('Ann', start=MONDAY + timedelta(days=1), end=MONDAY + timedelta(days=1))
+
+        self.assertEqual(result['deleted'], 1)
+        self.assertEqual(DriverDaySummary.objects.count(), 2)
+
+
+class ReportTests(TestCase):
+    def setUp(self):
+        keys = []
+        for offset in range(10):
+            day = MONDAY + timedelta(days=offset)
+            add_log('Ann', day, driving=8, on_duty=2)
+            keys.append(('Ann', day))
+        add_log('Bob', MONDAY, driving=4)
+        keys.append(('Bob', MONDAY))
+        day_summaries.refresh_days(keys)
+
+    def test_weeks_fold_the_fleet_days(self):
+        weeks = day_summaries.aggregate(MONDAY, MONDAY + timedelta(days=9), 'week')
+
+        self.assertEqual([week['period_start'] for week in weeks], [MONDAY, MONDAY + timedelta(days=7)])
+        self.assertEqual(weeks[0]['period_end'], MONDAY + timedelta(days=6))
+        self.assertEqual((weeks[0]['driver_days'], weeks[0]['driving_hours']), (8, 60))
+        self.assertEqual((weeks[1]['driver_days'], weeks[1]['on_duty_hours']), (3, 6))
+
+    def test_one_driver_by_month(self):
+        (june,) = day_summaries.aggregate(MONDAY, MONDAY + timedelta(days=9), 'month', driver_name='Bob')
+
+        self.assertEqual((june['period_start'], june['period_end']), (date(2024, 6, 1), date(2024, 6, 30)))
+        self.assertEqual((june['driver_days'], june['driving_hours']), (1, 4))
+
+    def test_on_duty_history_covers_the_days_before(self):
+        history = day_summaries.on_duty_history('Ann', MONDAY + timedelta(days=9), days=7)
+
+        self.assertEqual([day for day, _ in history], [MONDAY + timedelta(days=offset) for offset in range(2, 9)])
+        self.assertTrue(all(hours == 10 for _, hours in history))
@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.test import Client, TransactionTestCase
+
+from eld_app.benchmarks.stubs import offline_upstreams
+from eld_app.models import DriverDaySummary, Trip
+
+WRITERS = 8
+TRIPS_PER_WRITER = 5
+
+
+def create_trips(writer: int):
+    """Create trips through POST /api/trips/ on this thread's own connection; return the failures"""
+    client = Client(HTTP_HOST='localhost')
+    errors = []
+    try:
+        for i in range(TRIPS_PER_WRITER):
+            try:
+                response = client.post('/api/trips/', {
+                    'current_location': f'{writer}{i} Main St, Springfield',
+                    'pickup_location': 'Chicago, IL',
+                    'dropoff_location': 'Denver, CO',
+                    'current_cycle_used': 10,
+                }, content_type='application/json')
+                if response.status_code != 201:
+                    errors.append(f'HTTP {response.status_code}: {response.content[:200]!r}')
+            except Exception as e:
+                errors.append(f'{type(e).__name__}: {e}')
+    finally:
+        connection.close()
+    return errors
+
+
+class ConcurrentWritesTests(TransactionTestCase):
+    """Trip creations from several connections at once must wait for the write lock, not fail"""
+
+    def test_concurrent_trip_creation(self):
+        with offline_upstreams(), ThreadPoolExecutor(max_workers=WRITERS) as pool:
+            errors = [error for writer_errors in pool.map(create_trips, range(WRITERS)) for error in writer_errors]
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Trip.objects.count(), WRITERS * TRIPS_PER_WRITER)
+        self.assertTrue(DriverDaySummary.objects.exists())
@@ -0,0 +1,104 @@
+import os
+import tempfile
+from datetime import date
+
+from django.test import TestCase, override_settings
+
+from eld_app.duty_import import DutyHistoryImporter
+from eld_app.models import DriverDaySummary, DutyStatus, ELDLog
+
+CSV = """driver_name,start_time,status,location
+Ann,2024-06-03T06:00:00,on_duty,Yard
+Bob,2024-06-03T07:00:00,off_duty,Home
+Ann,2024-06-03T07:00:00,driving,I-80
+Ann,2024-06-03T15:00:00,off_duty,Rest area
+Bob,2024-06-03T20:00:00,driving,I-55
+Ann,2024-06-04T06:00:00,driving,I-80
+Bob,2024-06-04T02:00:00,off_duty,Truck stop
+Ann,2024-06-04T09:00:00,4,Receiver
+"""
+
+
+def statuses():
+    return sorted(DutyStatus.objects.values_list(
+        'eld_log__driver_name', 'eld_log__log_date', 'start_time', 'end_time', 'status', 'location'))
+
+
+@override_settings(ELD_TIME_ZONE='America/Chicago')
+class DutyImportTests(TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as f:
+            f.write(CSV)
+        self.addCleanup(os.remove, self.path)
+
+    def run_import(self, **options):
+        importer = DutyHistoryImporter(**options)
+        importer.import_file(self.path)
+        importer.finish()
+        return importer
+
+    def test_statuses_are_cut_into_daily_logs(self):
+        importer = self.run_import()
+
+        # The two overnight records are stored as one row on each side of midnight
+        self.assertEqual(importer.stats['imported'], 10)
+        bob_day = ELDLog.objects.get(driver_name='Bob', log_date=date(2024, 6, 3))
+        self.assertEqual(bob_day.driving_hours, 4)  # 20:00 to midnight, the rest is on the 4th
+        self.assertEqual(bob_day.off_duty_hours, 13)
+        ann_day = ELDLog.objects.get(driver_name='Ann', log_date=date(2024, 6, 3))
+        self.assertEqual((ann_day.on_duty_hours, ann_day.driving_hours, ann_day.off_duty_hours), (1, 8, 9))
+        ann_next = ELDLog.objects.get(driver_name='Ann', log_date=date(2024, 6, 4))
+        # Status 4 is the ELD code for on duty; the last record stays open until midnight
+        self.assertEqual((ann_next.driving_hours, ann_next.on_duty_hours), (3, 15))
+
+    def test_day_summaries_follow_the_import(self):
+        self.run_import()
+
+        summary = DriverDaySummary.objects.get(driver_name='Ann', day=date(2024, 6, 3))
+        self.assertEqual((summary.driving_hours, summary.log_count), (8, 1))
+        self.assertEqual(DriverDaySummary.objects.count(), ELDLog.objects.count())
+
+    def test_reimporting_a_file_skips_stored_records(self):
+        self.run_import()
+        before = statuses()
+
+        importer = self.run_import()
+
+        self.assertEqual(importer.stats['imported'], 0)
+        self.assertEqual(importer.stats['duplicates'], 10)
+        self.assertEqual(statuses(), before)
+
+    def test_interrupted_import_resumes_from_checkpoint(self):
+        self.run_import()
+        expected = statuses()
+        DutyStatus.objects.all().delete()
+        ELDLog.objects.all().delete()
+
+        checkpoints = []
+
+        def interrupt(line):
+            checkpoints.append((line, importer.pending_state()))
+            raise KeyboardInterrupt
+
+        importer = DutyHistoryImporter(chunk_size=2)
+        with self.assertRaises(KeyboardInterrupt):
+            importer.import_file(self.path, on_chunk=interrupt)
+        line, pending = checkpoints[-1]
+
+        resumed = DutyHistoryImporter(chunk_size=2)
+        resumed.restore_pending(pending)
+        resumed.import_file(self.path, resume_line=line)
+        resumed.finish()
+
+        self.assertEqual(statuses(), expected)
+
+    def test_records_out_of_order_are_rejected(self):
+        with open(self.path, 'a') as f:
+            f.write('Ann,2024-06-04T08:00:00,on_duty,Receiver\n')
+
+        importer = self.run_import()
+
+        self.assertEqual(importer.stats['out_of_order'], 1)
+        with self.assertRaises(ValueError):
+            DutyHistoryImporter(strict=True).import_file(self.path)
@@ -0,0 +1,114 @@
+from datetime import date, datetime, timedelta
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from asgiref.sync import sync_to_async
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from eld_app.eld_output import (
+    LINE_END, ELDOutputFile, event_check_value, file_check_value, line_check_value,
+)
+from eld_app.models import DutyStatus, ELDLog
+
+CHICAGO = ZoneInfo('America/Chicago')
+START = date(2024, 6, 3)
+EXPORTED_AT = datetime(2024, 7, 1, 12, tzinfo=CHICAGO)
+
+
+class CheckValueTests(SimpleTestCase):
+    # Worked by hand from section 4.4.5: letters and digits count their ASCII code minus 48, anything else 0
+    def test_line_check_value(self):
+        # A + B = 17 + 18 = 0x23, rotated left 3 bits = 0x19, xor 0x96
+        self.assertEqual(line_check_value('AB'), 0x8F)
+        self.assertEqual(line_check_value('A,B -'), 0x8F)
+
+    def test_event_check_value(self):
+        # 1 + 3 = 4, rotated left 3 bits = 0x20, xor 0xC3
+        self.assertEqual(event_check_value(['1', '3']), 'E3')
+
+    def test_file_check_value(self):
+        # 0x1234 rotated left 3 bits in 16 = 0x91A0, xor 0x969C
+        self.assertEqual(file_check_value(0x1234), '073C')
+        self.assertEqual(file_check_value(0x11234), '073C')
+
+
+def add_days(driver_name, days):
+    logs = ELDLog.objects.bulk_create([
+        ELDLog(driver_name=driver_name, log_date=START + timedelta(days=day), vehicle_number='Truck-7')
+        for day in range(days)
+    ])
+    statuses = []
+    for log in logs:
+        midnight = datetime.combine(log.log_date, datetime.min.time(), CHICAGO)
+        for hour, status in ((0, 'off_duty'), (6, 'on_duty'), (7, 'driving'), (15, 'off_duty')):
+            statuses.append(DutyStatus(
+                eld_log=log, status=status, location='Joliet, IL', remarks='',
+                start_time=midnight + timedelta(hours=hour), end_time=midnight + timedelta(hours=hour + 1),
+            ))
+    DutyStatus.objects.bulk_create(statuses)
+
+
+@override_settings(ELD_TIME_ZONE='America/Chicago')
+@mock.patch('eld_app.eld_output.timezone.now', lambda: EXPORTED_AT)
+class ELDOutputFileTests(TestCase):
+    def setUp(self):
+        add_days('Jane Driver', 3)
+
+    def test_every_line_carries_its_check_values(self):
+        lines = list(ELDOutputFile('Jane Driver', START, START + timedelta(days=2)).lines())
+
+        self.assertTrue(all(line.endswith(LINE_END) for line in lines))
+        data_lines = [line[:-2] for line in lines[:-1] if not line.endswith(':' + LINE_END)]
+        total = 0
+        for line in data_lines:
+            body, _, check = line.rpartition(',')
+            self.assertEqual(int(check, 16), line_check_value(body), line)
+            total += int(check, 16)
+        self.assertEqual(lines[-1], file_check_value(total) + LINE_END)
+
+        events = lines[lines.index('ELD Event List:' + LINE_END) + 1:
+                       lines.index('ELD Event Annotations or Comments:' + LINE_END)]
+        self.assertEqual(len(events), 12)
+        fields = events[2].split(',')
+        self.assertEqual(fields[4], '3')  # driving
+        self.assertEqual((fields[5], fields[6]), ('060324', '070000'))
+        self.assertEqual(fields[-2], event_check_value(
+            ['1', '3', '060324', '070000', '0', '0.0', 'M', 'M', '1', 'janedriver']
+        ))
+
+    def test_filename(self):
+        self.assertEqual(ELDOutputFile('Jane Driver', START, date(2024, 6, 5)).filename(), 'Drive060524-janedriver.csv')
+
+
+@override_settings(ELD_TIME_ZONE='America/Chicago')
+@mock.patch('eld_app.eld_output.timezone.now', lambda: EXPORTED_AT)
+class ELDOutputStreamTests(TestCase):
+    def setUp(self):
+        add_days('Jane Driver', 120)
+
+    async def test_large_exports_stream_in_chunks(self):
+        expected = await sync_to_async(
+            lambda: ''.join(ELDOutputFile('Jane Driver', START, START + timedelta(days=119)).lines())
+        )()
+        produced = []
+        lines = ELDOutputFile.lines
+
+        def counted(output):
+            for line in lines(output):
+                produced.append(line)
+                yield line
+
+        with mock.patch.object(ELDOutputFile, 'lines', counted):
+            response = await self.async_client.get('/api/eld-output/', {
+                'driver': 'Jane Driver', 'start': START.isoformat(), 'end': (START + timedelta(days=119)).isoformat(),
+            })
+            self.assertTrue(response.is_async)
+            stream = response.streaming_content
+            first = await anext(stream)
+            # Only the first chunk has been read from the database so far
+            self.assertEqual(len(produced), 500)
+            chunks = [first] + [chunk async for chunk in stream]
+
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="Drive093024-janedriver.csv"')
+        self.assertEqual(len(chunks), -(-len(produced) // 500))
+        self.assertEqual(b''.join(chunks).decode(), expected)
@@ -0,0 +1,171 @@
+from array import array
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.test import SimpleTestCase, override_settings
+
+from eld_app.eta import DayGrid, ETAEngine, RouteSegments, first_midnight, split_by_day, utc_offsets
+from eld_app.geo import LegScale
+
+CHICAGO = ZoneInfo('America/Chicago')
+FLAT_PROFILE = (1.0,) * 24
+
+
+def trip_points(miles, dropoff_window=None):
+    return [
+        {'type': 'start', 'location': 'Yard', 'mileage': 0.0, 'duration_hours': 0},
+        {'type': 'pickup', 'location': 'Shipper', 'mileage': 0.0, 'duration_hours': 1},
+        {'type': 'dropoff', 'location': 'Receiver', 'mileage': miles, 'duration_hours': 1,
+         'window_start': dropoff_window},
+    ]
+
+
+def hours(entry):
+    return (entry['end_time'] - entry['start_time']).total_seconds() / 3600
+
+
+@override_settings(ELD_TIME_ZONE='America/Chicago')
+class ETAEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.engine = ETAEngine(FLAT_PROFILE)
+        self.departure = datetime(2024, 6, 3, 6, tzinfo=CHICAGO)
+
+    def schedule(self, miles, cycle_used=0.0, **point_options):
+        points = trip_points(miles, **point_options)
+        segments = RouteSegments(array('d', [miles]), array('d', [55.0]))
+        return points, self.engine.schedule(segments, points, self.departure, cycle_used)
+
+    def assert_within_limits(self, timeline):
+        """Replay the timeline against the 8-hour break, 11-hour driving and 14-hour window limits"""
+        since_break = in_shift = 0.0
+        shift_start = None
+        for entry in timeline:
+            if entry['status'] in ('off_duty', 'sleeper_berth'):
+                if hours(entry) >= 0.5:
+                    since_break = 0.0
+                if hours(entry) >= 10:
+                    in_shift, shift_start = 0.0, None
+                continue
+            shift_start = shift_start or entry['start_time']
+            if entry['status'] == 'driving':
+                since_break += hours(entry)
+                in_shift += hours(entry)
+                self.assertLessEqual(since_break, 8 + 1e-9)
+                self.assertLessEqual(in_shift, 11 + 1e-9)
+                self.assertLessEqual((entry['end_time'] - shift_start) / timedelta(hours=1), 14 + 1e-9)
+
+    def test_break_after_eight_hours_of_driving(self):
+        points, timeline = self.schedule(550)  # 10 hours at 55 mph
+
+        self.assertEqual([entry['status'] for entry in timeline],
+                         ['on_duty', 'driving', 'off_duty', 'driving', 'on_duty'])
+        self.assertAlmostEqual(hours(timeline[1]), 8)
+        self.assertAlmostEqual(hours(timeline[2]), 0.5)
+        self.assertIn('30-minute break', timeline[2]['remarks'])
+        self.assertEqual(points[2]['estimated_arrival'], self.departure + timedelta(hours=11.5))
+        self.assertEqual(points[2]['estimated_departure'], timeline[-1]['end_time'])
+
+    def test_ten_hour_rest_after_eleven_hours_of_driving(self):
+        _, timeline = self.schedule(1650)  # 30 hours of driving
+
+        rests = [entry for entry in timeline if entry['status'] == 'sleeper_berth']
+        self.assertEqual(len(rests), 2)
+        self.assertTrue(all(abs(hours(rest) - 10) < 1e-9 for rest in rests))
+        self.assertAlmostEqual(sum(hours(entry) for entry in timeline if entry['status'] == 'driving'), 30)
+        self.assert_within_limits(timeline)
+
+    def test_restart_when_cycle_is_used_up(self):
+        _, timeline = self.schedule(110, cycle_used=69.5)
+
+        restart = timeline[1]
+        self.assertEqual(restart['status'], 'off_duty')
+        self.assertAlmostEqual(hours(restart), 34)
+        self.assertIn('34-hour restart', restart['remarks'])
+        self.assertEqual(timeline[2]['status'], 'driving')
+
+    def test_waits_for_appointment_window(self):
+        window = self.departure + timedelta(hours=8)
+        points, timeline = self.schedule(110, dropoff_window=window)
+
+        wait = timeline[-2]
+        self.assertEqual(wait['status'], 'off_duty')
+        self.assertEqual(wait['remarks'], 'Waiting for appointment window')
+        self.assertEqual(wait['end_time'], window)
+        self.assertEqual(points[2]['estimated_arrival'], self.departure + timedelta(hours=3))
+        self.assertEqual(points[2]['estimated_departure'], window + timedelta(hours=1))
+
+    def test_timeline_is_contiguous(self):
+        _, timeline = self.schedule(1650)
+
+        self.assertEqual(timeline[0]['start_time'], self.departure)
+        for previous, entry in zip(timeline, timeline[1:]):
+            self.assertEqual(previous['end_time'], entry['start_time'])
+
+
+class RouteSegmentsTests(SimpleTestCase):
+    def setUp(self):
+        self.segments = RouteSegments(array('d', [100.0, 300.0]), array('d', [50.0, 100.0]))
+
+    def test_hours_to(self):
+        self.assertAlmostEqual(self.segments.hours_to(100), 2)
+        self.assertAlmostEqual(self.segments.hours_to(200), 3)
+        self.assertAlmostEqual(self.segments.hours_to(300), 4)
+
+    def test_mileage_after(self):
+        self.assertAlmostEqual(self.segments.mileage_after(1), 50)
+        self.assertAlmostEqual(self.segments.mileage_after(3), 200)
+        self.assertEqual(self.segments.mileage_after(10), 300)
+
+    def test_round_trip(self):
+        for mileage in (0.0, 12.5, 100.0, 250.0, 299.0):
+            self.assertAlmostEqual(self.segments.mileage_after(self.segments.hours_to(mileage)), mileage)
+
+
+class LegScaleTests(SimpleTestCase):
+    def test_maps_each_leg_separately(self):
+        scale = LegScale([0.0, 100.0, 300.0], [0.0, 120.0, 320.0])
+
+        self.assertEqual(scale.total_distance, 300)
+        self.assertAlmostEqual(scale.to_polyline(50), 60)
+        self.assertAlmostEqual(scale.to_polyline(200), 220)
+        self.assertAlmostEqual(scale.to_route(220), 200)
+
+    def test_changing_last_leg_keeps_earlier_mileage(self):
+        before = LegScale([0.0, 100.0, 300.0], [0.0, 120.0, 320.0])
+        after = LegScale([0.0, 100.0, 500.0], [0.0, 120.0, 480.0])
+
+        self.assertEqual(before.to_polyline(80), after.to_polyline(80))
+
+
+@override_settings(ELD_TIME_ZONE='America/Chicago')
+class DayGridTests(SimpleTestCase):
+    def entry(self, start, end, status='driving'):
+        return {'start_time': start, 'end_time': end, 'status': status, 'location': 'En route', 'remarks': ''}
+
+    def test_splits_at_local_midnight_and_pads_with_off_duty(self):
+        start = datetime(2024, 6, 3, 20, tzinfo=CHICAGO)
+        days = split_by_day([self.entry(start, start + timedelta(hours=8))])
+
+        self.assertEqual([log_date for log_date, _, _ in days], [date(2024, 6, 3), date(2024, 6, 4)])
+        first, second = days[0][2], days[1][2]
+        self.assertEqual([(s.start_minute, s.end_minute, s.status) for s in first],
+                         [(0, 1200, 'off_duty'), (1200, 1440, 'driving')])
+        self.assertEqual([(s.start_minute, s.end_minute, s.status) for s in second],
+                         [(0, 240, 'driving'), (240, 1440, 'off_duty')])
+        self.assertEqual(days[1][1], datetime(2024, 6, 4, tzinfo=CHICAGO))
+
+    def test_daylight_saving_days_have_their_own_length(self):
+        start = datetime(2024, 3, 9, 20, tzinfo=CHICAGO)
+        days = split_by_day([self.entry(start, start + timedelta(hours=30))])
+
+        self.assertEqual([segments[-1].end_minute for _, _, segments in days], [1440, 1380, 1440])
+
+    def test_first_midnight_and_utc_offsets(self):
+        start = datetime(2024, 3, 9, 20, tzinfo=CHICAGO)
+        timeline = [self.entry(start, start + timedelta(hours=30))]
+
+        first_day, origin = first_midnight(timeline)
+        self.assertEqual(first_day, date(2024, 3, 9))
+        self.assertEqual(origin, DayGrid.from_timeline(timeline).origin)
+        self.assertEqual(utc_offsets(first_day, timeline[-1]['end_time']),
+                         (timedelta(hours=-6), timedelta(hours=-6), timedelta(hours=-5), timedelta(hours=-5)))
@@ -0,0 +1,85 @@
+from django.test import SimpleTestCase, override_settings
+
+from eld_app.geo import LegScale, PolylineIndex, haversine_miles
+from eld_app.services import RouteService
+
+# Gazetteer cities and the straight-line fallback route: no network access
+OFFLINE = override_settings(OPENROUTE_API_KEY='', ROAD_GRAPH_PATH='', TRUCK_STOPS_PATH='')
+
+# [lng, lat] pairs due north along a meridian, one degree of latitude apart
+MERIDIAN = [[-90.0, 40.0], [-90.0, 41.0], [-90.0, 42.0]]
+DEGREE_MILES = haversine_miles(40.0, -90.0, 41.0, -90.0)
+
+
+class PolylineIndexTests(SimpleTestCase):
+    def test_locate_interpolates_within_segments_and_clamps(self):
+        index = PolylineIndex(MERIDIAN)
+
+        self.assertAlmostEqual(index.length, 2 * DEGREE_MILES)
+        self.assertEqual(index.locate(-5), (40.0, -90.0))
+        self.assertEqual(index.locate(index.length + 5), (42.0, -90.0))
+        lat, lng = index.locate(1.5 * DEGREE_MILES)
+        self.assertAlmostEqual(lat, 41.5)
+        self.assertEqual(lng, -90.0)
+
+    def test_mileage_of_the_nearest_vertex(self):
+        index = PolylineIndex(MERIDIAN)
+
+        self.assertAlmostEqual(index.mileage_of(41.1, -89.9), DEGREE_MILES)
+        self.assertEqual(index.mileage_of(39.0, -90.0), 0.0)
+
+    def test_empty_polyline(self):
+        with self.assertRaises(ValueError):
+            PolylineIndex([]).locate(1)
+
+
+class LegScaleTests(SimpleTestCase):
+    def test_each_leg_is_scaled_on_its_own(self):
+        scale = LegScale([0, 100, 300], [0, 50, 250])
+
+        self.assertEqual(scale.to_polyline(50), 25)
+        self.assertEqual(scale.to_polyline(200), 150)
+        self.assertEqual(scale.to_route(150), 200)
+        self.assertEqual(scale.to_polyline(400), 250)
+
+    def test_zero_length_leg(self):
+        scale = LegScale([0, 100, 100, 200], [0, 80, 80, 200])
+
+        self.assertEqual(scale.to_polyline(100), 80)
+        self.assertEqual(scale.to_polyline(150), 140)
+
+
+@OFFLINE
+class StopPlacementTests(SimpleTestCase):
+    def test_stops_lie_on_the_leg_that_contains_them(self):
+        route_data = RouteService(plan_cache=None).calculate_route('Chicago, IL', 'Denver, CO', 'Seattle, WA')
+
+        points = route_data['route_points']
+        self.assertEqual([point['mileage'] for point in points], sorted(point['mileage'] for point in points))
+        waypoints = [point for point in points if point['type'] in ('start', 'pickup', 'dropoff')]
+        stops = [point for point in points if point['type'] in ('fuel', 'rest')]
+        self.assertEqual([stop['mileage'] for stop in stops if stop['type'] == 'fuel'], [1000])
+        for stop in stops:
+            start, end = next((start, end) for start, end in zip(waypoints, waypoints[1:])
+                              if start['mileage'] <= stop['mileage'] <= end['mileage'])
+            # The fallback geometry is a straight line between waypoints
+            t = (stop['mileage'] - start['mileage']) / (end['mileage'] - start['mileage'])
+            for axis in (0, 1):
+                self.assertAlmostEqual(
+                    stop['coords'][axis], start['coords'][axis] + t * (end['coords'][axis] - start['coords'][axis])
+                )
+
+    def test_router_legs_and_vertices_anchor_the_waypoints(self):
+        # A route that doubles back: the pickup is the far end of the polyline
+        route_data = {
+            'total_distance': 300.0, 'leg_distances': [100.0, 100.0], 'way_points': [0, 2, 4],
+            'geometry': [[-90.0, 40.0], [-90.0, 41.0], [-90.0, 42.0], [-90.0, 41.0], [-90.0, 40.5]],
+        }
+        waypoints = [{'coords': (40.0, -90.0)}, {'coords': (42.0, -90.0)}, {'coords': (40.5, -90.0)}]
+        route_index = PolylineIndex(route_data['geometry'])
+
+        scale = RouteService(plan_cache=None)._locate_waypoints(route_data, route_index, waypoints)
+
+        self.assertEqual([waypoint['mileage'] for waypoint in waypoints], [0.0, 150.0, 300.0])
+        self.assertAlmostEqual(scale.to_polyline(150.0), 2 * DEGREE_MILES)
+        self.assertAlmostEqual(route_index.locate(scale.to_polyline(225.0))[0], 41.25)
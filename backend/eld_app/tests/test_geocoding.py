@@ -0,0 +1,112 @@
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from eld_app.geocoding import GeocodeCoordinator, TokenBucket, cache_key
+
+DENVER = (39.7392, -104.9903)
+
+
+class GeocodingTestCase(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.rate_limit_file = os.path.join(directory.name, 'ratelimit')
+        settings = override_settings(
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'geocode': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': self.id()},
+            },
+            GEOCODE_RATE_LIMIT_FILE=self.rate_limit_file, GEOCODE_RATE_PER_SECOND=1.0, GEOCODE_BURST=1.0,
+            GEOCODE_BUDGET_SECONDS=0.3, GEOCODE_CACHE_TTL=3600,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.coordinator = GeocodeCoordinator()
+        self.calls = []
+
+    def fetch(self, address):
+        self.calls.append(address)
+        return DENVER
+
+
+class TokenBucketTests(GeocodingTestCase):
+    def test_burst_then_wait_shared_through_the_file(self):
+        bucket = TokenBucket(self.rate_limit_file, rate=2.0, burst=2.0)
+        # Another process sees the same state file
+        other = TokenBucket(self.rate_limit_file, rate=2.0, burst=2.0)
+
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(other.try_acquire(), 0)
+        self.assertAlmostEqual(bucket.try_acquire(), 0.5, delta=0.05)
+
+    def test_acquire_gives_up_at_the_deadline(self):
+        bucket = TokenBucket(self.rate_limit_file, rate=1.0, burst=1.0)
+        bucket.try_acquire()
+
+        self.assertFalse(bucket.acquire(time.monotonic() + 0.1))
+        self.assertTrue(TokenBucket(self.rate_limit_file, rate=20.0, burst=1.0).acquire(time.monotonic() + 0.5))
+
+
+class GeocodeCoordinatorTests(GeocodingTestCase):
+    def test_results_are_cached(self):
+        self.assertEqual(self.coordinator.lookup('Denver, CO', self.fetch), DENVER)
+        self.assertEqual(self.coordinator.lookup('  denver,   co ', self.fetch), DENVER)
+
+        self.assertEqual(self.calls, ['Denver, CO'])
+        self.assertTrue(self.coordinator.is_cached('DENVER, CO'))
+
+    def test_concurrent_lookups_in_a_process_share_one_call(self):
+        release = threading.Event()
+
+        def slow_fetch(address):
+            release.wait(1)
+            return self.fetch(address)
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            futures = [pool.submit(self.coordinator.lookup, 'Denver, CO', slow_fetch) for _ in range(5)]
+            time.sleep(0.1)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(results, [DENVER] * 5)
+        self.assertEqual(self.calls, ['Denver, CO'])
+
+    def test_lookup_waits_for_another_process_holding_the_address(self):
+        # Another worker holds the address lock and stores its result shortly after
+        other = GeocodeCoordinator()
+        fd, path = other._try_lock(cache_key('Denver, CO'))
+        self.addCleanup(os.close, fd)
+        timer = threading.Timer(0.1, lambda: caches['geocode'].set(
+            cache_key('Denver, CO'), {'coords': list(DENVER), 'at': time.time()}, timeout=None))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        self.assertEqual(self.coordinator.lookup('Denver, CO', self.fetch), DENVER)
+        self.assertEqual(self.calls, [])
+
+    def test_stale_answer_when_the_budget_runs_out(self):
+        caches['geocode'].set(cache_key('Denver, CO'), {'coords': [39.0, -105.0], 'at': time.time() - 7200},
+                              timeout=None)
+        self.coordinator.bucket.try_acquire()
+
+        self.assertEqual(self.coordinator.lookup('Denver, CO', self.fetch), (39.0, -105.0))
+        self.assertEqual(self.calls, [])
+
+    def test_unknown_addresses_are_cached_but_errors_are_not(self):
+        self.assertIsNone(self.coordinator.lookup('Nowhere', lambda address: None))
+        self.assertTrue(self.coordinator.is_cached('Nowhere'))
+
+        def broken(address):
+            raise OSError('connection refused')
+
+        with override_settings(GEOCODE_RATE_PER_SECOND=100.0):
+            coordinator = GeocodeCoordinator()
+            with self.assertLogs('eld_app.geocoding', 'WARNING'):
+                self.assertIsNone(coordinator.lookup('Denver, CO', broken))
+        self.assertFalse(self.coordinator.is_cached('Denver, CO'))
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from eld_app.hos_state import HOSClock, ShiftTracker, ingest_events
+from eld_app.models import DriverHOSState, DutyEvent
+
+CHICAGO = ZoneInfo('America/Chicago')
+
+
+def replay(clock, start, spans):
+    """Feed ``(status, hours)`` spans from ``start`` and return when the last one ends"""
+    moment = start
+    for status, hours in spans:
+        clock.change_status(status, moment)
+        moment += timedelta(hours=hours)
+    clock.change_status('off_duty', moment)
+    return moment
+
+
+@override_settings(ELD_TIME_ZONE='America/Chicago')
+class HOSClockTests(SimpleTestCase):
+    def setUp(self):
+        self.start = datetime(2024, 6, 3, 6, tzinfo=CHICAGO)
+
+    def test_break_required_after_eight_hours_of_driving(self):
+        clock = HOSClock()
+        end = replay(clock, self.start, [('on_duty', 1), ('driving', 8)])
+
+        remaining = clock.remaining(end)
+        self.assertEqual(remaining['until_break'], 0)
+        self.assertEqual(remaining['drive_remaining'], 0)
+        self.assertEqual(remaining['window_remaining'], 5)
+
+    def test_thirty_minutes_off_duty_resets_the_break_clock(self):
+        clock = HOSClock()
+        end = replay(clock, self.start, [('driving', 8), ('off_duty', 0.5)])
+
+        remaining = clock.remaining(end)
+        self.assertEqual(remaining['until_break'], 8)
+        self.assertEqual(remaining['drive_remaining'], 3)
+
+    def test_ten_hour_rest_ends_the_shift(self):
+        clock = HOSClock()
+        end = replay(clock, self.start, [('driving', 8), ('off_duty', 0.5), ('driving', 3), ('sleeper_berth', 10)])
+
+        remaining = clock.remaining(end)
+        self.assertEqual(remaining['drive_remaining'], 8)  # 11 left in the shift, 8 before a break
+        self.assertIsNone(remaining['shift_started'])
+        self.assertEqual(remaining['cycle_used'], 11)
+
+    def test_cycle_hours_age_out_after_eight_days(self):
+        clock = HOSClock()
+        end = replay(clock, self.start, [('on_duty', 10)])
+
+        self.assertEqual(clock.remaining(end)['cycle_used'], 10)
+        self.assertEqual(clock.remaining(end + timedelta(days=8))['cycle_used'], 0)
+
+    def test_thirty_four_hour_restart_clears_the_cycle(self):
+        clock = HOSClock()
+        moment = self.start
+        for _ in range(5):
+            moment = replay(clock, moment, [('on_duty', 3), ('driving', 8), ('off_duty', 0.5), ('driving', 2)])
+            moment += timedelta(hours=10.5)
+        self.assertEqual(clock.remaining(moment)['cycle_used'], 65)
+
+        clock.change_status('off_duty', moment)
+        self.assertEqual(clock.remaining(moment + timedelta(hours=34))['cycle_used'], 0)
+
+    def test_remaining_does_not_change_the_clock(self):
+        clock = HOSClock()
+        clock.change_status('driving', self.start)
+
+        self.assertEqual(clock.remaining(self.start + timedelta(hours=2))['until_break'], 6)
+        self.assertEqual(clock.driving_since_break, 0)
+
+
+class ShiftTrackerTests(SimpleTestCase):
+    def test_shift_crossing_midnight_is_checked_as_one_shift(self):
+        tracker = ShiftTracker()
+        evening = tracker.day([('off_duty', 18), ('on_duty', 1), ('driving', 5)])
+        morning = tracker.day([('driving', 3), ('off_duty', 0.5), ('driving', 3), ('off_duty', 17.5)])
+
+        self.assertEqual(evening.driving_hours, 5)
+        self.assertEqual(morning.driving_hours, 11)
+        self.assertEqual(morning.continuous_driving_hours, 8)
+        self.assertGreaterEqual(morning.rest_hours, 10)
+
+    def test_driving_after_midnight_counts_toward_the_same_shift(self):
+        tracker = ShiftTracker()
+        days = [tracker.day([('off_duty', 16), ('driving', 8)]),
+                tracker.day([('off_duty', 0.5), ('driving', 4), ('off_duty', 19.5)])]
+
+        self.assertEqual([day.driving_hours for day in days], [8, 12])
+        self.assertEqual([day.continuous_driving_hours for day in days], [8, 4])
+
+    def test_ten_hour_rest_starts_a_new_shift(self):
+        tracker = ShiftTracker()
+        tracker.day([('driving', 8), ('off_duty', 10), ('driving', 6)])
+        day = tracker.day([('driving', 2), ('off_duty', 22)])
+
+        self.assertEqual(day.driving_hours, 8)
+
+    def test_short_rest_is_reported(self):
+        tracker = ShiftTracker()
+        tracker.day([('off_duty', 14), ('driving', 10)])
+        day = tracker.day([('off_duty', 6), ('on_duty', 18)])
+
+        self.assertEqual(day.rest_hours, 6)
+
+
+@override_settings(ELD_TIME_ZONE='America/Chicago')
+class IngestEventsTests(TestCase):
+    def setUp(self):
+        self.start = datetime(2024, 6, 3, 6, tzinfo=CHICAGO)
+        self.events = [
+            {'sequence': 1, 'status': 'on_duty', 'event_time': self.start},
+            {'sequence': 2, 'status': 'driving', 'event_time': self.start + timedelta(hours=1)},
+            {'sequence': 3, 'status': 'off_duty', 'event_time': self.start + timedelta(hours=5)},
+        ]
+
+    def test_events_advance_the_stored_state(self):
+        result = ingest_events('Driver', self.events, self.start + timedelta(hours=5))
+
+        self.assertEqual(result['accepted'], 3)
+        self.assertEqual(result['last_sequence'], 3)
+        self.assertEqual(result['hos']['until_break'], 4)
+        state = DriverHOSState.objects.get(driver_name='Driver')
+        self.assertEqual(state.current_status, 'off_duty')
+        self.assertEqual(state.driving_in_shift, 4)
+
+    def test_replayed_batch_is_ignored(self):
+        ingest_events('Driver', self.events, self.start + timedelta(hours=5))
+        result = ingest_events('Driver', self.events, self.start + timedelta(hours=5))
+
+        self.assertEqual(result['accepted'], 0)
+        self.assertEqual(result['duplicates'], 3)
+        self.assertEqual(DutyEvent.objects.count(), 3)
+        self.assertEqual(DriverHOSState.objects.get(driver_name='Driver').driving_in_shift, 4)
+
+    def test_events_out_of_order_are_rejected(self):
+        ingest_events('Driver', self.events, self.start + timedelta(hours=5))
+        result = ingest_events('Driver', [
+            {'sequence': 4, 'status': 'driving', 'event_time': self.start + timedelta(hours=4)},
+        ], self.start + timedelta(hours=6))
+
+        self.assertEqual(result['accepted'], 0)
+        self.assertEqual(result['rejected'][0]['sequence'], 4)
+        self.assertEqual(DutyEvent.objects.count(), 3)
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import timedelta
+
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from eld_app import live_clocks
+from eld_app.hos_state import ingest_events
+from eld_app.live_clocks import ClockBroadcaster
+
+
+class ClockTestCase(TransactionTestCase):
+    """The broadcaster opens and closes its own connections, so its data has to be committed"""
+
+    def setUp(self):
+        live_clocks._broadcaster = None
+        start = timezone.now() - timedelta(hours=3)
+        for driver_name in ('Ann', 'Bob'):
+            ingest_events(driver_name, [
+                {'sequence': 1, 'status': 'on_duty', 'event_time': start},
+                {'sequence': 2, 'status': 'driving', 'event_time': start + timedelta(hours=1)},
+            ], timezone.now())
+
+    async def stop(self, hub):
+        """Let the broadcaster's polling task exit once its last subscriber has gone"""
+        if hub._task is not None:
+            await asyncio.wait_for(hub._task, timeout=5)
+
+
+class ClockBroadcasterTests(ClockTestCase):
+    async def test_each_clock_is_computed_once_for_all_subscribers(self):
+        hub = ClockBroadcaster(poll_seconds=60, refresh_seconds=600)
+        first, second = hub.subscribe(['Ann']), hub.subscribe(['Ann'])
+        other = hub.subscribe(['Bob'])
+
+        frames = [await asyncio.wait_for(queue.get(), timeout=5) for queue in (first, second, other)]
+
+        self.assertEqual(frames[0], frames[1])
+        self.assertIn(b'"driver_name":"Ann"', frames[0])
+        self.assertIn(b'"drive_remaining":6.0', frames[0])
+        self.assertEqual((hub.computations, hub.frames_sent), (2, 3))
+
+        # A later dashboard gets the current frame straight away, without recomputing it
+        late = hub.subscribe(['Ann'])
+        self.assertEqual(late.get_nowait(), frames[0])
+        self.assertEqual(hub.computations, 2)
+
+        for queue, driver_names in ((first, ['Ann']), (second, ['Ann']), (late, ['Ann']), (other, ['Bob'])):
+            hub.unsubscribe(queue, driver_names)
+        await self.stop(hub)
+        self.assertEqual(dict(hub.subscribers), {})
+
+    async def test_slow_readers_drop_their_oldest_frames(self):
+        hub = ClockBroadcaster(poll_seconds=60, refresh_seconds=600)
+        queue = hub.subscribe(['Ann'])
+        await asyncio.wait_for(queue.get(), timeout=5)
+
+        for _ in range(live_clocks.QUEUE_SIZE + 5):
+            await hub._publish({'Ann'})
+
+        self.assertEqual(queue.qsize(), live_clocks.QUEUE_SIZE)
+        hub.unsubscribe(queue, ['Ann'])
+        await self.stop(hub)
+
+
+@override_settings(LIVE_CLOCK_KEEPALIVE_SECONDS=0.2, LIVE_CLOCK_STREAM_SECONDS=1.0)
+class ClockStreamTests(ClockTestCase):
+    async def test_clocks_stream_as_they_are_published(self):
+        response = await self.async_client.get('/api/clocks/stream/', {'driver': ['Ann', 'Bob']})
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.is_async)
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b'retry: 1000\n\n')
+        # Each frame arrives on its own, well before the stream's time limit
+        received = [await asyncio.wait_for(anext(stream), timeout=0.5) for _ in range(2)]
+        self.assertEqual(sorted(frame.split(b'"driver_name":"')[1].split(b'"')[0] for frame in received),
+                         [b'Ann', b'Bob'])
+        self.assertEqual(await asyncio.wait_for(anext(stream), timeout=0.5), b': keep-alive\n\n')
+
+        rest = [frame async for frame in stream]
+
+        self.assertTrue(rest)
+        self.assertTrue(all(frame == b': keep-alive\n\n' for frame in rest))
+        hub = live_clocks.broadcaster()
+        await self.stop(hub)
+        self.assertEqual(dict(hub.subscribers), {})
+
+    async def test_drivers_are_required_and_bounded(self):
+        response = await self.async_client.get('/api/clocks/stream/')
+        self.assertEqual(response.status_code, 400)
+
+        with self.settings(LIVE_CLOCK_MAX_DRIVERS=1):
+            response = await self.async_client.get('/api/clocks/stream/', {'driver': ['Ann', 'Bob']})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,59 @@
+from datetime import date, datetime, timedelta, timezone
+
+from django.test import SimpleTestCase
+
+from eld_app.log_cache import CachedPlan, PlanCache, plan_key
+
+START = date(2024, 6, 3)
+ORIGIN = datetime(2024, 6, 3, 5, tzinfo=timezone.utc)
+
+
+class PlanCacheTests(SimpleTestCase):
+    def plan(self):
+        return CachedPlan(START, ORIGIN)
+
+    def test_least_recently_used_plan_is_evicted(self):
+        cache = PlanCache(max_entries=2)
+        cache.put(b'a', self.plan())
+        cache.put(b'b', self.plan())
+        cache.get(b'a')
+
+        cache.put(b'c', self.plan())
+
+        self.assertIsNotNone(cache.get(b'a'))
+        self.assertIsNone(cache.get(b'b'))
+        self.assertEqual(len(cache), 2)
+
+    def test_disabled_cache_always_generates(self):
+        cache = PlanCache(max_entries=0)
+        calls = []
+
+        for _ in range(2):
+            cache.get_or_generate(b'a', START, ORIGIN, lambda: calls.append(1) or [])
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(len(cache), 0)
+
+    def test_generated_logs_are_reused(self):
+        cache = PlanCache(max_entries=4)
+        calls = []
+
+        for _ in range(3):
+            cache.get_or_generate(b'a', START, ORIGIN, lambda: calls.append(1) or [])
+
+        self.assertEqual(len(calls), 1)
+
+    def test_schedules_are_shifted_to_the_new_departure(self):
+        entry = {'status': 'driving', 'start_time': ORIGIN, 'end_time': ORIGIN + timedelta(hours=2)}
+        plan = CachedPlan(START, ORIGIN, timeline=(entry,), stop_times=((ORIGIN, ORIGIN + timedelta(hours=1)),))
+
+        timeline, stop_times = plan.shifted_schedule(ORIGIN + timedelta(days=7))
+
+        self.assertEqual(timeline[0]['start_time'], ORIGIN + timedelta(days=7))
+        self.assertEqual(timeline[0]['status'], 'driving')
+        self.assertEqual(stop_times[0][1], ORIGIN + timedelta(days=7, hours=1))
+        self.assertEqual(entry['start_time'], ORIGIN)
+
+    def test_plan_key_depends_on_every_input(self):
+        self.assertEqual(plan_key(1, 'a', (2.5,)), plan_key(1, 'a', (2.5,)))
+        self.assertNotEqual(plan_key(1, 'a', (2.5,)), plan_key(1, 'a', (2.25,)))
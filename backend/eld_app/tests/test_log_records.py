@@ -0,0 +1,78 @@
+from dataclasses import FrozenInstanceError, fields
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.test import SimpleTestCase, override_settings
+
+from eld_app.log_records import DailyLog, DutySegment, Violation
+from eld_app.models import Trip
+from eld_app.services import ELDLogService, RouteService
+
+CHICAGO = ZoneInfo('America/Chicago')
+
+
+def daily_log(**overrides):
+    values = dict(
+        log_date=date(2024, 6, 3), day_start=datetime(2024, 6, 3, tzinfo=CHICAGO),
+        segments=(DutySegment(0, 360, 'off_duty', 'Yard', ''), DutySegment(360, 990, 'driving', 'En route', '')),
+        driver_name='Ann', carrier_name='Acme', vehicle_number='T-1', off_duty_hours=6, sleeper_berth_hours=0,
+        driving_hours=10.5, on_duty_hours=0, total_on_duty_7_days=40, hours_available_70hr=30,
+        total_on_duty_5_days=30, total_on_duty_6_days=35, hours_available_60hr=25, compliance_status='COMPLIANT',
+        violation_count=0, is_compliant=True, violations=(), restart_applies=False, sleeper_berth_split=False,
+        sleeper_berth_split_type='NONE', rolling_8_day_hours=40, rolling_7_day_hours=35,
+    )
+    values.update(overrides)
+    return DailyLog(**values)
+
+
+class RecordTypeTests(SimpleTestCase):
+    def test_records_are_frozen_and_slotted(self):
+        segment = DutySegment(0, 90, 'driving', 'En route', '')
+
+        self.assertEqual(segment.hours, 1.5)
+        self.assertFalse(hasattr(segment, '__dict__'))
+        with self.assertRaises(FrozenInstanceError):
+            segment.status = 'on_duty'
+        self.assertEqual(hash(Violation('a', 'b', 'c', 'd')), hash(Violation('a', 'b', 'c', 'd')))
+
+    def test_duty_statuses_turn_minute_offsets_into_datetimes(self):
+        statuses = daily_log().duty_statuses()
+
+        self.assertEqual(statuses[1], {
+            'start_time': datetime(2024, 6, 3, 6, tzinfo=CHICAGO),
+            'end_time': datetime(2024, 6, 3, 16, 30, tzinfo=CHICAGO),
+            'status': 'driving', 'location': 'En route', 'remarks': '',
+        })
+
+    def test_shifted_moves_the_day_and_shares_everything_else(self):
+        log = daily_log()
+
+        moved = log.shifted(timedelta(days=2), timedelta(days=2, hours=1))
+
+        self.assertEqual((moved.log_date, moved.day_start), (date(2024, 6, 5), datetime(2024, 6, 5, 1, tzinfo=CHICAGO)))
+        self.assertIs(moved.segments, log.segments)
+        for field in fields(DailyLog)[2:]:
+            self.assertEqual(getattr(moved, field.name), getattr(log, field.name))
+        self.assertEqual(moved.duty_statuses()[0]['start_time'], datetime(2024, 6, 5, 1, tzinfo=CHICAGO))
+
+
+@override_settings(OPENROUTE_API_KEY='', ROAD_GRAPH_PATH='', TRUCK_STOPS_PATH='', ELD_TIME_ZONE='America/Chicago')
+class GeneratedLogTests(SimpleTestCase):
+    def test_hour_totals_match_the_segments(self):
+        departure = datetime(2024, 6, 3, 6, tzinfo=CHICAGO)
+        route_data = RouteService(plan_cache=None).calculate_route('Chicago, IL', 'Denver, CO', 'Seattle, WA',
+                                                                   departure=departure)
+
+        logs = ELDLogService(plan_cache=None).generate_eld_logs(Trip(current_cycle_used=10), route_data)
+
+        self.assertGreater(len(logs), 2)
+        for log in logs:
+            self.assertIsInstance(log, DailyLog)
+            totals = {}
+            for segment in log.segments:
+                self.assertLessEqual(0, segment.start_minute)
+                self.assertLessEqual(segment.start_minute, segment.end_minute)
+                self.assertLessEqual(segment.end_minute, 24 * 60)
+                totals[segment.status] = totals.get(segment.status, 0) + segment.hours
+            for status in ('off_duty', 'sleeper_berth', 'driving', 'on_duty'):
+                self.assertAlmostEqual(getattr(log, f'{status}_hours'), totals.get(status, 0), places=2)
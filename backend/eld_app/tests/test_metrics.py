@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from eld_app.metrics import ARCHIVE_FILE, DURATION_BUCKETS, MetricsRegistry
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.registry = MetricsRegistry(self.directory)
+
+    def write_worker(self, pid, hits, seconds):
+        # Flushed elsewhere: this process's own file in the shared directory belongs to self.registry
+        scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, scratch)
+        worker = MetricsRegistry(scratch)
+        worker.inc('eld_cache_requests_total', {'cache': 'routes', 'result': 'hit'}, hits)
+        for value in seconds:
+            worker.observe('eld_stage_duration_seconds', value, {'stage': 'geocode'})
+        worker.flush()
+        os.rename(os.path.join(scratch, f'{os.getpid()}.json'), os.path.join(self.directory, f'{pid}.json'))
+
+    def hits(self, counters):
+        return counters[('eld_cache_requests_total', (('cache', 'routes'), ('result', 'hit')))]
+
+    def test_workers_are_summed(self):
+        self.registry.inc('eld_cache_requests_total', {'cache': 'routes', 'result': 'hit'})
+        self.registry.observe('eld_stage_duration_seconds', 0.02, {'stage': 'geocode'})
+        self.write_worker(os.getppid(), 4, [0.2, 3.0])
+
+        counters, histograms = self.registry.collect()
+
+        self.assertEqual(self.hits(counters), 5)
+        hist = histograms[('eld_stage_duration_seconds', (('stage', 'geocode'),))]
+        self.assertEqual(hist[DURATION_BUCKETS.index(0.025)], 1)
+        self.assertEqual(hist[DURATION_BUCKETS.index(0.25)], 2)
+        self.assertEqual(hist[-2], 3)
+        self.assertAlmostEqual(hist[-1], 3.22)
+
+    def test_exited_workers_are_archived_not_dropped(self):
+        self.registry.inc('eld_cache_requests_total', {'cache': 'routes', 'result': 'hit'})
+        first, second = dead_pid(), dead_pid()
+        self.write_worker(first, 4, [0.2])
+
+        counters, histograms = self.registry.collect()
+
+        self.assertEqual(self.hits(counters), 5)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, f'{first}.json')))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, ARCHIVE_FILE)))
+
+        # A second worker exiting later adds to the archive rather than replacing it
+        self.write_worker(second, 2, [0.2])
+        counters, histograms = self.registry.collect()
+        self.assertEqual(self.hits(counters), 7)
+        self.assertEqual(histograms[('eld_stage_duration_seconds', (('stage', 'geocode'),))][-2], 2)
+
+        # Scrapes never see the totals go down
+        counters, _ = self.registry.collect()
+        self.assertEqual(self.hits(counters), 7)
+        with open(os.path.join(self.directory, ARCHIVE_FILE)) as f:
+            self.assertEqual(json.load(f)['counters'][0][2], 6)
+
+    def test_render(self):
+        self.registry.inc('eld_cache_requests_total', {'cache': 'routes', 'result': 'hit'}, 3)
+        self.registry.inc('eld_cache_requests_total', {'cache': 'routes', 'result': 'miss'})
+        self.registry.observe('eld_stage_duration_seconds', 0.5, {'stage': 'serialize'})
+
+        text = self.registry.render()
+
+        self.assertIn('eld_cache_requests_total{cache="routes",result="hit"} 3\n', text)
+        self.assertIn('eld_cache_hit_ratio{cache="routes"} 0.7500\n', text)
+        self.assertIn('eld_stage_duration_seconds_bucket{stage="serialize",le="0.25"} 0\n', text)
+        self.assertIn('eld_stage_duration_seconds_bucket{stage="serialize",le="+Inf"} 1\n', text)
+        self.assertIn('eld_stage_duration_seconds_count{stage="serialize"} 1\n', text)
+        self.assertIn('# TYPE eld_stage_duration_seconds histogram\n', text)
+
+
+class MetricsViewTests(SimpleTestCase):
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_scrapes_need_the_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE eld_cache_requests_total counter', response.content)
+
+    @override_settings(METRICS_TOKEN='', DEBUG=False)
+    def test_endpoint_is_off_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
@@ -0,0 +1,97 @@
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from eld_app import profiling
+
+
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            PROFILING_ENABLED=True, PROFILING_DIR=directory.name, PROFILING_SAMPLE_RATE=0.0,
+            PROFILING_CPROFILE_RATE=0.0, PROFILING_HEADER_TOKEN='',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.store = profiling.ProfileStore()
+
+
+class ProfilingMiddlewareTests(ProfilingTestCase):
+    def test_unprofiled_requests_are_not_recorded(self):
+        response = self.client.get('/api/trips/')
+
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(self.store.list(), [])
+
+    def test_header_profiles_the_request_with_cprofile(self):
+        response = self.client.get('/api/trips/', HTTP_X_PROFILE='1')
+
+        record = self.store.get(response['X-Profile-Id'])
+        self.assertEqual((record['path'], record['status'], record['trigger']), ('/eld/api/trips/', 200, 'header'))
+        self.assertGreater(record['sql_count'], 0)
+        self.assertIn('cumulative', record['cprofile'])
+
+    def test_configured_token_must_match(self):
+        with override_settings(PROFILING_HEADER_TOKEN='secret'):
+            self.assertNotIn('X-Profile-Id', self.client.get('/api/trips/', HTTP_X_PROFILE='1'))
+            self.assertIn('X-Profile-Id', self.client.get('/api/trips/', HTTP_X_PROFILE='secret'))
+
+    def test_sampled_requests_skip_cprofile_by_default(self):
+        with override_settings(PROFILING_SAMPLE_RATE=1.0):
+            response = self.client.get('/api/trips/')
+
+        record = self.store.get(response['X-Profile-Id'])
+        self.assertEqual(record['trigger'], 'sample')
+        self.assertNotIn('cprofile', record)
+
+    def test_outbound_calls_are_recorded_only_while_profiling(self):
+        with profiling.track_upstream('ors'):
+            pass
+        token = profiling.start_profile()
+        try:
+            with profiling.track_upstream('ors'):
+                pass
+            summary = profiling.current_profile().summary()
+        finally:
+            profiling.end_profile(token)
+
+        self.assertEqual(summary['upstream_count'], 1)
+        self.assertEqual(summary['upstream_calls'][0]['service'], 'ors')
+        self.assertIsNone(profiling.current_profile())
+
+
+# The admin's templates look their assets up in the manifest, which only exists after collectstatic
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ProfileAdminTests(ProfilingTestCase):
+    def test_staff_can_browse_profiles(self):
+        profile_id = self.client.get('/api/trips/', HTTP_X_PROFILE='1')['X-Profile-Id']
+        self.assertEqual(self.client.get('/admin/profiles/').status_code, 302)
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+        self.assertContains(self.client.get('/admin/profiles/'), profile_id)
+        self.assertContains(self.client.get(f'/admin/profiles/{profile_id}/'), 'cumulative')
+        self.assertEqual(self.client.get('/admin/profiles/missing/').status_code, 404)
+
+
+class ProfileStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = profiling.ProfileStore(directory.name, max_records=3)
+
+    def test_oldest_records_are_rotated_out(self):
+        ids = [self.store.save({'path': f'/{number}/', 'cprofile': 'stats'}) for number in range(5)]
+
+        records = self.store.list()
+        self.assertEqual(len(records), 3)
+        self.assertTrue(all('cprofile' not in record for record in records))
+        self.assertEqual([record['id'] for record in records], ids[:1:-1])
+        self.assertEqual(self.store.get(records[0]['id'])['cprofile'], 'stats')
+
+    def test_ids_outside_the_store_are_rejected(self):
+        self.assertIsNone(self.store.get('../settings'))
+        self.assertIsNone(self.store.get('missing'))
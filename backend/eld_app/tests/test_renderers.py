@@ -0,0 +1,91 @@
+import gzip
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock
+
+import brotli
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from eld_app.middleware import CompressionMiddleware
+from eld_app.renderers import ORJSONRenderer, encode_event
+
+BODY = json.dumps([{'log_date': f'2024-06-{day:02d}', 'driving_hours': 10.5} for day in range(1, 29)]).encode()
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def test_native_and_fallback_types(self):
+        data = {'at': datetime(2024, 6, 3, 8, 30, tzinfo=timezone.utc), 'hours': Decimal('10.5'), 1: 'key'}
+
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)),
+                         {'at': '2024-06-03T08:30:00+00:00', 'hours': 10.5, '1': 'key'})
+
+    def test_indent_follows_the_accept_header(self):
+        renderer = ORJSONRenderer()
+
+        self.assertEqual(renderer.render({'a': 1}), b'{"a":1}')
+        self.assertEqual(renderer.render({'a': 1}, 'application/json; indent=4'), b'{\n  "a": 1\n}')
+        self.assertEqual(renderer.render(None), b'')
+
+    def test_event_frame(self):
+        self.assertEqual(encode_event('routed', {'miles': 1.5}), b'event: routed\ndata: {"miles":1.5}\n\n')
+
+
+class ORJSONParserTests(TestCase):
+    def test_invalid_json_is_a_bad_request(self):
+        response = self.client.post('/api/trips/', b'{"current_location": ', content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def respond(self, response, accept_encoding=''):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def json_response(self, body=BODY):
+        response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = '"v1"'
+        return response
+
+    def test_brotli_is_preferred_when_accepted(self):
+        response = self.respond(self.json_response(), 'gzip, deflate, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), BODY)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"v1"')
+
+    def test_gzip_without_brotli(self):
+        with mock.patch('eld_app.middleware.brotli', None):
+            response = self.respond(self.json_response(), 'gzip, br')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_identity_when_nothing_is_accepted(self):
+        response = self.respond(self.json_response(), 'deflate')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, BODY)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], '"v1"')
+
+    def test_skipped_responses(self):
+        encoded = self.json_response()
+        encoded['Content-Encoding'] = 'gzip'
+        cases = {
+            'small': self.json_response(BODY[:100]),
+            'binary': HttpResponse(BODY, content_type='application/pdf'),
+            'streaming': StreamingHttpResponse(iter([BODY]), content_type='text/event-stream'),
+            'encoded': encoded,
+        }
+        for name, response in cases.items():
+            with self.subTest(name):
+                self.assertIs(self.respond(response, 'gzip, br'), response)
+                self.assertFalse(response.has_header('Vary'))
+                self.assertNotEqual(response.get('Content-Encoding'), 'br')
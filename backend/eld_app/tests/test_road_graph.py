@@ -0,0 +1,112 @@
+import heapq
+import math
+import os
+import random
+import tempfile
+
+from django.test import SimpleTestCase
+
+from eld_app.benchmarks.data import grid_road_graph
+from eld_app.road_graph import RoadGraph, RoadGraphBuilder
+
+
+def dijkstra_seconds(graph, source, target):
+    """Reference travel time from a plain single-direction Dijkstra"""
+    best = {source: 0.0}
+    frontier = [(0.0, source)]
+    while frontier:
+        cost, node = heapq.heappop(frontier)
+        if node == target:
+            return cost
+        if cost > best[node]:
+            continue
+        for edge in range(graph.offsets[node], graph.offsets[node + 1]):
+            neighbor = graph.targets[edge]
+            if cost + graph.times[edge] < best.get(neighbor, math.inf):
+                best[neighbor] = cost + graph.times[edge]
+                heapq.heappush(frontier, (best[neighbor], neighbor))
+    return None
+
+
+def edges(graph):
+    """Directed edges as ``(from_lng, to_lng)`` pairs"""
+    return {(graph.lngs[source], graph.lngs[graph.targets[edge]])
+            for source in range(graph.node_count)
+            for edge in range(graph.offsets[source], graph.offsets[source + 1])}
+
+
+class ShortestPathTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.graph = grid_road_graph(12)
+
+    def test_paths_are_as_fast_as_dijkstra(self):
+        rng = random.Random(7)
+        for _ in range(40):
+            source, target = rng.randrange(self.graph.node_count), rng.randrange(self.graph.node_count)
+            path = self.graph.shortest_path(source, target)
+
+            self.assertEqual((path[0], path[-1]), (source, target))
+            _, seconds = self.graph.path_summary(path)
+            self.assertAlmostEqual(seconds, dijkstra_seconds(self.graph, source, target), delta=0.01)
+
+    def test_unreachable_target(self):
+        builder = RoadGraphBuilder()
+        builder.add_way([[-87.6, 41.8], [-87.5, 41.8]], {'highway': 'primary'})
+        builder.add_way([[-90.0, 40.0], [-90.1, 40.0]], {'highway': 'primary'})
+
+        self.assertIsNone(builder.build().shortest_path(0, 2))
+
+    def test_saved_graph_routes_the_same(self):
+        handle, path = tempfile.mkstemp(suffix='.bin')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        self.graph.save(path)
+
+        loaded = RoadGraph.load(path)
+
+        self.assertEqual((loaded.node_count, loaded.edge_count), (self.graph.node_count, self.graph.edge_count))
+        self.assertEqual(loaded.shortest_path(0, loaded.node_count - 1),
+                         self.graph.shortest_path(0, self.graph.node_count - 1))
+        self.assertEqual(loaded.nearest_node(42.0, -88.0), self.graph.nearest_node(42.0, -88.0))
+
+    def test_nearest_node(self):
+        node = self.graph.nearest_node(self.graph.lats[30] + 0.01, self.graph.lngs[30] - 0.01)
+
+        self.assertEqual(node, 30)
+
+
+class RoadGraphBuilderTests(SimpleTestCase):
+    line = [[-87.6, 41.8], [-87.5, 41.8]]
+    east, west = (-87.6, -87.5), (-87.5, -87.6)
+
+    def build(self, **tags):
+        builder = RoadGraphBuilder()
+        builder.add_way(self.line, tags)
+        return builder.build()
+
+    def test_oneway_tags(self):
+        self.assertEqual(edges(self.build(highway='primary')), {self.east, self.west})
+        self.assertEqual(edges(self.build(highway='primary', oneway='yes')), {self.east})
+        self.assertEqual(edges(self.build(highway='primary', oneway='-1')), {self.west})
+
+    def test_motorways_are_oneway_unless_tagged(self):
+        self.assertEqual(edges(self.build(highway='motorway')), {self.east})
+        self.assertEqual(edges(self.build(highway='motorway', oneway='no')), {self.east, self.west})
+
+    def test_ways_closed_to_trucks_are_skipped(self):
+        builder = RoadGraphBuilder()
+
+        self.assertFalse(builder.add_way(self.line, {'highway': 'primary', 'hgv': 'no'}))
+        self.assertFalse(builder.add_way(self.line, {'highway': 'footway'}))
+
+    def test_parallel_edges_use_the_fastest(self):
+        builder = RoadGraphBuilder()
+        builder.add_way(self.line, {'highway': 'residential'})
+        builder.add_way(self.line, {'highway': 'trunk'})
+        graph = builder.build()
+
+        (edge,) = graph.path_edges([0, 1])
+
+        self.assertEqual(graph.times[edge], min(graph.times))
@@ -0,0 +1,61 @@
+import random
+
+from django.test import SimpleTestCase
+
+from eld_app.geo import haversine_miles
+from eld_app.stop_order import AVERAGE_SPEED, ROAD_FACTOR, StopSequencer, distance_matrix
+
+
+class DistanceMatrixTests(SimpleTestCase):
+    def test_matrix_is_symmetric_road_miles(self):
+        coords = [(41.88, -87.63), (42.36, -71.06), (39.74, -104.99)]
+
+        matrix = distance_matrix(coords)
+
+        for i in range(3):
+            self.assertEqual(matrix[i][i], 0)
+            for j in range(3):
+                self.assertEqual(matrix[i][j], matrix[j][i])
+        self.assertAlmostEqual(matrix[0][1], haversine_miles(*coords[0], *coords[1]) * ROAD_FACTOR)
+
+
+class StopSequencerTests(SimpleTestCase):
+    def test_stops_along_a_line_are_visited_in_order(self):
+        lngs = [-90.0 + i * 0.5 for i in range(8)]
+        middle = lngs[2:-1]
+        random.Random(3).shuffle(middle)
+        coords = [(40.0, lng) for lng in lngs[:2] + middle + lngs[-1:]]
+
+        route = StopSequencer(distance_matrix(coords), [0.0] * len(coords)).solve()
+
+        self.assertEqual([coords[node][1] for node in route], lngs)
+
+    def test_start_pickup_and_dropoff_stay_fixed(self):
+        rng = random.Random(11)
+        coords = [(rng.uniform(35, 45), rng.uniform(-100, -80)) for _ in range(12)]
+        sequencer = StopSequencer(distance_matrix(coords), [0.0] * len(coords))
+
+        route = sequencer.solve()
+
+        self.assertEqual((route[0], route[1], route[-1]), (0, 1, 11))
+        self.assertEqual(sorted(route), list(range(12)))
+        self.assertLessEqual(sequencer.miles(route), sequencer.miles(list(range(12))))
+
+    def test_appointment_windows_beat_distance(self):
+        # Start and pickup in the west, an early appointment in the far east, a stop near the pickup, drop-off east
+        coords = [(40.0, -90.0), (40.0, -89.9), (41.0, -85.5), (41.0, -89.5), (40.0, -85.0)]
+        matrix = distance_matrix(coords)
+        service = [0.0] * len(coords)
+
+        self.assertEqual(StopSequencer(matrix, service).solve(), [0, 1, 3, 2, 4])
+
+        latest = (matrix[0][1] + matrix[1][2]) / AVERAGE_SPEED + 0.5
+        windows = [None, None, (None, latest), None, None]
+        sequencer = StopSequencer(matrix, service, windows)
+        route = sequencer.solve()
+
+        self.assertEqual(route, [0, 1, 2, 3, 4])
+        self.assertEqual(sequencer.late_hours(route), 0)
+
+    def test_short_trips_are_returned_as_given(self):
+        self.assertEqual(StopSequencer(distance_matrix([(40.0, -90.0), (41.0, -91.0)]), [0.0, 0.0]).solve(), [0, 1])
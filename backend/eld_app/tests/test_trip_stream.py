@@ -0,0 +1,72 @@
+import asyncio
+import threading
+from unittest import mock
+
+import orjson
+from django.test import TransactionTestCase, override_settings
+
+from eld_app.models import ELDLog, RoutePoint, Trip
+from eld_app.services import ELDLogService
+
+OFFLINE = override_settings(OPENROUTE_API_KEY='', ROAD_GRAPH_PATH='', TRUCK_STOPS_PATH='')
+TRIP = {'current_location': 'Chicago, IL', 'pickup_location': 'Denver, CO', 'dropoff_location': 'Seattle, WA',
+        'current_cycle_used': 10}
+
+
+def parse(frame):
+    event, data = frame.decode().strip().split('\n')
+    return event.removeprefix('event: '), orjson.loads(data.removeprefix('data: '))
+
+
+@OFFLINE
+class TripStreamTests(TransactionTestCase):
+    """Trips are created by a worker thread on its own connection, so the tests commit"""
+
+    async def post(self, data):
+        return await self.async_client.post('/api/trips/', data, content_type='application/json',
+                                            headers={'Accept': 'text/event-stream'})
+
+    async def test_progress_arrives_before_the_trip_is_created(self):
+        release = threading.Event()
+        generate = ELDLogService.generate_eld_logs
+
+        def held_back(service, trip, route_data):
+            release.wait(10)
+            return generate(service, trip, route_data)
+
+        with mock.patch.object(ELDLogService, 'generate_eld_logs', held_back):
+            response = await self.post(TRIP)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            stream = response.streaming_content
+
+            first = parse(await asyncio.wait_for(anext(stream), timeout=5))
+            second = parse(await asyncio.wait_for(anext(stream), timeout=5))
+
+            self.assertEqual(first[0], 'geocoded')
+            self.assertEqual(len(first[1]['locations']), 3)
+            self.assertEqual(second[0], 'routed')
+            self.assertFalse(await RoutePoint.objects.aexists())
+            release.set()
+            rest = [parse(frame) async for frame in stream]
+
+        self.assertEqual([event for event, _ in rest], ['logs_generated', 'persisted', 'trip'])
+        trip = rest[-1][1]
+        self.assertEqual(trip['id'], rest[1][1]['trip_id'])
+        self.assertEqual(await ELDLog.objects.filter(trip_id=trip['id']).acount(), rest[0][1]['days'])
+
+    async def test_failures_end_the_stream_with_an_error_event(self):
+        with mock.patch.object(ELDLogService, 'generate_eld_logs', side_effect=RuntimeError('boom')), \
+                self.assertLogs('eld_app.views', 'ERROR'):
+            response = await self.post(TRIP)
+            events = [parse(frame) async for frame in response.streaming_content]
+
+        self.assertEqual(events[-1], ('error', {'error': 'Trip creation failed'}))
+
+    async def test_invalid_trips_get_a_single_error_event(self):
+        response = await self.post({**TRIP, 'current_cycle_used': 80})
+
+        self.assertEqual(response.status_code, 400)
+        event, data = parse(response.content)
+        self.assertEqual(event, 'error')
+        self.assertIn('current_cycle_used', data)
+        self.assertFalse(await Trip.objects.aexists())
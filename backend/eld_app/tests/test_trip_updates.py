@@ -0,0 +1,114 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from eld_app.models import ELDLog, RoutePoint, Trip
+from eld_app.services import ELDLogService, RouteService
+from eld_app.trip_updates import FLOAT_TOLERANCE, _same, departure_time, replan_trip
+
+# Gazetteer cities and the straight-line fallback route: no network access
+OFFLINE = override_settings(OPENROUTE_API_KEY='', ROAD_GRAPH_PATH='', TRUCK_STOPS_PATH='')
+
+
+def stored_plan(trip):
+    logs = sorted(
+        (log.log_date, tuple((status.status, status.start_time, status.end_time, status.location)
+                             for status in log.duty_statuses.order_by('start_time')))
+        for log in ELDLog.objects.filter(trip=trip)
+    )
+    points = list(RoutePoint.objects.filter(trip=trip).order_by('sequence').values_list(
+        'point_type', 'address', 'latitude', 'longitude', 'estimated_arrival'))
+    return logs, points
+
+
+@OFFLINE
+class TripUpdateTests(TestCase):
+    def setUp(self):
+        response = self.client.post('/api/trips/', {
+            'current_location': 'Chicago, IL', 'pickup_location': 'Boston, MA', 'dropoff_location': 'Los Angeles, CA',
+            'current_cycle_used': 10, 'stops': [{'location': 'Denver, CO', 'type': 'dropoff'}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.trip = Trip.objects.get(pk=response.json()['id'])
+
+    def patch(self, changes):
+        response = self.client.patch(f'/api/trips/{self.trip.id}/', changes, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['log_changes']
+
+    def fresh_plan(self):
+        trip = Trip.objects.get(pk=self.trip.pk)
+        route_data = RouteService(plan_cache=None).calculate_route(
+            trip.current_location, trip.pickup_location, trip.dropoff_location, departure=departure_time(trip),
+            cycle_used=trip.current_cycle_used, stops=trip.stops,
+        )
+        logs = ELDLogService(plan_cache=None).generate_eld_logs(trip, route_data)
+        return sorted(
+            (log.log_date, tuple((status['status'], status['start_time'], status['end_time'], status['location'])
+                                 for status in log.duty_statuses()))
+            for log in logs
+        )
+
+    def test_changing_the_dropoff_keeps_earlier_logs_and_points(self):
+        logs_before, points_before = stored_plan(self.trip)
+
+        changes = self.patch({'dropoff_location': 'Seattle, WA'})
+
+        logs_after, points_after = stored_plan(self.trip)
+        self.assertGreater(changes['logs_unchanged'], 0)
+        self.assertEqual(changes['logs_unchanged'], len(set(logs_before) & set(logs_after)))
+        # Everything up to the Denver drop-off lies on unchanged legs
+        denver = next(i for i, point in enumerate(points_before) if point[1] == 'Denver, CO')
+        self.assertEqual(points_after[:denver + 1], points_before[:denver + 1])
+        self.assertLess(changes['route_points_updated'], len(points_after))
+        self.assertEqual(logs_after, self.fresh_plan())
+
+    def test_patching_the_same_values_skips_replanning(self):
+        with mock.patch('eld_app.views.replan_trip') as replan:
+            changes = self.patch({'current_cycle_used': 10, 'dropoff_location': 'Los Angeles, CA'})
+
+        self.assertEqual(changes, {})
+        replan.assert_not_called()
+
+    def test_replanning_an_unchanged_trip_writes_nothing(self):
+        before = stored_plan(self.trip)
+        trip = Trip.objects.get(pk=self.trip.pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            changes = replan_trip(trip)
+
+        self.assertEqual(changes.pop('logs_unchanged'), len(before[0]))
+        self.assertEqual(changes, dict.fromkeys(changes, 0))
+        self.assertEqual(len(changes), 9)
+        writes = [query['sql'] for query in queries.captured_queries
+                  if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        # Only the trip's own save, which bumps its version
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE "eld_app_trip"'))
+        self.assertEqual(stored_plan(self.trip), before)
+
+    def test_cycle_change_rewrites_logs_only(self):
+        changes = self.patch({'current_cycle_used': 40})
+
+        self.assertEqual(changes['route_points_created'] + changes['route_points_deleted'], 0)
+        self.assertEqual(stored_plan(self.trip)[0], self.fresh_plan())
+
+    def test_invalid_edit_is_rejected(self):
+        response = self.client.patch(f'/api/trips/{self.trip.id}/', {'current_cycle_used': 80},
+                                     content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+
+
+class SameValueTests(SimpleTestCase):
+    def test_floats_within_tolerance_are_the_same(self):
+        self.assertTrue(_same(41.8781, 41.8781 + FLOAT_TOLERANCE / 2))
+        self.assertTrue(_same(49.99999999999, 50.0))
+        self.assertFalse(_same(41.8781, 41.8781 + FLOAT_TOLERANCE * 10))
+
+    def test_other_values_compare_exactly(self):
+        self.assertTrue(_same('Denver, CO', 'Denver, CO'))
+        self.assertFalse(_same(1, 2))
+        self.assertFalse(_same(None, 0.0))
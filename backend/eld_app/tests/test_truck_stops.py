@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from eld_app import truck_stops
+from eld_app.geo import PolylineIndex
+from eld_app.services import RouteService
+from eld_app.truck_stops import CorridorStop, TruckStop, TruckStopIndex, best_before, load_truck_stops
+
+# [lng, lat] pairs due north along a meridian
+MERIDIAN = [[-90.0, 40.0], [-90.0, 42.0]]
+DENVER, SEATTLE = (39.7392, -104.9903), (47.6062, -122.3321)
+
+
+class TruckStopTestCase(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+
+class LoadTruckStopsTests(TruckStopTestCase):
+    def test_csv_rows_without_coordinates_are_skipped(self):
+        path = self.write('stops.csv',
+                          'name,latitude,longitude,brand\nPilot 1,41.0,-90.0,Pilot\nBroken,,-90\n,41.5,-90\n')
+
+        self.assertEqual(load_truck_stops(path), [
+            TruckStop('Pilot 1', 41.0, -90.0, 'Pilot'),
+            TruckStop('Truck stop 41.5000,-90.0000', 41.5, -90.0),
+        ])
+
+    def test_geojson_points(self):
+        path = self.write('stops.geojson', json.dumps({'type': 'FeatureCollection', 'features': [
+            {'geometry': {'type': 'Point', 'coordinates': [-90.0, 41.0]}, 'properties': {'name': "Love's"}},
+            {'geometry': {'type': 'LineString', 'coordinates': [[-90.0, 41.0], [-90.0, 42.0]]}, 'properties': {}},
+        ]}))
+
+        self.assertEqual(load_truck_stops(path), [TruckStop("Love's", 41.0, -90.0)])
+
+    def test_index_is_rebuilt_when_the_file_changes(self):
+        path = self.write('stops.csv', 'name,latitude,longitude\nA,41.0,-90.0\n')
+        with override_settings(TRUCK_STOPS_PATH=path):
+            self.assertEqual(truck_stops.get_index().size, 1)
+            self.assertIs(truck_stops.get_index(), truck_stops.get_index())
+
+            self.write('stops.csv', 'name,latitude,longitude\nA,41.0,-90.0\nB,41.5,-90.0\n')
+            os.utime(path, (0, os.path.getmtime(path) + 10))
+            self.assertEqual(truck_stops.get_index().size, 2)
+        with override_settings(TRUCK_STOPS_PATH=os.path.join(self.directory, 'missing.csv')):
+            self.assertIsNone(truck_stops.get_index())
+
+
+class TruckStopIndexTests(SimpleTestCase):
+    def test_nearby_crosses_cell_boundaries(self):
+        near = TruckStop('Near', 40.01, -90.0)
+        index = TruckStopIndex([near, TruckStop('Far', 40.5, -90.0)], cell_degrees=0.25)
+
+        self.assertEqual([stop for _, stop in index.nearby(39.999, -90.0, 5)], [near])
+
+    def test_corridor_reports_each_stop_once_at_its_closest_mileage(self):
+        stops = [
+            TruckStop('North', 41.5, -90.02), TruckStop('South', 40.5, -90.01), TruckStop('Off route', 41.0, -91.0),
+        ]
+        route = PolylineIndex(MERIDIAN)
+
+        corridor = TruckStopIndex(stops).corridor(route, radius_miles=5)
+
+        self.assertEqual([candidate.stop.name for candidate in corridor], ['South', 'North'])
+        for candidate, expected_lat in zip(corridor, (40.5, 41.5)):
+            self.assertLess(abs(route.locate(candidate.mileage)[0] - expected_lat), 0.03)
+            self.assertLess(candidate.offset_miles, 2)
+
+    def test_best_before_trades_mileage_against_the_detour(self):
+        candidates = [
+            CorridorStop(100, 0.5, TruckStop('Early', 0, 0)),
+            CorridorStop(190, 1.0, TruckStop('Late', 0, 0)),
+            CorridorStop(195, 4.0, TruckStop('Later but far', 0, 0)),
+            CorridorStop(260, 0.0, TruckStop('Past the limit', 0, 0)),
+        ]
+
+        self.assertEqual(best_before(candidates, 0, 200).stop.name, 'Late')
+        self.assertEqual(best_before(candidates, 190, 250).stop.name, 'Later but far')
+        self.assertIsNone(best_before(candidates, 200, 250))
+        self.assertEqual(best_before(candidates, 50, 150).stop.name, 'Early')
+
+
+class SnappingTests(TruckStopTestCase):
+    def test_fuel_stop_snaps_to_a_truck_stop_before_the_limit(self):
+        # Chicago - Denver - Seattle is 1941.7 straight-line miles with Denver at 920.5; this stop is
+        # about 60 miles past Denver, just off the straight line
+        t = 60 / (1941.7 - 920.5)
+        lat = DENVER[0] + t * (SEATTLE[0] - DENVER[0]) + 0.01
+        lng = DENVER[1] + t * (SEATTLE[1] - DENVER[1])
+        path = self.write('stops.csv', f'name,latitude,longitude\nTA Wyoming,{lat},{lng}\n')
+
+        with override_settings(OPENROUTE_API_KEY='', ROAD_GRAPH_PATH='', TRUCK_STOPS_PATH=path):
+            route_data = RouteService(plan_cache=None).calculate_route('Chicago, IL', 'Denver, CO', 'Seattle, WA')
+
+        fuel_stop, = route_data['fuel_stops']
+        self.assertEqual(fuel_stop['location'], 'TA Wyoming')
+        self.assertEqual(fuel_stop['coords'], (lat, lng))
+        self.assertAlmostEqual(fuel_stop['mileage'], 980.5, delta=3)
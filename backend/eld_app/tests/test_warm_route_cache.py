@@ -0,0 +1,96 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from eld_app.models import Trip
+
+SMALLVILLE = (39.05, -95.68)
+
+
+def ors_response(url, headers=None, json=None):
+    """A directions response through the requested coordinates"""
+    coordinates = json['coordinates']
+    return mock.Mock(status_code=200, json=lambda: {'features': [{
+        'geometry': {'coordinates': coordinates},
+        'properties': {
+            'summary': {'distance': 1609.34 * 500, 'duration': 3600 * 9},
+            'segments': [{'distance': 1609.34 * 250, 'steps': []}] * (len(coordinates) - 1),
+            'way_points': list(range(len(coordinates))),
+        },
+    }]})
+
+
+class WarmRouteCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            CACHES={
+                name: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'{self.id()}-{name}'}
+                for name in ('default', 'geocode', 'routes')
+            },
+            GEOCODE_RATE_LIMIT_FILE=os.path.join(directory.name, 'ratelimit'), GEOCODE_RATE_PER_SECOND=100.0,
+            GEOCODE_BURST=10.0, ROAD_GRAPH_PATH='', TRUCK_STOPS_PATH='',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        lanes = [('Chicago, IL', 'Denver, CO', 'Seattle, WA')] * 3 + [('Smallville, KS', 'Denver, CO', 'Boston, MA')]
+        for start, pickup, dropoff in lanes:
+            Trip.objects.create(current_location=start, pickup_location=pickup, dropoff_location=dropoff,
+                                current_cycle_used=0)
+        old = Trip.objects.create(current_location='Miami, FL', pickup_location='Atlanta, GA',
+                                  dropoff_location='Houston, TX', current_cycle_used=0)
+        Trip.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=120))
+
+        # A coordinator built for other settings would keep its own rate limit file
+        coordinator = mock.patch('eld_app.geocoding._coordinator', None)
+        coordinator.start()
+        self.addCleanup(coordinator.stop)
+        geocode = mock.patch('eld_app.services.RouteService._nominatim_geocode', return_value=SMALLVILLE)
+        self.geocode = geocode.start()
+        self.addCleanup(geocode.stop)
+
+    def warm(self, *args):
+        output = StringIO()
+        call_command('warm_route_cache', '--route-rate', '100', *args, stdout=output)
+        return output.getvalue()
+
+    def test_without_an_api_key_only_locations_are_resolved(self):
+        with override_settings(OPENROUTE_API_KEY=''):
+            output = self.warm()
+
+        self.assertIn('4 trips in the last 90 days: 5 distinct locations, routing the top 2 lanes', output)
+        self.assertIn('Locations: 5/5 ready (gazetteer=4, resolved=1)', output)
+        self.assertIn('Lanes: local=2; covering 4/4 trips (100%)', output)
+        self.assertIn('No OPENROUTE_API_KEY', output)
+        self.geocode.assert_called_once_with('Smallville, KS')
+
+    def test_lanes_are_routed_once_then_served_from_the_cache(self):
+        with override_settings(OPENROUTE_API_KEY='key'), \
+                mock.patch('eld_app.services.requests.post', side_effect=ors_response) as post:
+            first = self.warm()
+            second = self.warm()
+
+        self.assertIn('Lanes: routed=2; covering 4/4 trips (100%)', first)
+        self.assertIn('Locations: 5/5 ready (cached=1, gazetteer=4)', second)
+        self.assertIn('Lanes: cached=2; covering 4/4 trips (100%)', second)
+        self.assertEqual(post.call_count, 2)
+        self.geocode.assert_called_once()
+
+    def test_lane_limit_and_unresolvable_locations(self):
+        self.geocode.return_value = None
+        with override_settings(OPENROUTE_API_KEY='key'), \
+                mock.patch('eld_app.services.requests.post', side_effect=ors_response) as post:
+            output = self.warm('--lanes', '1', '--days', '200')
+
+        self.assertIn('5 trips in the last 200 days: 8 distinct locations, routing the top 1 lanes', output)
+        self.assertIn('Locations: 7/8 ready (failed=1, gazetteer=7)', output)
+        self.assertIn('Lanes: routed=1; covering 3/5 trips (60%)', output)
+        self.assertEqual(post.call_count, 1)
@@ -0,0 +1,114 @@
+from array import array
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.test import SimpleTestCase, override_settings
+
+from eld_app.eta import RouteSegments
+from eld_app.what_if import WhatIfPlanner
+
+CHICAGO = ZoneInfo('America/Chicago')
+STEP = timedelta(minutes=15)
+
+
+def trip_points(miles, dropoff_window=None):
+    return [
+        {'type': 'start', 'location': 'Yard', 'mileage': 0.0, 'duration_hours': 0},
+        {'type': 'pickup', 'location': 'Shipper', 'mileage': 0.0, 'duration_hours': 1},
+        {'type': 'dropoff', 'location': 'Receiver', 'mileage': miles, 'duration_hours': 1,
+         'window_start': dropoff_window},
+    ]
+
+
+def planner(miles, **point_options):
+    segments = RouteSegments(array('d', [miles]), array('d', [55.0]))
+    return WhatIfPlanner(segments, trip_points(miles, **point_options), cycle_used=20)
+
+
+def grid(earliest, latest):
+    departures = []
+    while earliest <= latest:
+        departures.append(earliest)
+        earliest += STEP
+    return departures
+
+
+@override_settings(ELD_TIME_ZONE='America/Chicago')
+class WhatIfPlannerTests(SimpleTestCase):
+    def setUp(self):
+        self.earliest = datetime(2024, 6, 3, 0, tzinfo=CHICAGO)
+        self.latest = self.earliest + timedelta(hours=24)
+
+    def test_earliest_arrival_matches_an_exhaustive_search_with_fewer_evaluations(self):
+        for miles in (300, 900):
+            with self.subTest(miles=miles):
+                search = planner(miles)
+                best = search.earliest_arrival(self.earliest, self.latest, STEP)
+
+                exhaustive = planner(miles)
+                schedules = [exhaustive.evaluate(departure) for departure in grid(self.earliest, self.latest)]
+                expected = min(schedules, key=lambda schedule: (schedule.arrival, schedule.departure))
+                self.assertEqual((best.departure, best.arrival), (expected.departure, expected.arrival))
+                self.assertLess(search.evaluations, len(schedules) / 2)
+
+    def test_lower_bound_never_exceeds_a_real_trip(self):
+        search = planner(900)
+
+        for departure in grid(self.earliest, self.latest)[::8]:
+            self.assertLessEqual(search.lower_bound, search.evaluate(departure).arrival - departure)
+
+    def test_waiting_for_a_receiving_window_is_part_of_the_delivery(self):
+        opens = datetime(2024, 6, 4, 8, tzinfo=CHICAGO)
+        search = planner(300, dropoff_window=opens)
+
+        best = search.earliest_arrival(self.earliest, self.latest, STEP)
+
+        self.assertEqual(best.departure, self.earliest)
+        self.assertLess(best.arrival, opens)
+        self.assertEqual(best.delivered, opens + timedelta(hours=1))
+        # The lower bound ignores windows, so it stays valid for any departure
+        self.assertLessEqual(search.lower_bound, best.arrival - best.departure)
+
+    def test_latest_departure_matches_an_exhaustive_search(self):
+        search = planner(900)
+        deliver_by = search.evaluate(self.earliest + timedelta(hours=10)).arrival
+
+        latest = search.latest_departure(deliver_by, self.earliest, self.latest, STEP)
+
+        exhaustive = planner(900)
+        expected = max(departure for departure in grid(self.earliest, self.latest)
+                       if exhaustive.evaluate(departure).arrival <= deliver_by)
+        self.assertEqual(latest.departure, expected)
+        self.assertLessEqual(latest.arrival, deliver_by)
+
+    def test_latest_departure_when_even_the_first_is_too_late(self):
+        search = planner(900)
+        deliver_by = search.evaluate(self.earliest).arrival - timedelta(minutes=1)
+
+        self.assertIsNone(search.latest_departure(deliver_by, self.earliest, self.latest, STEP))
+
+
+@override_settings(OPENROUTE_API_KEY='', ROAD_GRAPH_PATH='', TRUCK_STOPS_PATH='')
+class WhatIfViewTests(SimpleTestCase):
+    def test_plan_reports_the_best_departure_and_the_latest_one(self):
+        response = self.client.post('/api/plan/what-if/', {
+            'current_location': 'Chicago, IL', 'pickup_location': 'Denver, CO', 'dropoff_location': 'Seattle, WA',
+            'current_cycle_used': 10, 'earliest_departure': '2024-06-03T00:00:00-05:00',
+            'latest_departure': '2024-06-04T00:00:00-05:00', 'deliver_by': '2024-06-08T00:00:00-05:00',
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['meets_deadline'])
+        self.assertLessEqual(data['departure_time'], data['latest_departure'])
+        self.assertEqual(data['route_points'][-1]['estimated_arrival'], data['arrival_time'])
+        self.assertGreater(len(data['logs']), 1)
+        self.assertLess(data['search']['candidates_evaluated'], 24 * 4)
+
+    def test_window_longer_than_a_week_is_rejected(self):
+        response = self.client.post('/api/plan/what-if/', {
+            'current_location': 'Chicago, IL', 'pickup_location': 'Denver, CO', 'dropoff_location': 'Seattle, WA',
+            'earliest_departure': '2024-06-03T00:00:00Z', 'latest_departure': '2024-06-11T00:00:00Z',
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
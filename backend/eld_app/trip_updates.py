@@ -0,0 +1,190 @@
+"""
+Re-planning an edited trip while leaving its unchanged logs alone.
+
+The route and duty timeline are recomputed in memory from the trip's
+original departure (geocoding and routing are cached, scheduling is cheap),
+then compared with what is stored: logs are matched by date, duty statuses
+within a log are aligned with ``difflib`` and route points are matched by
+sequence, with floats compared to within ``FLOAT_TOLERANCE``. Stops are
+placed leg by leg (see ``RouteService._locate_waypoints``), so only the
+differences are written, in one transaction: changing the last stop of a
+14-day trip rewrites the final days' statuses and the points on the last leg,
+and leaves the earlier logs and stops untouched.
+"""
+import math
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Dict, List
+
+from django.db import transaction
+
+from . import day_summaries
+from .log_records import DailyLog
+from .models import DutyStatus, ELDLog, HOSAuditResult, RoutePoint, Trip
+from .services import ELDLogService, RouteService
+
+# Trip fields whose change requires a new plan
+REPLAN_FIELDS = (
+    'current_location', 'pickup_location', 'dropoff_location', 'current_cycle_used', 'stops', 'optimize_stop_order',
+)
+LOG_FIELDS = (
+    'driver_name', 'carrier_name', 'vehicle_number', 'off_duty_hours', 'sleeper_berth_hours', 'driving_hours',
+    'on_duty_hours', 'total_on_duty_7_days', 'hours_available_70hr', 'total_on_duty_5_days',
+    'total_on_duty_6_days', 'hours_available_60hr',
+)
+STATUS_FIELDS = ('start_time', 'end_time', 'status', 'location', 'remarks')
+# Floats (degrees, miles, hours) closer than this are treated as unchanged: about 10 cm or 4 ms
+FLOAT_TOLERANCE = 1e-6
+POINT_FIELDS = (
+    'latitude', 'longitude', 'address', 'point_type', 'mileage', 'estimated_arrival', 'estimated_departure',
+    'duration_hours',
+)
+
+
+def departure_time(trip: Trip) -> datetime:
+    """When the trip was planned to leave: the start point's departure, or its creation time for old trips"""
+    departure = trip.route_points.filter(point_type='start').values_list('estimated_departure', flat=True).first()
+    return departure or trip.created_at
+
+
+def replan_trip(trip: Trip) -> Dict[str, int]:
+    """Re-plan ``trip`` (already holding its edited fields) and apply the differences to its stored plan.
+
+    Returns counts of the rows created, updated and deleted.
+    """
+    route_data = RouteService().calculate_route(
+        trip.current_location, trip.pickup_location, trip.dropoff_location,
+        departure=departure_time(trip), cycle_used=trip.current_cycle_used,
+        stops=trip.stops, optimize_order=trip.optimize_stop_order,
+    )
+    logs_data = ELDLogService().generate_eld_logs(trip, route_data)
+
+    with transaction.atomic():
+        # Serialize concurrent edits of the same trip before reading its stored plan
+        Trip.objects.select_for_update().only('id').get(pk=trip.pk)
+        trip.total_distance = route_data['total_distance']
+        trip.estimated_duration = route_data['estimated_duration']
+        # Bumps updated_at, the version behind the trip's ETags, with the rows below in one commit
+        trip.save()
+        changes = _sync_route_points(trip, route_data['route_points'])
+        changes.update(_sync_logs(trip, logs_data))
+    return changes
+
+
+def _point_values(point: Dict) -> Dict:
+    return {
+        'latitude': point['coords'][0],
+        'longitude': point['coords'][1],
+        'address': point['location'],
+        'point_type': point['type'],
+        'mileage': point.get('mileage'),
+        'estimated_arrival': point.get('estimated_arrival'),
+        'estimated_departure': point.get('estimated_departure'),
+        'duration_hours': point.get('duration_hours', 0),
+    }
+
+
+def _sync_route_points(trip: Trip, points: List[Dict]) -> Dict[str, int]:
+    stored = {point.sequence: point for point in trip.route_points.all()}
+    created, updated = [], []
+    for sequence, point in enumerate(points):
+        values = _point_values(point)
+        existing = stored.pop(sequence, None)
+        if existing is None:
+            created.append(RoutePoint(trip=trip, sequence=sequence, **values))
+        elif _assign_changed(existing, values):
+            updated.append(existing)
+    RoutePoint.objects.bulk_create(created)
+    RoutePoint.objects.bulk_update(updated, POINT_FIELDS)
+    RoutePoint.objects.filter(id__in=[point.id for point in stored.values()]).delete()
+    return {'route_points_created': len(created), 'route_points_updated': len(updated),
+            'route_points_deleted': len(stored)}
+
+
+def _sync_logs(trip: Trip, logs_data: List[DailyLog]) -> Dict[str, int]:
+    stored = {log.log_date: log for log in trip.eld_logs.prefetch_related('duty_statuses')}
+    new_logs, new_log_statuses = [], []
+    updated_logs, changed_log_ids = [], set()
+    statuses_created, statuses_updated, statuses_deleted = [], [], []
+    unchanged = 0
+    for log_data in logs_data:
+        values = {field: getattr(log_data, field) for field in LOG_FIELDS}
+        statuses = log_data.duty_statuses()
+        log = stored.pop(log_data.log_date, None)
+        if log is None:
+            log = ELDLog(trip=trip, log_date=log_data.log_date, **values)
+            new_logs.append(log)
+            new_log_statuses.append((log, statuses))
+            continue
+        log_changed = _assign_changed(log, values)
+        if log_changed:
+            updated_logs.append(log)
+        created, updated, deleted = _diff_statuses(log, list(log.duty_statuses.all()), statuses)
+        statuses_created += created
+        statuses_updated += updated
+        statuses_deleted += deleted
+        if log_changed or created or updated or deleted:
+            changed_log_ids.add(log.id)
+        else:
+            unchanged += 1
+
+    ELDLog.objects.bulk_create(new_logs)
+    ELDLog.objects.bulk_update(updated_logs, LOG_FIELDS)
+    statuses_created += [
+        DutyStatus(eld_log=log, **{field: status[field] for field in STATUS_FIELDS})
+        for log, statuses in new_log_statuses
+        for status in statuses
+    ]
+    DutyStatus.objects.bulk_create(statuses_created)
+    DutyStatus.objects.bulk_update(statuses_updated, STATUS_FIELDS)
+    DutyStatus.objects.filter(id__in=[status.id for status in statuses_deleted]).delete()
+    # Audits of rewritten logs no longer describe them; `audit_hos` recreates them
+    HOSAuditResult.objects.filter(eld_log_id__in=changed_log_ids).delete()
+    ELDLog.objects.filter(id__in=[log.id for log in stored.values()]).delete()
+    day_summaries.refresh_days(
+        (log.driver_name, log.log_date) for log in [*new_logs, *updated_logs, *stored.values()]
+    )
+    return {
+        'logs_created': len(new_logs), 'logs_updated': len(changed_log_ids), 'logs_deleted': len(stored),
+        'logs_unchanged': unchanged, 'statuses_created': len(statuses_created),
+        'statuses_updated': len(statuses_updated), 'statuses_deleted': len(statuses_deleted),
+    }
+
+
+def _diff_statuses(log: ELDLog, stored: List[DutyStatus], statuses: List[Dict]):
+    """Rows to create, update and delete to turn a log's ``stored`` statuses into ``statuses``"""
+    stored_keys = [tuple(getattr(row, field) for field in STATUS_FIELDS) for row in stored]
+    new_keys = [tuple(status[field] for field in STATUS_FIELDS) for status in statuses]
+    created, updated, deleted = [], [], []
+    matcher = SequenceMatcher(None, stored_keys, new_keys, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        # Reuse rows where the two runs overlap, then insert or delete the rest
+        reused = min(i2 - i1, j2 - j1)
+        for row, key in zip(stored[i1:i1 + reused], new_keys[j1:j1 + reused]):
+            for field, value in zip(STATUS_FIELDS, key):
+                setattr(row, field, value)
+            updated.append(row)
+        deleted += stored[i1 + reused:i2]
+        created += [
+            DutyStatus(eld_log=log, **dict(zip(STATUS_FIELDS, key))) for key in new_keys[j1 + reused:j2]
+        ]
+    return created, updated, deleted
+
+
+def _assign_changed(instance, values: Dict) -> bool:
+    """Set ``values`` on ``instance``; whether any of them differed"""
+    changed = False
+    for field, value in values.items():
+        if not _same(getattr(instance, field), value):
+            setattr(instance, field, value)
+            changed = True
+    return changed
+
+
+def _same(stored, value) -> bool:
+    # Re-planning the same route can move coordinates, mileages and hours by float rounding alone
+    if isinstance(stored, float) and isinstance(value, float):
+        return math.isclose(stored, value, rel_tol=1e-9, abs_tol=FLOAT_TOLERANCE)
+    return stored == value
@@ -0,0 +1,154 @@
+"""
+Local truck-stop dataset and the spatial index used to snap planned fuel and
+rest stops to real locations.
+
+Stops are loaded from ``TRUCK_STOPS_PATH`` (a CSV with ``name``, ``latitude``
+and ``longitude`` columns, or a GeoJSON FeatureCollection of points) and
+bucketed into a uniform lat/lng grid. A corridor query walks the route
+polyline and only inspects the grid cells around it, so its cost depends on
+route length and local stop density rather than on the size of the dataset.
+"""
+import csv
+import json
+import math
+import os
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+
+from .geo import PolylineIndex, haversine_miles
+
+MILES_PER_DEGREE_LAT = 69.0
+
+
+class TruckStop(NamedTuple):
+    name: str
+    latitude: float
+    longitude: float
+    brand: str = ''
+
+
+class CorridorStop(NamedTuple):
+    """A truck stop near the route: ``mileage`` along the polyline and ``offset_miles`` off it"""
+    mileage: float
+    offset_miles: float
+    stop: TruckStop
+
+
+def load_truck_stops(path: str) -> List[TruckStop]:
+    """Read truck stops from a CSV or GeoJSON file, skipping rows without usable coordinates"""
+    if path.lower().endswith(('.json', '.geojson')):
+        with open(path) as f:
+            features = json.load(f).get('features', [])
+        rows = (
+            {**(feature.get('properties') or {}),
+             'longitude': feature['geometry']['coordinates'][0],
+             'latitude': feature['geometry']['coordinates'][1]}
+            for feature in features
+            if (feature.get('geometry') or {}).get('type') == 'Point'
+        )
+        return _parse_rows(rows)
+    with open(path, newline='') as f:
+        return _parse_rows(csv.DictReader(f))
+
+
+def _parse_rows(rows) -> List[TruckStop]:
+    stops = []
+    for row in rows:
+        try:
+            latitude = float(row['latitude'])
+            longitude = float(row['longitude'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        stops.append(TruckStop(
+            name=row.get('name') or f'Truck stop {latitude:.4f},{longitude:.4f}',
+            latitude=latitude,
+            longitude=longitude,
+            brand=row.get('brand') or '',
+        ))
+    return stops
+
+
+class TruckStopIndex:
+    """Uniform grid over truck stops, with cells of ``cell_degrees`` on each side"""
+
+    def __init__(self, stops: List[TruckStop], cell_degrees: float = 0.25):
+        self.cell_degrees = cell_degrees
+        self.cells: Dict[Tuple[int, int], List[TruckStop]] = {}
+        for stop in stops:
+            self.cells.setdefault(self._cell(stop.latitude, stop.longitude), []).append(stop)
+        self.size = len(stops)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees))
+
+    def nearby(self, lat: float, lng: float, radius_miles: float) -> List[Tuple[float, TruckStop]]:
+        """``(distance, stop)`` pairs for stops within ``radius_miles`` of a point"""
+        lat_span = radius_miles / MILES_PER_DEGREE_LAT
+        lng_span = radius_miles / (MILES_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+        min_row, min_col = self._cell(lat - lat_span, lng - lng_span)
+        max_row, max_col = self._cell(lat + lat_span, lng + lng_span)
+        found = []
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                for stop in self.cells.get((row, col), ()):
+                    distance = haversine_miles(lat, lng, stop.latitude, stop.longitude)
+                    if distance <= radius_miles:
+                        found.append((distance, stop))
+        return found
+
+    def corridor(self, route: PolylineIndex, radius_miles: float) -> List[CorridorStop]:
+        """Stops within ``radius_miles`` of the route, ordered by mileage.
+
+        The polyline is sampled every ``radius_miles / 2``; each stop is reported
+        once, at the sample it is closest to.
+        """
+        step = radius_miles / 2
+        best: Dict[TruckStop, CorridorStop] = {}
+        samples = int(route.length // step) + 1 if step > 0 else 1
+        for i in range(samples + 1):
+            mileage = min(i * step, route.length)
+            lat, lng = route.locate(mileage)
+            for distance, stop in self.nearby(lat, lng, radius_miles):
+                current = best.get(stop)
+                if current is None or distance < current.offset_miles:
+                    best[stop] = CorridorStop(mileage, distance, stop)
+        return sorted(best.values())
+
+
+@lru_cache(maxsize=4)
+def _index_for(path: str, mtime: float, cell_degrees: float) -> TruckStopIndex:
+    return TruckStopIndex(load_truck_stops(path), cell_degrees)
+
+
+def get_index() -> Optional[TruckStopIndex]:
+    """The index for ``TRUCK_STOPS_PATH``, built once per process and rebuilt when the file changes"""
+    path = settings.TRUCK_STOPS_PATH
+    if not path:
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    return _index_for(path, mtime, settings.TRUCK_STOP_GRID_DEGREES)
+
+
+def best_before(candidates: List[CorridorStop], after: float, limit: float) -> Optional[CorridorStop]:
+    """Pick the stop to use between ``after`` and ``limit`` miles.
+
+    Later stops stretch the tank or the driving window further, while the
+    detour off the route costs the offset twice, so candidates are ranked by
+    mileage minus the round-trip detour.
+    """
+    best = None
+    best_score = -math.inf
+    for candidate in candidates:
+        if candidate.mileage <= after:
+            continue
+        if candidate.mileage > limit:
+            break
+        score = candidate.mileage - 2 * candidate.offset_miles
+        if score > best_score:
+            best, best_score = candidate, score
+    return best
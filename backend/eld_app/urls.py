@@ -7,4 +7,10 @@ urlpatterns = [
     path('trips/<int:trip_id>/logs/', views.trip_logs, name='trip-logs'),
     path('trips/<int:trip_id>/logs/<int:log_id>/pdf/', views.generate_pdf_log, name='generate-pdf-log'),
     path('calculate-route/', views.calculate_route, name='calculate-route'),
+    path('plan/what-if/', views.what_if_plan, name='what-if-plan'),
+    path('eld-output/', views.eld_output_file, name='eld-output-file'),
+    path('drivers/<str:driver_name>/events/', views.driver_events, name='driver-events'),
+    path('drivers/<str:driver_name>/summary/', views.driver_summary, name='driver-summary'),
+    path('fleet/summary/', views.fleet_summary, name='fleet-summary'),
+    path('clocks/stream/', views.clock_stream, name='clock-stream'),
 ]
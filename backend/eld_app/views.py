@@ -1,22 +1,62 @@
+import hmac
+import logging
+import queue
+import threading
+import time
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
 from rest_framework import generics, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db import connections, transaction
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+from .eld_output import ELDOutputFile
 from .models import Trip, RoutePoint, ELDLog, DutyStatus
-from .serializers import TripSerializer, TripCreateSerializer, ELDLogSerializer
+from .hos_state import ingest_events
+from .live_clocks import clock_events
+from .renderers import EventStreamRenderer, encode_event
+from .serializers import (
+    TripSerializer, TripCreateSerializer, TripStopSerializer, ELDLogSerializer, WhatIfPlanSerializer,
+    DutyEventBatchSerializer,
+)
 from .services import RouteService, ELDLogService
+from .trip_updates import REPLAN_FIELDS, replan_trip
+from .what_if import WhatIfPlanner
+from . import caching, day_summaries, metrics, profiling
 
+logger = logging.getLogger(__name__)
 
 class TripListCreateView(generics.ListCreateAPIView):
     """View for listing and creating trips"""
-    queryset = Trip.objects.all()
+    queryset = Trip.objects.prefetch_related('route_points', 'eld_logs__duty_statuses')
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return TripCreateSerializer
         return TripSerializer
     
-    def perform_create(self, serializer):
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if self.request.method == 'POST':
+            renderers.append(EventStreamRenderer())
+        return renderers
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if request.accepted_renderer.format == EventStreamRenderer.format:
+            return self._stream_create(serializer)
+        self.perform_create(serializer)
+        with metrics.timer('serialize'):
+            data = serializer.data
+        headers = self.get_success_headers(data)
+        return Response(data, status=status.HTTP_201_CREATED, headers=headers)
+    
+    def perform_create(self, serializer, progress=None):
         try:
             trip = serializer.save()
             
@@ -28,83 +68,203 @@ class TripListCreateView(generics.ListCreateAPIView):
             route_data = route_service.calculate_route(
                 trip.current_location,
                 trip.pickup_location,
-                trip.dropoff_location
+                trip.dropoff_location,
+                cycle_used=trip.current_cycle_used,
+                stops=trip.stops,
+                optimize_order=trip.optimize_stop_order,
+                progress=progress
             )
             
-            # Update trip with calculated data
-            trip.total_distance = route_data['total_distance']
-            trip.estimated_duration = route_data['estimated_duration']
-            trip.save()
-            
-            # Create route points
-            for i, point in enumerate(route_data['route_points']):
-                RoutePoint.objects.create(
-                    trip=trip,
-                    latitude=point['coords'][0],
-                    longitude=point['coords'][1],
-                    address=point['location'],
-                    point_type=point['type'],
-                    sequence=i
-                )
-            
             # Generate ELD logs
             eld_logs_data = eld_service.generate_eld_logs(trip, route_data)
+            if progress:
+                progress('logs_generated', {'days': len(eld_logs_data)})
             
-            for log_data in eld_logs_data:
-                eld_log = ELDLog.objects.create(
-                    trip=trip,
-                    log_date=log_data['log_date'],
-                    driver_name=log_data['driver_name'],
-                    carrier_name=log_data['carrier_name'],
-                    vehicle_number=log_data['vehicle_number'],
-                    off_duty_hours=log_data['off_duty_hours'],
-                    sleeper_berth_hours=log_data['sleeper_berth_hours'],
-                    driving_hours=log_data['driving_hours'],
-                    on_duty_hours=log_data['on_duty_hours'],
-                    total_on_duty_7_days=log_data['total_on_duty_7_days'],
-                    hours_available_70hr=log_data['hours_available_70hr'],
-                    total_on_duty_5_days=log_data['total_on_duty_5_days'],
-                    total_on_duty_6_days=log_data['total_on_duty_6_days'],
-                    hours_available_60hr=log_data['hours_available_60hr']
-                )
-                
-                # Create duty status entries
-                for status_data in log_data['duty_statuses']:
-                    DutyStatus.objects.create(
-                        eld_log=eld_log,
-                        start_time=status_data['start_time'],
-                        end_time=status_data['end_time'],
-                        status=status_data['status'],
-                        location=status_data['location'],
-                        remarks=status_data['remarks']
-                    )
-            
+            with metrics.timer('persist_trip'):
+                self._persist_trip(trip, route_data, eld_logs_data)
+            if progress:
+                progress('persisted', {'trip_id': trip.id})
             
         except Exception:
             # Log error for debugging
             raise
+    
+    def _stream_create(self, serializer):
+        """Create the trip in a worker thread and stream each stage as an SSE event.
+        
+        Events: ``geocoded``, ``routed``, ``logs_generated``, ``persisted``, then
+        ``trip`` with the usual 201 response body, or ``error``. The trip is
+        still created if the client goes away midway. The body is an async
+        iterator, so the ASGI server sends each event as it is queued.
+        """
+        events = queue.Queue()
+        
+        def progress(stage, data):
+            events.put(encode_event(stage, data))
+        
+        def run():
+            try:
+                self.perform_create(serializer, progress)
+                with metrics.timer('serialize'):
+                    events.put(encode_event('trip', serializer.data))
+            except Exception:
+                logger.exception('Streamed trip creation failed')
+                events.put(encode_event('error', {'error': 'Trip creation failed'}))
+            finally:
+                connections.close_all()
+                events.put(None)
+        
+        async def stream():
+            # The blocking get waits in an executor thread, off the event loop
+            while (frame := await sync_to_async(events.get, thread_sensitive=False)()) is not None:
+                yield frame
+        
+        threading.Thread(target=run, daemon=True).start()
+        response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    @transaction.atomic
+    def _persist_trip(self, trip, route_data, eld_logs_data):
+        """Store the calculated route, route points, logs and duty statuses"""
+        # Update trip with calculated data; saving also bumps the version used for ETags
+        trip.total_distance = route_data['total_distance']
+        trip.estimated_duration = route_data['estimated_duration']
+        trip.save()
+        
+        # Create route points
+        RoutePoint.objects.bulk_create([
+            RoutePoint(
+                trip=trip,
+                latitude=point['coords'][0],
+                longitude=point['coords'][1],
+                address=point['location'],
+                point_type=point['type'],
+                sequence=i,
+                mileage=point.get('mileage'),
+                estimated_arrival=point.get('estimated_arrival'),
+                estimated_departure=point.get('estimated_departure'),
+                duration_hours=point.get('duration_hours', 0)
+            )
+            for i, point in enumerate(route_data['route_points'])
+        ])
+        
+        # Bulk inserts keep the write transaction (and SQLite's write lock) short
+        eld_logs = ELDLog.objects.bulk_create([
+            ELDLog(
+                trip=trip,
+                log_date=log_data.log_date,
+                driver_name=log_data.driver_name,
+                carrier_name=log_data.carrier_name,
+                vehicle_number=log_data.vehicle_number,
+                off_duty_hours=log_data.off_duty_hours,
+                sleeper_berth_hours=log_data.sleeper_berth_hours,
+                driving_hours=log_data.driving_hours,
+                on_duty_hours=log_data.on_duty_hours,
+                total_on_duty_7_days=log_data.total_on_duty_7_days,
+                hours_available_70hr=log_data.hours_available_70hr,
+                total_on_duty_5_days=log_data.total_on_duty_5_days,
+                total_on_duty_6_days=log_data.total_on_duty_6_days,
+                hours_available_60hr=log_data.hours_available_60hr
+            )
+            for log_data in eld_logs_data
+        ])
+        
+        # Create duty status entries
+        DutyStatus.objects.bulk_create([
+            DutyStatus(
+                eld_log=eld_log,
+                start_time=status_data['start_time'],
+                end_time=status_data['end_time'],
+                status=status_data['status'],
+                location=status_data['location'],
+                remarks=status_data['remarks']
+            )
+            for eld_log, log_data in zip(eld_logs, eld_logs_data)
+            for status_data in log_data.duty_statuses()
+        ])
+        day_summaries.refresh_days((eld_log.driver_name, eld_log.log_date) for eld_log in eld_logs)
 
 
-class TripDetailView(generics.RetrieveAPIView):
-    """View for retrieving a specific trip"""
+class TripDetailView(generics.RetrieveUpdateAPIView):
+    """View for retrieving a specific trip and editing its locations or cycle hours"""
     queryset = Trip.objects.all()
     serializer_class = TripSerializer
+    http_method_names = ['get', 'patch', 'head', 'options']
+    
+    def partial_update(self, request, *args, **kwargs):
+        """Apply the edits and re-plan the trip, rewriting only the logs and statuses that change"""
+        trip = self.get_object()
+        serializer = TripCreateSerializer(trip, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        changed = False
+        for field, value in serializer.validated_data.items():
+            if field in REPLAN_FIELDS and getattr(trip, field) != value:
+                setattr(trip, field, value)
+                changed = True
+        changes = replan_trip(trip) if changed else {}
+        trip = Trip.objects.prefetch_related('route_points', 'eld_logs__duty_statuses').get(pk=trip.pk)
+        with metrics.timer('serialize'):
+            data = TripSerializer(trip).data
+        data['log_changes'] = changes
+        return Response(data)
+    
+    def retrieve(self, request, *args, **kwargs):
+        # Only the trip's version is read unless the response has to be rebuilt
+        trip_id = self.kwargs['pk']
+        version = get_object_or_404(Trip.objects.values_list('updated_at', flat=True), id=trip_id)
+        etag = caching.trip_etag(trip_id, version, 'detail')
+        response = caching.not_modified(request, etag, version)
+        if response is None:
+            response = Response(caching.cached_payload(trip_id, version, 'detail', self._serialize))
+        return caching.set_validators(response, etag, version)
+    
+    def _serialize(self):
+        instance = self.get_object()
+        with metrics.timer('serialize'):
+            return self.get_serializer(instance).data
 
 
 @api_view(['GET'])
 def trip_logs(request, trip_id):
     """Get ELD logs for a trip"""
-    trip = get_object_or_404(Trip, id=trip_id)
-    logs = ELDLog.objects.filter(trip=trip).order_by('log_date')
+    version = get_object_or_404(Trip.objects.values_list('updated_at', flat=True), id=trip_id)
+    etag = caching.trip_etag(trip_id, version, 'logs')
+    response = caching.not_modified(request, etag, version)
+    if response is None:
+        response = Response(caching.cached_payload(trip_id, version, 'logs', lambda: _serialize_logs(trip_id)))
+    return caching.set_validators(response, etag, version)
+
+
+def _serialize_logs(trip_id):
+    logs = ELDLog.objects.filter(trip_id=trip_id).prefetch_related('duty_statuses').order_by('log_date')
     
-    serializer = ELDLogSerializer(logs, many=True)
-    return Response(serializer.data)
+    with metrics.timer('serialize'):
+        return ELDLogSerializer(logs, many=True).data
 
 
 @api_view(['GET'])
 def generate_pdf_log(request, trip_id, log_id):
     """Generate PDF for a specific ELD log"""
-    from django.http import HttpResponse
+    version = get_object_or_404(
+        ELDLog.objects.values_list('trip__updated_at', flat=True), id=log_id, trip_id=trip_id
+    )
+    etag = caching.trip_etag(trip_id, version, f'pdf:{log_id}')
+    response = caching.not_modified(request, etag, version)
+    if response is None:
+        def build():
+            with metrics.timer('generate_pdf'):
+                return _render_pdf_log(trip_id, log_id)
+        
+        filename, pdf_content = caching.cached_payload(trip_id, version, f'pdf:{log_id}', build)
+        response = HttpResponse(pdf_content, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return caching.set_validators(response, etag, version)
+
+
+def _render_pdf_log(trip_id, log_id):
+    """Build the PDF log sheet, returning its download file name and content"""
     from reportlab.lib.pagesizes import letter
     from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
     from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -206,10 +366,7 @@ def generate_pdf_log(request, trip_id, log_id):
     pdf_content = buffer.getvalue()
     buffer.close()
     
-    # Return PDF response
-    response = HttpResponse(pdf_content, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="eld_log_{eld_log.log_date}_{eld_log.driver_name}.pdf"'
-    return response
+    return f'eld_log_{eld_log.log_date}_{eld_log.driver_name}.pdf', pdf_content
 
 
 @api_view(['POST'])
@@ -225,11 +382,183 @@ def calculate_route(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    stops = TripStopSerializer(data=request.data.get('stops') or [], many=True)
+    stops.is_valid(raise_exception=True)
+    
     route_service = RouteService()
     route_data = route_service.calculate_route(
         current_location,
         pickup_location,
-        dropoff_location
+        dropoff_location,
+        stops=stops.validated_data,
+        optimize_order=bool(request.data.get('optimize_stop_order'))
     )
     
     return Response(route_data)
+
+
+@api_view(['POST'])
+def what_if_plan(request):
+    """Earliest legal delivery for a trip over a departure window, computed without saving anything"""
+    serializer = WhatIfPlanSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+    
+    route, segments = RouteService().plan_route(
+        params['current_location'], params['pickup_location'], params['dropoff_location'],
+        params.get('stops'), params['optimize_stop_order'], params['earliest_departure']
+    )
+    planner = WhatIfPlanner(segments, route['route_points'], params['current_cycle_used'], params['rest_status'])
+    step = timedelta(minutes=params['step_minutes'])
+    started = time.perf_counter()
+    with metrics.timer('what_if_search'):
+        best = planner.earliest_arrival(params['earliest_departure'], params['latest_departure'], step)
+        latest = None
+        if params.get('deliver_by'):
+            latest = planner.latest_departure(
+                params['deliver_by'], params['earliest_departure'], params['latest_departure'], step
+            )
+    search_ms = (time.perf_counter() - started) * 1000
+    
+    # Daily logs for the chosen plan, from the same generator trips use
+    trip = Trip(current_cycle_used=params['current_cycle_used'])
+    logs = ELDLogService().generate_eld_logs(trip, {
+        'estimated_duration': route['estimated_duration'], 'duty_timeline': best.timeline
+    })
+    log_fields = ('log_date', 'driving_hours', 'on_duty_hours', 'off_duty_hours', 'sleeper_berth_hours',
+                  'is_compliant', 'violations')
+    return Response({
+        'total_distance': route['total_distance'],
+        'departure_time': best.departure,
+        'arrival_time': best.arrival,
+        'delivery_complete_time': best.delivered,
+        'meets_deadline': best.arrival <= params['deliver_by'] if params.get('deliver_by') else None,
+        'latest_departure': latest.departure if latest else None,
+        'route_points': [
+            {field: point[field] for field in ('type', 'location', 'coords', 'mileage', 'estimated_arrival', 'estimated_departure')}
+            for point in best.points
+        ],
+        'duty_timeline': best.timeline,
+        'logs': [{field: getattr(log, field) for field in log_fields} for log in logs],
+        'search': {'candidates_evaluated': planner.evaluations, 'elapsed_ms': round(search_ms, 2)},
+    })
+
+
+@api_view(['GET'])
+def eld_output_file(request):
+    """Stream a driver's FMCSA ELD output file for ``start``..``end`` (default: today and the previous 7 days)"""
+    driver = request.query_params.get('driver')
+    if not driver:
+        return Response({'error': 'driver is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        end = date.fromisoformat(request.query_params['end']) if request.query_params.get('end') else timezone.localdate()
+        start = date.fromisoformat(request.query_params['start']) if request.query_params.get('start') else end - timedelta(days=7)
+    except ValueError:
+        return Response({'error': 'start and end must be YYYY-MM-DD dates'}, status=status.HTTP_400_BAD_REQUEST)
+    if start > end:
+        return Response({'error': 'start must not be after end'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    output = ELDOutputFile(driver, start, end, comment=request.query_params.get('comment', ''))
+    response = StreamingHttpResponse(output.stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{output.filename()}"'
+    return response
+
+
+@api_view(['POST'])
+def driver_events(request, driver_name):
+    """Record a batch of a driver's duty status events and return their updated HOS clocks.
+
+    Body: ``{"events": [{"sequence", "status", "event_time", "location", "remarks"}, ...]}``.
+    Resending events that were already stored is harmless; see ``hos_state.ingest_events``.
+    """
+    serializer = DutyEventBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    result = ingest_events(driver_name, serializer.validated_data['events'], timezone.now())
+    return Response(result, status=status.HTTP_201_CREATED if result['accepted'] else status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def driver_summary(request, driver_name):
+    """A driver's hours per ``period`` (week, month or day) for ``start``..``end``, from the driver-day rollup"""
+    return _summary_response(request, driver_name)
+
+
+@api_view(['GET'])
+def fleet_summary(request):
+    """Hours of all drivers per ``period`` (week, month or day) for ``start``..``end``, from the driver-day rollup"""
+    return _summary_response(request, None)
+
+
+def _summary_response(request, driver_name):
+    period = request.query_params.get('period', 'week')
+    if period not in day_summaries.PERIODS:
+        return Response({'error': f'period must be one of {", ".join(day_summaries.PERIODS)}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        end = date.fromisoformat(request.query_params['end']) if request.query_params.get('end') else timezone.localdate()
+        start = date.fromisoformat(request.query_params['start']) if request.query_params.get('start') else end - timedelta(days=365)
+    except ValueError:
+        return Response({'error': 'start and end must be YYYY-MM-DD dates'}, status=status.HTTP_400_BAD_REQUEST)
+    if start > end:
+        return Response({'error': 'start must not be after end'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = {'period': period, 'start': start, 'end': end,
+            'results': day_summaries.aggregate(start, end, period, driver_name)}
+    if driver_name is not None:
+        data = {'driver_name': driver_name, **data}
+    return Response(data)
+
+
+async def clock_stream(request):
+    """Server-Sent Events stream of the remaining HOS clocks of ``?driver=A&driver=B...``.
+
+    Sends a ``clock`` event per driver on connect, after each of their duty
+    events and every ``LIVE_CLOCK_REFRESH_SECONDS`` as the clocks run down.
+    Needs an ASGI server; see ``live_clocks``.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    drivers = list(dict.fromkeys(name for name in request.GET.getlist('driver') if name))
+    if not drivers:
+        return JsonResponse({'error': 'driver is required'}, status=400)
+    if len(drivers) > settings.LIVE_CLOCK_MAX_DRIVERS:
+        return JsonResponse(
+            {'error': f'at most {settings.LIVE_CLOCK_MAX_DRIVERS} drivers per stream'}, status=400
+        )
+    response = StreamingHttpResponse(
+        clock_events(drivers, settings.LIVE_CLOCK_KEEPALIVE_SECONDS, settings.LIVE_CLOCK_STREAM_SECONDS),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # keep nginx from holding frames back
+    return response
+
+
+def metrics_view(request):
+    """Expose stage timings and cache/upstream counters in Prometheus text format, to holders of ``METRICS_TOKEN``"""
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            raise Http404('Metrics are disabled; set METRICS_TOKEN')
+    elif not hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', '').encode(), f'Bearer {token}'.encode()):
+        response = HttpResponse('Unauthorized', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer realm="metrics"'
+        return response
+    return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def profile_list(request):
+    """Admin page listing recorded request profiles, newest first"""
+    return render(request, 'eld_app/profile_list.html', {
+        'records': profiling.ProfileStore().list(),
+        'profiling_enabled': settings.PROFILING_ENABLED,
+        'title': 'Request profiles',
+    })
+
+
+def profile_detail(request, profile_id):
+    """Admin page showing one request profile"""
+    record = profiling.ProfileStore().get(profile_id)
+    if record is None:
+        raise Http404('Profile not found')
+    return render(request, 'eld_app/profile_detail.html', {'record': record, 'title': record['path']})
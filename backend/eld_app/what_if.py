@@ -0,0 +1,108 @@
+"""
+What-if planning: when can a driver legally deliver if they leave at a given
+time with a given number of cycle hours used?
+
+A route is planned once and then scheduled in memory by the ETA engine for
+candidate departure times; nothing is written to the database. Arrival time is
+bounded below by ``departure + lower_bound``, where the lower bound is the
+trip scheduled as if every hour ran at the profile's fastest speed, so the
+search over increasing departures stops as soon as no later departure can beat
+the best arrival found. Latest-departure questions ("deliver by D") are
+answered by bisection, since leaving later never delivers earlier.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+from .eta import ETAEngine, RouteSegments
+
+
+class Schedule(NamedTuple):
+    departure: datetime
+    arrival: datetime  # at the drop-off
+    delivered: datetime  # drop-off complete
+    points: List[Dict]
+    timeline: List[Dict]
+
+
+class WhatIfPlanner:
+    """Evaluates departure times for one planned route"""
+
+    def __init__(self, segments: RouteSegments, points: List[Dict], cycle_used: float = 0.0,
+                 rest_status: str = 'sleeper_berth', engine: Optional[ETAEngine] = None):
+        self.segments = segments
+        self.points = points
+        self.cycle_used = cycle_used
+        self.rest_status = rest_status
+        self.engine = engine or ETAEngine()
+        self.evaluations = 0
+        self._schedules: Dict[datetime, Schedule] = {}
+        self._lower_bound: Optional[timedelta] = None
+
+    def evaluate(self, departure: datetime) -> Schedule:
+        """Schedule the trip leaving at ``departure`` (memoized per departure)"""
+        schedule = self._schedules.get(departure)
+        if schedule is None:
+            schedule = self._schedule(self.engine, departure, self.points)
+            self._schedules[departure] = schedule
+            self.evaluations += 1
+        return schedule
+
+    def _schedule(self, engine: ETAEngine, departure: datetime, points: List[Dict]) -> Schedule:
+        points = [dict(point) for point in points]
+        timeline = engine.schedule(self.segments, points, departure, self.cycle_used, self.rest_status)
+        dropoff = points[-1]
+        return Schedule(departure, dropoff['estimated_arrival'], dropoff['estimated_departure'], points, timeline)
+
+    @property
+    def lower_bound(self) -> timedelta:
+        """Shortest possible departure-to-arrival time: every hour at the profile's fastest speed, no waiting"""
+        if self._lower_bound is None:
+            fastest = ETAEngine([max(self.engine.profile)] * 24, str(self.engine.time_zone))
+            departure = datetime(2000, 1, 1, tzinfo=self.engine.time_zone)
+            points = [dict(point, window_start=None) for point in self.points]
+            self._lower_bound = self._schedule(fastest, departure, points).arrival - departure
+        return self._lower_bound
+
+    def earliest_arrival(self, earliest: datetime, latest: datetime, step: timedelta) -> Schedule:
+        """Departure in ``[earliest, latest]`` (on a ``step`` grid) with the earliest arrival.
+
+        Departures are scanned hourly first and then refined at ``step`` around
+        the best one; ties go to the earlier departure.
+        """
+        coarse = max(step, timedelta(hours=1))
+        best = self._scan(earliest, latest, coarse, None)
+        refine_from = max(earliest, best.departure - coarse + step)
+        refine_to = min(latest, best.departure + coarse - step)
+        return self._scan(refine_from, refine_to, step, best)
+
+    def _scan(self, start: datetime, end: datetime, step: timedelta, best: Optional[Schedule]) -> Schedule:
+        departure = start
+        while departure <= end:
+            if best is not None and departure + self.lower_bound >= best.arrival:
+                break  # no later departure can arrive sooner
+            schedule = self.evaluate(departure)
+            if best is None or schedule.arrival < best.arrival or (
+                    schedule.arrival == best.arrival and schedule.departure < best.departure):
+                best = schedule
+            departure += step
+        return best
+
+    def latest_departure(self, deliver_by: datetime, earliest: datetime, latest: datetime,
+                         step: timedelta) -> Optional[Schedule]:
+        """Latest departure on the ``step`` grid that still arrives by ``deliver_by``, or None"""
+        if self.evaluate(earliest).arrival > deliver_by:
+            return None
+        # Leaving later than deliver_by minus the fastest trip cannot work
+        latest = min(latest, deliver_by - self.lower_bound)
+        low, high = 0, int((latest - earliest) / step)
+        if high <= 0:
+            return self.evaluate(earliest)
+        if self.evaluate(earliest + high * step).arrival <= deliver_by:
+            return self.evaluate(earliest + high * step)
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self.evaluate(earliest + middle * step).arrival <= deliver_by:
+                low = middle
+            else:
+                high = middle
+        return self.evaluate(earliest + low * step)
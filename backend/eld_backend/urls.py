@@ -5,10 +5,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from eld_app.views import metrics_view, profile_detail, profile_list
 
 urlpatterns = [
+    path('admin/profiles/', admin.site.admin_view(profile_list), name='profile-list'),
+    path('admin/profiles/<str:profile_id>/', admin.site.admin_view(profile_detail), name='profile-detail'),
     path('admin/', admin.site.urls),
     path('api/', include('eld_app.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -154,6 +154,20 @@ const RouteMap = ({ trip }) => {
       ]
     }
 
+    // Stops placed by the backend carry their own coordinates; older trips only have mileage/hours
+    const stopPosition = (stop, progress) => {
+      if (stop.latitude != null && stop.longitude != null) {
+        return [stop.latitude, stop.longitude]
+      }
+      const coords = calculatePositionAlongRoute(progress)
+      // Add some random offset to avoid overlapping markers
+      const offsetLat = (Math.random() - 0.5) * 0.5
+      const offsetLng = (Math.random() - 0.5) * 0.5
+      return [coords[0] + offsetLat, coords[1] + offsetLng]
+    }
+
+    const stopMarkers = []
+
     // Add fuel stops if available
     if (trip.fuel_stops && trip.fuel_stops.length > 0) {
       trip.fuel_stops.forEach((stop, index) => {
@@ -161,13 +175,7 @@ const RouteMap = ({ trip }) => {
         const totalDistance = trip.total_distance || 1000
         const progress = Math.min(stop.mileage / totalDistance, 0.95) // Cap at 95% to avoid overlap with end
         
-        const fuelCoords = calculatePositionAlongRoute(progress)
-        
-        // Add some random offset to avoid overlapping markers
-        const offsetLat = (Math.random() - 0.5) * 0.5
-        const offsetLng = (Math.random() - 0.5) * 0.5
-        
-        L.marker([fuelCoords[0] + offsetLat, fuelCoords[1] + offsetLng], {
+        const fuelMarker = L.marker(stopPosition(stop, progress), {
           icon: L.divIcon({
             className: 'fuel-stop-icon',
             html: `<div style="
@@ -192,10 +200,11 @@ const RouteMap = ({ trip }) => {
           <div>
             <strong>Fuel Stop ${index + 1}</strong><br>
             ${stop.location}<br>
-            Mileage: ${stop.mileage} miles<br>
-            Duration: ${stop.duration_minutes} minutes
+            Mileage: ${Math.round(stop.mileage)} miles<br>
+            Duration: ${stop.duration_minutes ?? stop.duration_hours * 60} minutes
           </div>
         `)
+        stopMarkers.push(fuelMarker)
       })
     }
 
@@ -204,15 +213,11 @@ const RouteMap = ({ trip }) => {
       trip.rest_stops.forEach((stop, index) => {
         // Distribute rest stops along the route based on their hours elapsed
         const totalDuration = trip.estimated_duration || 24
-        const progress = Math.min(stop.hours_elapsed / totalDuration, 0.95) // Cap at 95% to avoid overlap with end
+        const progress = stop.hours_elapsed != null
+          ? Math.min(stop.hours_elapsed / totalDuration, 0.95) // Cap at 95% to avoid overlap with end
+          : 0
         
-        const restCoords = calculatePositionAlongRoute(progress)
-        
-        // Add some random offset to avoid overlapping markers
-        const offsetLat = (Math.random() - 0.5) * 0.5
-        const offsetLng = (Math.random() - 0.5) * 0.5
-        
-        L.marker([restCoords[0] + offsetLat, restCoords[1] + offsetLng], {
+        const restMarker = L.marker(stopPosition(stop, progress), {
           icon: L.divIcon({
             className: 'rest-stop-icon',
             html: `<div style="
@@ -237,10 +242,11 @@ const RouteMap = ({ trip }) => {
           <div>
             <strong>Rest Stop ${index + 1}</strong><br>
             ${stop.location}<br>
-            After ${stop.hours_elapsed} hours<br>
+            ${stop.hours_elapsed != null ? `After ${stop.hours_elapsed} hours` : `Mileage: ${Math.round(stop.mileage)} miles`}<br>
             Duration: ${stop.duration_hours} hours
           </div>
         `)
+        stopMarkers.push(restMarker)
       })
     }
 
@@ -248,31 +254,7 @@ const RouteMap = ({ trip }) => {
     const allMarkers = [...markers]
     
     // Add fuel and rest stop markers to bounds calculation
-    if (trip.fuel_stops && trip.fuel_stops.length > 0) {
-      trip.fuel_stops.forEach((stop, index) => {
-        const totalDistance = trip.total_distance || 1000
-        const progress = Math.min(stop.mileage / totalDistance, 0.95)
-        const fuelCoords = calculatePositionAlongRoute(progress)
-        const offsetLat = (Math.random() - 0.5) * 0.5
-        const offsetLng = (Math.random() - 0.5) * 0.5
-        
-        const marker = L.marker([fuelCoords[0] + offsetLat, fuelCoords[1] + offsetLng])
-        allMarkers.push(marker)
-      })
-    }
-    
-    if (trip.rest_stops && trip.rest_stops.length > 0) {
-      trip.rest_stops.forEach((stop, index) => {
-        const totalDuration = trip.estimated_duration || 24
-        const progress = Math.min(stop.hours_elapsed / totalDuration, 0.95)
-        const restCoords = calculatePositionAlongRoute(progress)
-        const offsetLat = (Math.random() - 0.5) * 0.5
-        const offsetLng = (Math.random() - 0.5) * 0.5
-        
-        const marker = L.marker([restCoords[0] + offsetLat, restCoords[1] + offsetLng])
-        allMarkers.push(marker)
-      })
-    }
+    allMarkers.push(...stopMarkers)
 
     // Fit map to show all markers
     if (allMarkers.length > 0) {
@@ -187,10 +187,10 @@ const TripDetails = () => {
                   <div key={index} className="flex items-center justify-between p-3 bg-blue-50 rounded-lg">
                     <div>
                       <div className="font-medium text-gray-900">{stop.location}</div>
-                      <div className="text-sm text-gray-600">Mile {stop.mileage}</div>
+                      <div className="text-sm text-gray-600">Mile {Math.round(stop.mileage)}</div>
                     </div>
                     <div className="text-sm text-gray-500">
-                      {stop.duration_minutes} min
+                      {stop.duration_minutes ?? stop.duration_hours * 60} min
                     </div>
                   </div>
                 ))}
@@ -207,7 +207,9 @@ const TripDetails = () => {
                   <div key={index} className="flex items-center justify-between p-3 bg-green-50 rounded-lg">
                     <div>
                       <div className="font-medium text-gray-900">{stop.location}</div>
-                      <div className="text-sm text-gray-600">After {stop.hours_elapsed} hours</div>
+                      <div className="text-sm text-gray-600">
+                        {stop.hours_elapsed != null ? `After ${stop.hours_elapsed} hours` : `Mile ${Math.round(stop.mileage)}`}
+                      </div>
                     </div>
                     <div className="text-sm text-gray-500">
                       {stop.duration_hours} hrs
@@ -1,7 +1,15 @@
 import React, { useState } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { MapPin, Clock, AlertCircle, CheckCircle } from 'lucide-react'
-import { api } from '../services/api'
+import { api, createTripWithProgress } from '../services/api'
+
+// What the trip creation stream has finished, mapped to what the user is waiting for next
+const PROGRESS_MESSAGES = {
+  geocoded: 'Routing...',
+  routed: 'Generating ELD logs...',
+  logs_generated: 'Saving trip...',
+  persisted: 'Finishing up...',
+}
 
 const TripForm = () => {
   const navigate = useNavigate()
@@ -14,6 +22,7 @@ const TripForm = () => {
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
   const [previewData, setPreviewData] = useState(null)
+  const [progress, setProgress] = useState(null)
 
   const handleChange = (e) => {
     const { name, value } = e.target
@@ -53,13 +62,16 @@ const TripForm = () => {
     try {
       setLoading(true)
       setError(null)
-      const response = await api.post('/trips/', formData)
+      setProgress('Geocoding locations...')
+      const trip = await createTripWithProgress(formData, (stage) => {
+        setProgress(PROGRESS_MESSAGES[stage] || null)
+      })
       
       // Check if we have a valid ID in the response
-      if (response.data && response.data.id) {
-        navigate(`/trip/${response.data.id}`)
+      if (trip && trip.id) {
+        navigate(`/trip/${trip.id}`)
       } else {
-        console.error('No ID in response:', response.data)
+        console.error('No ID in response:', trip)
         setError('Trip created but could not redirect. Please check the trips list.')
       }
     } catch (err) {
@@ -67,6 +79,7 @@ const TripForm = () => {
       console.error('Error creating trip:', err)
     } finally {
       setLoading(false)
+      setProgress(null)
     }
   }
 
@@ -190,7 +203,7 @@ const TripForm = () => {
                 disabled={loading}
                 className="btn-primary flex-1"
               >
-                {loading ? 'Creating Trip...' : 'Create Trip'}
+                {loading ? (progress || 'Creating Trip...') : 'Create Trip'}
               </button>
             </div>
           </form>
@@ -34,4 +34,33 @@ api.interceptors.response.use(
   }
 )
 
-export { api }
+// Create a trip, calling onProgress(stage, data) as the server reports each stage
+// (geocoded, routed, logs_generated, persisted). Resolves with the created trip.
+const createTripWithProgress = async (tripData, onProgress) => {
+  const response = await fetch(`${API_BASE_URL}/trips/`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify(tripData),
+  })
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  for (;;) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let boundary
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      const event = frame.match(/^event: (.*)$/m)?.[1]
+      const data = JSON.parse(frame.match(/^data: (.*)$/m)?.[1] ?? 'null')
+      if (event === 'trip') return data
+      if (event === 'error') throw new Error(data?.error || 'Failed to create trip')
+      onProgress?.(event, data)
+    }
+  }
+  throw new Error('Connection closed before the trip was created')
+}
+
+export { api, createTripWithProgress }